@@ -0,0 +1,336 @@
+"""
+Columnar export and fast aggregation of the execution logs written by main.py
+(data_scene/<scene>/execution_logs_<dataset>_<timestamp>.json).
+
+Each run file is flattened into four tables:
+    - goals:              one row per goal execution
+    - tasks:              one row per task executed by the task execution agent
+    - agent_invocations:  one row per agent invocation (planner, executor, goal checker)
+    - tool_calls:         one row per tool call made during an agent invocation
+
+The flattening walks the raw JSON dicts instead of validating the nested pydantic models
+of configs/goal_execution_log_models.py, and many run files are parsed in parallel.
+
+Usage (from the project root, with `source` on the PYTHONPATH):
+    python analysis/execution_log_export.py export data_scene/SCENE/*.json --output-dir data_scene/exports
+    python analysis/execution_log_export.py aggregate data_scene/SCENE/ --group-by task_execution_service_id
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+TABLE_NAMES = ("goals", "tasks", "agent_invocations", "tool_calls")
+
+# Columns of every table, so that the tables keep their schema when e.g. all goals of the input errored
+TABLE_COLUMNS = {
+    "goals": [
+        "run_id", "goal_number", "goal", "complexity", "dataset_name", "goal_completed",
+        "goal_failed_max_tries", "start_time", "end_time", "duration_seconds", "total_replanning_count",
+        "n_tasks", "task_planner_service_id", "task_execution_service_id",
+        "goal_completion_checker_service_id", "error",
+    ],
+    "tasks": [
+        "run_id", "goal_number", "task_index", "task_description", "plan_id", "completed",
+        "duration_seconds", "invocation_index",
+    ],
+    "agent_invocations": [
+        "run_id", "goal_number", "agent", "ai_service_id", "invocation_index", "plan_id", "start_time",
+        "end_time", "duration_seconds", "n_responses", "n_tool_calls", "prompt_tokens", "completion_tokens",
+    ],
+    "tool_calls": [
+        "run_id", "goal_number", "agent", "invocation_index", "tool_call_index", "tool_call_name",
+        "tool_call_arguments", "tool_call_result",
+    ],
+}
+
+# Columns of the goals table that are averaged by aggregate_runs
+_GOAL_METRIC_COLUMNS = ("duration_seconds", "total_replanning_count")
+
+
+def _invocation_row(run_id: str, goal_number: int, agent: str, service_id: str,
+                    invocation: Dict, invocation_index: int) -> Dict:
+    """Flatten one AgentResponseLogs dict into a row of the agent_invocations table."""
+    responses = invocation.get("agent_responses") or []
+    return {
+        "run_id": run_id,
+        "goal_number": goal_number,
+        "agent": agent,
+        "ai_service_id": service_id,
+        "invocation_index": invocation_index,
+        "plan_id": invocation.get("plan_id"),
+        "start_time": invocation.get("agent_invocation_start_time"),
+        "end_time": invocation.get("agent_invocation_end_time"),
+        "duration_seconds": invocation.get("agent_invocation_duration_seconds"),
+        "n_responses": len(responses),
+        "n_tool_calls": sum(1 for response in responses if response.get("tool_call_content")),
+        "prompt_tokens": invocation.get("prompt_tokens"),
+        "completion_tokens": invocation.get("completion_tokens"),
+    }
+
+
+def _tool_call_rows(run_id: str, goal_number: int, agent: str,
+                    invocation: Dict, invocation_index: int) -> List[Dict]:
+    """Flatten the tool calls of one AgentResponseLogs dict into rows of the tool_calls table."""
+    rows = []
+    for response in invocation.get("agent_responses") or []:
+        tool_call = response.get("tool_call_content")
+        if not tool_call:
+            continue
+        rows.append({
+            "run_id": run_id,
+            "goal_number": goal_number,
+            "agent": agent,
+            "invocation_index": invocation_index,
+            "tool_call_index": len(rows),
+            "tool_call_name": tool_call.get("tool_call_name"),
+            "tool_call_arguments": json.dumps(tool_call.get("tool_call_arguments"), default=str),
+            "tool_call_result": tool_call.get("tool_call_result"),
+        })
+    return rows
+
+
+def flatten_execution_logs(raw_logs: Dict[str, Dict], run_id: str) -> Dict[str, List[Dict]]:
+    """
+    Flatten the raw (json loaded) execution logs of one run into rows per table.
+
+    Args:
+        raw_logs: Mapping from goal number to a dumped GoalExecutionLogs (or {"error": ...})
+        run_id: Identifier of the run, used as key column in all tables
+
+    Returns:
+        Dict[str, List[Dict]]: The rows of each table in TABLE_NAMES
+    """
+    tables = {name: [] for name in TABLE_NAMES}
+
+    for goal_key, goal_log in raw_logs.items():
+        if "error" in goal_log:
+            tables["goals"].append({
+                "run_id": run_id,
+                "goal_number": int(goal_key),
+                "error": goal_log["error"],
+            })
+            continue
+
+        goal_number = goal_log["goal_number"]
+        task_planner = goal_log["task_planner_agent"]
+        task_execution = goal_log["task_execution_agent"]
+        goal_checker = goal_log["goal_completion_checker_agent"]
+
+        # (agent name, service id, invocation dict) for every agent invocation of this goal
+        invocations = [
+            ("TaskPlannerAgent", task_planner["ai_service_id"], invocation)
+            for invocation in task_planner.get("task_planner_invocations", [])
+        ]
+        for task_index, task_log in enumerate(task_execution.get("task_logs", [])):
+            invocations.append(("TaskExecutionAgent", task_execution["ai_service_id"], task_log["agent_invocation"]))
+            tables["tasks"].append({
+                "run_id": run_id,
+                "goal_number": goal_number,
+                "task_index": task_index,
+                "task_description": task_log.get("task_description"),
+                "plan_id": task_log.get("plan_id"),
+                "completed": task_log.get("completed", False),
+                "duration_seconds": task_log["agent_invocation"].get("agent_invocation_duration_seconds"),
+                "invocation_index": len(invocations) - 1,
+            })
+        invocations.extend(
+            ("GoalCompletionCheckerAgent", goal_checker["ai_service_id"], check_log["completion_check_agent_invocation"])
+            for check_log in goal_checker.get("completion_check_logs", [])
+        )
+
+        for invocation_index, (agent, service_id, invocation) in enumerate(invocations):
+            tables["agent_invocations"].append(
+                _invocation_row(run_id, goal_number, agent, service_id, invocation, invocation_index)
+            )
+            tables["tool_calls"].extend(
+                _tool_call_rows(run_id, goal_number, agent, invocation, invocation_index)
+            )
+
+        tables["goals"].append({
+            "run_id": run_id,
+            "goal_number": goal_number,
+            "goal": goal_log.get("goal"),
+            "complexity": goal_log.get("complexity"),
+            "dataset_name": goal_log.get("dataset_name"),
+            "goal_completed": goal_log.get("goal_completed"),
+            "goal_failed_max_tries": goal_log.get("goal_failed_max_tries"),
+            "start_time": goal_log.get("start_time"),
+            "end_time": goal_log.get("end_time"),
+            "duration_seconds": goal_log.get("duration_seconds"),
+            "total_replanning_count": task_planner.get("total_replanning_count"),
+            "n_tasks": len(task_execution.get("task_logs", [])),
+            "task_planner_service_id": task_planner["ai_service_id"],
+            "task_execution_service_id": task_execution["ai_service_id"],
+            "goal_completion_checker_service_id": goal_checker["ai_service_id"],
+            "error": None,
+        })
+
+    return tables
+
+
+def _flatten_run_file(path: str) -> Dict[str, List[Dict]]:
+    """Load and flatten one run file (executed in a worker process)."""
+    with open(path, "r", encoding="utf-8") as file:
+        raw_logs = json.load(file)
+    return flatten_execution_logs(raw_logs, run_id=Path(path).stem)
+
+
+def _rows_to_tables(rows_per_table: Dict[str, List[Dict]]) -> Dict[str, pd.DataFrame]:
+    tables = {}
+    for name, rows in rows_per_table.items():
+        df = pd.DataFrame(rows, columns=TABLE_COLUMNS[name])
+        for column in ("start_time", "end_time"):
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column])
+        tables[name] = df
+    return tables
+
+
+def collect_run_files(paths: Iterable[str]) -> List[str]:
+    """Expand directories into the execution log files (execution_logs_*.json) they contain."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(str(p) for p in Path(path).glob("execution_logs_*.json")))
+        else:
+            files.append(path)
+    return files
+
+
+def load_runs(paths: Iterable[str], max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Parse and flatten many run files in parallel and concatenate them into one DataFrame per table.
+
+    Args:
+        paths: Execution log files or directories containing them
+        max_workers: Number of worker processes (defaults to the number of CPUs)
+
+    Returns:
+        Dict[str, pd.DataFrame]: One DataFrame per table in TABLE_NAMES
+    """
+    files = collect_run_files(paths)
+    rows_per_table = {name: [] for name in TABLE_NAMES}
+
+    if len(files) <= 1:
+        results = [_flatten_run_file(path) for path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_flatten_run_file, files, chunksize=4))
+
+    for run_tables in results:
+        for name in TABLE_NAMES:
+            rows_per_table[name].extend(run_tables[name])
+
+    return _rows_to_tables(rows_per_table)
+
+
+def export_tables(tables: Dict[str, pd.DataFrame], output_dir: str, file_format: str = "parquet") -> List[Path]:
+    """
+    Write the tables to `output_dir` as Parquet (`<table>.parquet`) or Arrow IPC (`<table>.arrow`) files.
+
+    Both formats require pyarrow.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, df in tables.items():
+        if file_format == "parquet":
+            path = output_dir / f"{name}.parquet"
+            df.to_parquet(path, index=False)
+        elif file_format == "arrow":
+            path = output_dir / f"{name}.arrow"
+            df.to_feather(path)
+        else:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        written.append(path)
+    return written
+
+
+def aggregate_runs(tables: Dict[str, pd.DataFrame], group_by: str = "run_id") -> pd.DataFrame:
+    """
+    Aggregate success rates, durations and token use per group (run, model, complexity, ...).
+
+    Args:
+        tables: The tables returned by load_runs
+        group_by: A column of the goals table to group by
+
+    Returns:
+        pd.DataFrame: One row per group
+    """
+    goals = tables["goals"]
+    if goals.empty:
+        return pd.DataFrame()
+
+    # Goals that crashed count as failed (and have no metrics)
+    goals = goals.reindex(columns=TABLE_COLUMNS["goals"])
+    goals = goals.assign(
+        goal_completed=goals["goal_completed"].astype("boolean").fillna(False).astype(bool),
+        errored=goals["error"].notna(),
+        **{column: pd.to_numeric(goals[column], errors="coerce") for column in _GOAL_METRIC_COLUMNS},
+    )
+    summary = goals.groupby(group_by).agg(
+        n_goals=("goal_number", "count"),
+        success_rate=("goal_completed", "mean"),
+        n_errors=("errored", "sum"),
+        mean_duration_seconds=("duration_seconds", "mean"),
+        median_duration_seconds=("duration_seconds", "median"),
+        mean_replanning_count=("total_replanning_count", "mean"),
+    )
+
+    invocations = tables["agent_invocations"]
+    if not invocations.empty:
+        if group_by not in invocations.columns:
+            invocations = invocations.merge(
+                goals[["run_id", "goal_number", group_by]].drop_duplicates(),
+                on=["run_id", "goal_number"],
+                how="left",
+            )
+        token_summary = invocations.groupby(group_by).agg(
+            n_agent_invocations=("invocation_index", "count"),
+            n_tool_calls=("n_tool_calls", "sum"),
+            total_prompt_tokens=("prompt_tokens", "sum"),
+            total_completion_tokens=("completion_tokens", "sum"),
+            mean_invocation_seconds=("duration_seconds", "mean"),
+        )
+        summary = summary.join(token_summary)
+
+    return summary.reset_index()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Columnar export and aggregation of execution logs.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Flatten run files into Parquet/Arrow tables.")
+    export_parser.add_argument("paths", nargs="+", help="Execution log files or directories.")
+    export_parser.add_argument("--output-dir", required=True, help="Directory to write the tables to.")
+    export_parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    export_parser.add_argument("--workers", type=int, default=None)
+
+    aggregate_parser = subparsers.add_parser("aggregate", help="Aggregate metrics across run files.")
+    aggregate_parser.add_argument("paths", nargs="+", help="Execution log files or directories.")
+    aggregate_parser.add_argument("--group-by", default="run_id", help="Column of the goals table to group by.")
+    aggregate_parser.add_argument("--output", default=None, help="Optional CSV file to write the summary to.")
+    aggregate_parser.add_argument("--workers", type=int, default=None)
+
+    args = parser.parse_args()
+    tables = load_runs(args.paths, max_workers=args.workers)
+
+    if args.command == "export":
+        for path in export_tables(tables, args.output_dir, file_format=args.format):
+            print(f"Wrote {path}")
+    else:
+        summary = aggregate_runs(tables, group_by=args.group_by)
+        print(summary.to_string(index=False))
+        if args.output:
+            summary.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -70,6 +70,8 @@ class AgentResponseLogs(BaseModel):
     agent_invocation_start_time: datetime
     agent_invocation_end_time: datetime
     agent_invocation_duration_seconds: float
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
     
 ########################################################
 
@@ -40,7 +40,8 @@ plugin_configs = {
         plugins_factory.get_nav_plugin,
         [
             path_to_scene_data / Path(f"{active_scene.value}/nav_data/navmesh.txt"),
-            None  # nav_vis_path is None
+            None,  # nav_vis_path is None
+            path_to_scene_data / Path(f"{active_scene.value}/scene_graph.json")
         ],
         "navigation"
     ),
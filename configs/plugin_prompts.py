@@ -11,6 +11,15 @@ SQL_TABLE_CONTEXTS = {
 SQL_MENTIONED_ELEMENTS_PROMPT = ('Given an input query, return all the names of the objects and rooms mentioned or implied in a form of string in a JSON format with keys "detected_objects" and "rooms", and values being a list with strings with the names:\n "rooms": [name-of-the-room1, name-of-the-room2], "detected_objects": [name-of-the-object1, name-of-the-object2]\n'
     'Example: for query=Is there an object you can sit on in the living room?, return the following dictionary: "rooms": ["living room"], "detected_objects": ["object you can sit on"].')
 SQL_DIST_DISCARD_PROMPT = "Discard the object which is within 0.05 meters with respect to the one in query, since we don't want to compare the object to itself."
+SQL_SPATIAL_FUNCTIONS_CONTEXT = ("\nFor distance computations use the built-in SQL functions dist3d(x1, y1, z1, x2, y2, z2), which returns the Euclidean distance between two points, "
+    "and within_radius(x1, y1, z1, x2, y2, z2, r), which returns 1 if the two points are at most r meters apart and 0 otherwise. "
+    "Example (5 objects closest to (1.0, 2.0, 0.5)): SELECT id, class_name, dist3d(position_x, position_y, position_z, 1.0, 2.0, 0.5) AS dist FROM detected_objects ORDER BY dist LIMIT 5;")
+SQL_SPATIAL_INDEX_CONTEXT = ("\nThe table detected_objects_rtree (columns: id, min_x, max_x, min_y, max_y, min_z, max_z) is a spatial index over the bounding boxes of the detected objects, joinable on detected_objects.id. "
+    "For queries within a radius r around (x, y, z), first restrict the candidates with the index and then use within_radius. "
+    "Example (objects within 1.5 meters of (1.0, 2.0, 0.5)): SELECT d.id, d.class_name, dist3d(d.position_x, d.position_y, d.position_z, 1.0, 2.0, 0.5) AS dist "
+    "FROM detected_objects_rtree r JOIN detected_objects d ON d.id = r.id "
+    "WHERE r.max_x >= 1.0 - 1.5 AND r.min_x <= 1.0 + 1.5 AND r.max_y >= 2.0 - 1.5 AND r.min_y <= 2.0 + 1.5 AND r.max_z >= 0.5 - 1.5 AND r.min_z <= 0.5 + 1.5 "
+    "AND within_radius(d.position_x, d.position_y, d.position_z, 1.0, 2.0, 0.5, 1.5) ORDER BY dist;")
 
 # Navigation module
 NAV_FUN_ACTUAL_PROMPT = "Calculates the distance between two points, considering obstacles and non-navigable areas, when provided with the 3D positions of those points. It does not independently determine the positions of objects or points in space, the positions need to be included in the input query. It is the default distance measurement when the query implies walking or getting from one place to another, since it considers walls separating the rooms."
@@ -18,6 +27,16 @@ NAV_OUT_ACTUAL_PROMPT = "Information on the actual distance between the points (
 NAV_IN_PROMPT = "Natural language query specifying the positions of the start and end, including X, Y and Z components."
 NAV_FUN_LINE_PROMPT = "Having the description of the 3D positions of start and goal, returns the distance between them in straight line, NOT considering any obstacles. It does not independently determine the positions of objects or points in space, the positions need to be included in the input query."
 NAV_OUT_LINE_PROMPT = "Information on the straight-line distance between the points (NOT considering the obstacles)."
+NAV_FUN_ACTUAL_STRUCTURED_PROMPT = "Calculates the distance between a start and a goal, considering obstacles and non-navigable areas. The start and goal are given directly as object IDs of the scene graph or as 'x, y, z' coordinates. Prefer this function over the natural language one whenever the object IDs or coordinates are known."
+NAV_FUN_LINE_STRUCTURED_PROMPT = "Calculates the straight-line distance between a start and a goal, NOT considering any obstacles. The start and goal are given directly as object IDs of the scene graph or as 'x, y, z' coordinates."
+NAV_IN_POSITION_PROMPT = "Object ID of a scene graph object (e.g. '12') or 3D coordinates given as 'x, y, z'."
+NAV_FUN_NEAREST_PROMPT = "Returns the objects closest to a reference object of the scene graph (given by its object ID), considering obstacles and non-navigable areas (navigable distance). Optionally only objects with a given semantic label are considered, e.g. the chair closest to the couch or the lamp closest to a light switch. The distances are precomputed, so the answer is instant."
+NAV_FUN_RANK_PROMPT = "Ranks the given objects of the scene graph (given by their object IDs) by their navigable distance (considering obstacles and non-navigable areas) to a reference object, from closest to farthest. The distances are precomputed, so the answer is instant."
+NAV_IN_OBJECT_ID_PROMPT = "Object ID of the reference object in the scene graph."
+NAV_IN_K_PROMPT = "Number of closest objects to return."
+NAV_IN_LABEL_PROMPT = "Optional semantic label (e.g. 'chair') the returned objects must have. Leave empty to consider all objects."
+NAV_IN_OBJECT_IDS_PROMPT = "Comma-separated object IDs of the objects to rank, e.g. '3, 12, 25'."
+NAV_OUT_NEAREST_PROMPT = "The closest objects (object ID, semantic label and navigable distance in meters), from closest to farthest."
 
 NAV_SYSTEM_PROMPT = (
     "Act as a text-to-positions converter. Your job is to process a natural language query which contains information about 3D positions of two objects. "
@@ -9,6 +9,7 @@ from dotenv import dotenv_values
 
 # Third-party imports
 from bosdyn import client as bosdyn_client
+from bosdyn.api import image_pb2
 
 from robot_utils.base_LSARP import (
     initialize_robot_connection,
@@ -17,11 +18,19 @@ from robot_utils.base_LSARP import (
     safe_power_off
 )
 from robot_utils.frame_transformer import FrameTransformerSingleton
+from robot_utils.image_acquisition import start_image_acquisition, stop_image_acquisition
 
 from planner_core.robot_planner import RobotPlanner, RobotPlannerSingleton
 from planner_core.robot_state import RobotState, RobotStateSingleton
 from planner_core.agents import TaskPlannerAgent, TaskExecutionAgent, GoalCompletionCheckerAgent
+from planner_core.config_handler import ConfigHandler, ConfigPrefix
+from planner_core.memory_store import create_core_memory
+from planner_core.model_factories import OpenAiModelFactory
 from planner_core.reduce_history import reduce_and_log_chat_history
+from planner_core.retrieval_plugin_registry import RetrievalPluginRegistry, RetrievalPluginRegistrySingleton
+from planner_core.scene_graph_snapshot import SceneGraphSnapshot
+from planner_core.node_geometry_cache import NodeGeometryCache, NODE_GEOMETRY_CACHE_FILE_NAME
+from planner_core.scene_graph_store import SCENE_GRAPH_STORE_DIR_NAME, load_scene_graph_store, save_scene_graph_store
 
 from LostFound.src.scene_graph import get_scene_graph
 
@@ -30,8 +39,8 @@ from robot_plugins.goal_checker import TaskPlannerGoalChecker
 
 from utils.agent_utils import invoke_agent
 from utils.recursive_config import Config
-from utils.singletons import RobotLeaseClientSingleton
-from utils.logging_utils import setup_logging
+from utils.singletons import ImageClientSingleton, RobotLeaseClientSingleton
+from utils.logging_utils import LazyStr, setup_logging
 
 from configs.goal_execution_log_models import (
     GoalExecutionLogs,
@@ -61,12 +70,14 @@ connection_string = env_variables.get("AZURE_APP_INSIGHTS_CONNECTION_STRING")
 # Set up logging with OpenTelemetry integration if configured
 enable_opentelemetry = config.get("logging_settings", {}).get("enable_opentelemetry", False)
 service_name = config.get("logging_settings", {}).get("service_name", "L-SARP")
+use_queue_handler = config.get("logging_settings", {}).get("use_queue_handler", True)
 
 # Set up logging
 setup_logging(
     enable_opentelemetry=enable_opentelemetry,
     service_name=service_name,
     connection_string=connection_string,
+    use_queue_handler=use_queue_handler,
 )
 logger = logging.getLogger("main")
 
@@ -105,15 +116,42 @@ async def main():
     # Loading/computing the scene graph
     scene_graph_path = Path(path_to_scene_data / active_scene_name / "full_scene_graph.pkl")
     scene_graph_json_path = Path(path_to_scene_data / active_scene_name / "scene_graph.json")
-    logger.info("Loading scene graph from %s. This may take a few seconds...", scan_dir)
-    origninal_scene_graph = get_scene_graph(
-        scan_dir,
-        graph_save_path=scene_graph_path,
-        drawers=True,
-        light_switches=True,
-        vis_block=False
-    )
+    # The memory-mapped store only reads the points of the nodes that are actually used
+    scene_graph_store_dir = scene_graph_path.parent / SCENE_GRAPH_STORE_DIR_NAME
+    origninal_scene_graph = load_scene_graph_store(scene_graph_store_dir, source_path=scene_graph_path)
+    if origninal_scene_graph is None:
+        logger.info("Loading scene graph from %s. This may take a few seconds...", scan_dir)
+        origninal_scene_graph = get_scene_graph(
+            scan_dir,
+            graph_save_path=scene_graph_path,
+            drawers=True,
+            light_switches=True,
+            vis_block=False
+        )
+        save_scene_graph_store(origninal_scene_graph, scene_graph_store_dir, source_path=scene_graph_path)
     origninal_scene_graph.save_as_json(scene_graph_json_path)
+    logger.debug("Scene graph:\n%s", LazyStr(origninal_scene_graph.scene_graph_to_dict))
+    # Geometry of the nodes (used to compute interaction poses), persisted next to the scene graph
+    node_geometry_cache = NodeGeometryCache(scene_graph_path.parent / NODE_GEOMETRY_CACHE_FILE_NAME)
+    node_geometry_cache.update(origninal_scene_graph)
+
+    # Each goal starts from a pristine copy of the scene graph (goals mutate it in place)
+    scene_graph_snapshot = SceneGraphSnapshot(origninal_scene_graph)
+
+    # Entries of the core memory are deduplicated/retrieved with the (cached) text embedding model
+    core_memory_embed_model = None
+    if config.get("core_memory", {}).get("use_embeddings", True):
+        core_memory_embed_model = OpenAiModelFactory(ConfigHandler(Path(".env_plugins"))).get_embed_model(ConfigPrefix.TEXT)
+
+    # Retrieval plugins are shared across agents and goals; optionally build some in the background now
+    retrieval_plugin_registry = RetrievalPluginRegistrySingleton()
+    retrieval_plugin_registry.set_instance(RetrievalPluginRegistry())
+    warm_up_plugins = config.get("retrieval_plugin_settings", {}).get("warm_up", [])
+    if warm_up_plugins:
+        from configs.plugin_configs import plugin_configs
+        for plugin_name, (factory_func, args, _) in plugin_configs.items():
+            retrieval_plugin_registry.register(plugin_name, factory_func, args)
+        retrieval_plugin_registry.warm_up(warm_up_plugins)
     
     # Create timestamp for the responses file
     
@@ -123,6 +161,7 @@ async def main():
     # Start the connection to the robot
     ############################################################
     use_robot = config["robot_planner_settings"]["use_with_robot"]
+    image_acquisition_settings = config.get("image_acquisition", {})
     
     if use_robot:
         initialize_robot_connection()
@@ -196,11 +235,24 @@ async def main():
                         
                         # Reset the robot state
                         robot_state = RobotStateSingleton()
-                        robot_state.set_instance(RobotState(scene_graph_object=origninal_scene_graph))
+                        robot_state.set_instance(RobotState(
+                            scene_graph_object=scene_graph_snapshot.restore(),
+                            node_geometry_cache=node_geometry_cache,
+                            core_memory=create_core_memory(core_memory_embed_model),
+                        ))
                 
                         if use_robot:
                             power_on()
                             spot_initial_localization()
+                            # The image client is available after the localization, keep the camera frames fresh in the background
+                            if image_acquisition_settings.get("enabled", False):
+                                start_image_acquisition(
+                                    ImageClientSingleton(),
+                                    [(source, image_pb2.Image.PIXEL_FORMAT_RGB_U8) for source in image_acquisition_settings.get("rgb_sources", [])]
+                                    + [(source, image_pb2.Image.PIXEL_FORMAT_DEPTH_U16) for source in image_acquisition_settings.get("depth_sources", [])],
+                                    rate_hz=image_acquisition_settings.get("rate_hz", 5.0),
+                                    max_age=image_acquisition_settings.get("max_age", 0.5),
+                                )
 
                         # Reset the robot planner
                         robot_planner = RobotPlannerSingleton()
@@ -246,9 +298,9 @@ async def main():
                                     goal=goal,
                                     plan=robot_planner.plan,
                                     tasks_completed=robot_planner.tasks_completed,
-                                    scene_graph=str(robot_state.scene_graph.scene_graph_to_dict()),
+                                    scene_graph=robot_state.get_scene_graph_prompt(thread_key="task_execution"),
                                     robot_position=str(robot_state.virtual_robot_pose) if not use_robot else str(frame_transformer.get_current_body_position_in_frame(robot_state.frame_name)),
-                                    core_memory=str(robot_state.core_memory)
+                                    core_memory=robot_state.core_memory.get_prompt(f"{goal} {task}")
                                 )
                                 
                                 # Execute the task using thread-based approach for better context management
@@ -287,7 +339,9 @@ async def main():
                                     robot_planner.tasks_completed.append(task.get("task_description"))
                                         
                                     # Reduce the chat history
-                                    await reduce_and_log_chat_history(robot_planner.task_execution_chat_thread, "Task Execution Agent")
+                                    if await reduce_and_log_chat_history(robot_planner.task_execution_chat_thread, "Task Execution Agent"):
+                                        # The summary may not contain the scene graph, so the next task prompt has to include it in full
+                                        robot_state.scene_graph_journal.reset_thread("task_execution")
                                     
                                     # Check if the goal is completed
                                     if robot_planner.goal_completed:
@@ -325,6 +379,7 @@ async def main():
                                 
                         # Goal Completed, save logging details.
                         goal_end_time = datetime.now()
+                        logger.debug("Scene graph after the goal:\n%s", LazyStr(robot_state.scene_graph.scene_graph_to_dict))
                         goal_duration = (goal_end_time - goal_start_time).total_seconds()
                         
                         # Task Planner Agent Logs
@@ -394,6 +449,7 @@ async def main():
                             json.dump(existing_execution_logs, file, indent=2)
                     
                 logger.info("Finished processing Offline Predefined Goals")
+                retrieval_plugin_registry.log_status()
             
 
         else:
@@ -402,6 +458,7 @@ async def main():
             )
 
         if use_robot:
+            stop_image_acquisition()
             safe_power_off()
 
 
@@ -34,6 +34,7 @@ from robot_plugins.goal_checker import TaskPlannerGoalChecker, TaskExecutionGoal
 from robot_plugins.maths import MathematicalOperationsPlugin
 from robot_plugins.replanning import ReplanningPlugin
 from robot_plugins.core_memory import CoreMemoryPlugin
+from planner_core.retrieval_plugin_registry import RetrievalPluginRegistry, RetrievalPluginRegistrySingleton
 from utils.recursive_config import Config
 
 
@@ -60,12 +61,17 @@ class RobotAgentBase(ChatCompletionAgent, ABC):
         Adds all the enabled plugins to the kernel.
         Scenes_and_plugins_config.py contains the plugin configurations for each scene.
         """
+        # The plugins are shared by all agents and only built on their first invocation
+        registry = RetrievalPluginRegistrySingleton()
+        if not registry.is_instantiated():
+            registry.set_instance(RetrievalPluginRegistry())
+
         # Add Enabled Plugins to the kernel
         for plugin_name in self._enabled_retrieval_plugins:
             if plugin_name in self._retrieval_plugins_configs:
                 factory_func, args, kernel_name = self._retrieval_plugins_configs[plugin_name]
-                plugin = factory_func(*args)
-                kernel.add_plugin(plugin, plugin_name=kernel_name)
+                registry.register(plugin_name, factory_func, args)
+                kernel.add_plugin(registry.get_lazy_plugin(plugin_name), plugin_name=kernel_name)
         return kernel
 
     def _add_action_plugins(self, kernel: Kernel) -> Kernel:
@@ -0,0 +1,101 @@
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from PIL import Image
+from pydantic import Field, PrivateAttr
+from llama_index.core.base.embeddings.base import Embedding
+from llama_index.core.schema import ImageType
+from llama_index.embeddings.clip import ClipEmbedding
+
+logger = logging.getLogger("IMAGE")
+
+
+def load_thumbnail(image: ImageType, min_side: int) -> Image.Image:
+    """
+    Decodes an image downscaled such that its shorter side is (at least) min_side pixels.
+    JPEGs are decoded directly at a reduced scale (draft mode), which is much faster than
+    decoding them at full resolution.
+
+    Args:
+        image (ImageType): path to the image or in-memory buffer
+        min_side (int): minimum length of the shorter side of the thumbnail
+
+    Returns:
+        Image.Image: RGB thumbnail of the image
+    """
+    img = Image.open(image)
+    width, height = img.size
+    scale = min_side / min(width, height)
+    if scale < 1:
+        size = (max(round(width * scale), min_side), max(round(height * scale), min_side))
+        img.draft("RGB", size)
+        img = img.resize(size, Image.BICUBIC, reducing_gap=2.0)
+    return img.convert("RGB")
+
+
+_preprocess_executors: Dict[Optional[int], ThreadPoolExecutor] = {}
+_preprocess_executors_lock = threading.Lock()
+
+
+def get_preprocess_executor(max_workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """Gets the thread pool decoding images, shared by all embedding models with the same number of workers."""
+    with _preprocess_executors_lock:
+        executor = _preprocess_executors.get(max_workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="clip_preprocess")
+            _preprocess_executors[max_workers] = executor
+        return executor
+
+
+def _shutdown_preprocess_executors() -> None:
+    with _preprocess_executors_lock:
+        for executor in _preprocess_executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        _preprocess_executors.clear()
+
+
+atexit.register(_shutdown_preprocess_executors)
+
+
+class BatchedClipEmbedding(ClipEmbedding):
+    """
+    ClipEmbedding embedding images in batches: the images of a batch are decoded into
+    thumbnails and preprocessed in a shared thread pool, then encoded by CLIP in a single forward pass.
+    """
+
+    preprocess_workers: Optional[int] = Field(
+        default=None, description="Number of threads decoding the images (None for the default)."
+    )
+
+    def __init__(self, embed_batch_size: int = 32, preprocess_workers: Optional[int] = None, **kwargs) -> None:
+        super().__init__(embed_batch_size=embed_batch_size, preprocess_workers=preprocess_workers, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BatchedClipEmbedding"
+
+    def _preprocess_image(self, image: ImageType):
+        return self._preprocess(load_thumbnail(image, self._model.visual.input_resolution))
+
+    def _get_image_embedding(self, img_file_path: ImageType) -> Embedding:
+        return self._get_image_embeddings([img_file_path])[0]
+
+    def _get_image_embeddings(self, img_file_paths: List[ImageType]) -> List[Embedding]:
+        import torch
+
+        start = time.perf_counter()
+        executor = get_preprocess_executor(self.preprocess_workers)
+        images = list(executor.map(self._preprocess_image, img_file_paths))
+        with torch.no_grad():
+            batch = torch.stack(images).to(self._device)
+            embeddings = self._model.encode_image(batch).tolist()
+        duration = time.perf_counter() - start
+        logger.debug(
+            "Embedded a batch of %d images in %.2f s (%.1f images/s)",
+            len(img_file_paths), duration, len(img_file_paths) / max(duration, 1e-9),
+        )
+        return embeddings
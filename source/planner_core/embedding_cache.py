@@ -0,0 +1,326 @@
+import atexit
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import PrivateAttr
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.embeddings.multi_modal_base import MultiModalEmbedding
+from llama_index.core.schema import ImageType
+
+from utils.recursive_config import Config
+
+logger = logging.getLogger("main")
+
+
+class EmbeddingCache:
+    """
+    Disk-backed (SQLite) cache of embeddings keyed on (model id, content hash), shared by all
+    embedding models of a process and persisted across processes. The number of stored
+    embeddings is bounded, the least recently used entries are evicted first. Access times of
+    cache hits are kept in memory and written in batches (at the latest before an eviction).
+    """
+
+    def __init__(self, db_path: Path, max_entries: int = 200_000, access_flush_size: int = 1000) -> None:
+        """
+        Constructor
+
+        Args:
+            db_path (Path): path to the SQLite file storing the embeddings
+            max_entries (int): maximum number of cached embeddings (over all models)
+            access_flush_size (int): number of pending access times that triggers writing them
+
+        Returns:
+            None
+        """
+        self._max_entries: int = max_entries
+        self._access_flush_size: int = access_flush_size
+        # key -> time of the last cache hit not yet written to the database
+        self._pending_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model_id TEXT NOT NULL, embedding BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        self._n_entries: int = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def get_key(model_id: str, kind: str, content: bytes) -> str:
+        """
+        Key of an embedding: hash of the model id, the kind of content ('query', 'text' or
+        'image') and the content itself.
+        """
+        sha = hashlib.sha256()
+        sha.update(model_id.encode("utf-8"))
+        sha.update(b"\0" + kind.encode("utf-8") + b"\0")
+        sha.update(content)
+        return sha.hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[Embedding]]:
+        """Returns the cached embeddings for the keys (None for the keys that are not cached)."""
+        if len(keys) == 0:
+            return []
+        found = {}
+        with self._lock:
+            # Stay below SQLite's limit on the number of host parameters
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._pending_access.update((key, now) for key in found)
+                if len(self._pending_access) >= self._access_flush_size:
+                    self._write_access_times()
+                    self._conn.commit()
+        return [
+            np.frombuffer(found[key], dtype=np.float32).tolist() if key in found else None
+            for key in keys
+        ]
+
+    def put_many(self, model_id: str, keys: Sequence[str], embeddings: Sequence[Embedding]) -> None:
+        """Stores the embeddings under the keys and evicts the least recently used entries if needed."""
+        entries = dict(zip(keys, embeddings))
+        if len(entries) == 0:
+            return
+        now = time.time()
+        with self._lock:
+            n_existing = 0
+            new_keys = list(entries)
+            for start in range(0, len(new_keys), 500):
+                chunk = new_keys[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                n_existing += self._conn.execute(
+                    f"SELECT COUNT(*) FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model_id, embedding, last_access) VALUES (?, ?, ?, ?)",
+                [
+                    (key, model_id, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+                    for key, embedding in entries.items()
+                ],
+            )
+            self._n_entries += len(entries) - n_existing
+            if self._n_entries > self._max_entries:
+                # The eviction order has to see the recent cache hits
+                self._write_access_times()
+                deleted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (self._n_entries - self._max_entries,),
+                ).rowcount
+                self._n_entries -= deleted
+            self._conn.commit()
+
+    def _write_access_times(self) -> None:
+        """Writes the pending access times of the cache hits (the caller holds the lock and commits)."""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(access_time, key) for key, access_time in self._pending_access.items()],
+            )
+            self._pending_access.clear()
+
+    def close(self) -> None:
+        """Writes the pending access times and closes the database."""
+        with self._lock:
+            self._write_access_times()
+            self._conn.commit()
+            self._conn.close()
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Returns the process-wide embedding cache, configured in the `embedding_cache` section of
+    config.yaml (None if the cache is disabled).
+    """
+    global _embedding_cache
+    if _embedding_cache is None:
+        config = Config()
+        cache_config = config.get("embedding_cache", {})
+        if not cache_config.get("enabled", True):
+            return None
+        db_path = Path(config.get_subpath("cache")) / cache_config.get("file_name", "embeddings.sqlite")
+        _embedding_cache = EmbeddingCache(db_path, max_entries=cache_config.get("max_entries", 200_000))
+        atexit.register(_embedding_cache.close)
+        logger.info("Using embedding cache at %s", db_path)
+    return _embedding_cache
+
+
+def _image_cache_content(img_file_path: ImageType) -> bytes:
+    """
+    Content keying the embedding of an image: path, size and modification time of an image
+    file (so the file is not read before the embedding model decodes it), or the bytes of an
+    in-memory buffer.
+    """
+    if isinstance(img_file_path, BytesIO):
+        return b"data\0" + img_file_path.getvalue()
+    path = Path(img_file_path).resolve()
+    stat = path.stat()
+    return f"file\0{path}\0{stat.st_size}\0{stat.st_mtime_ns}".encode("utf-8")
+
+
+def _group_missing(keys: List[str], embeddings: List[Optional[Embedding]]) -> Dict[str, List[int]]:
+    """Indices of the contents that are not cached, grouped by key (a content occurring several times is embedded once)."""
+    missing: Dict[str, List[int]] = {}
+    for i, (key, embedding) in enumerate(zip(keys, embeddings)):
+        if embedding is None:
+            missing.setdefault(key, []).append(i)
+    return missing
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Transparent wrapper around a LlamaIndex embedding model that serves query and text
+    embeddings from the EmbeddingCache and only forwards the misses to the wrapped model.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _cache: EmbeddingCache = PrivateAttr()
+    _model_id: str = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, cache: EmbeddingCache, **kwargs) -> None:
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            callback_manager=embed_model.callback_manager,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+        self._cache = cache
+        self._model_id = f"{type(embed_model).__name__}:{embed_model.model_name}"
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    def _get_cached(self, kind: str, contents: List[bytes],
+                    embed_missing: Callable[[List[int]], List[Embedding]]) -> List[Embedding]:
+        """
+        Looks up the embeddings of the contents and computes the missing ones.
+
+        Args:
+            kind (str): kind of the contents ('query', 'text' or 'image')
+            contents (List[bytes]): contents to embed
+            embed_missing (Callable): computes the embeddings for the given indices of contents
+
+        Returns:
+            List[Embedding]: embeddings of the contents
+        """
+        keys = [EmbeddingCache.get_key(self._model_id, kind, content) for content in contents]
+        embeddings = self._cache.get_many(keys)
+        missing = _group_missing(keys, embeddings)
+        if missing:
+            new_embeddings = embed_missing([indices[0] for indices in missing.values()])
+            self._store_missing(missing, new_embeddings, embeddings)
+        return embeddings
+
+    async def _aget_cached(self, kind: str, contents: List[bytes], aembed_missing) -> List[Embedding]:
+        keys = [EmbeddingCache.get_key(self._model_id, kind, content) for content in contents]
+        embeddings = self._cache.get_many(keys)
+        missing = _group_missing(keys, embeddings)
+        if missing:
+            new_embeddings = await aembed_missing([indices[0] for indices in missing.values()])
+            self._store_missing(missing, new_embeddings, embeddings)
+        return embeddings
+
+    def _store_missing(self, missing: Dict[str, List[int]], new_embeddings: List[Embedding],
+                       embeddings: List[Optional[Embedding]]) -> None:
+        """Fills in the computed embeddings (at every index of the same content) and caches them."""
+        for indices, embedding in zip(missing.values(), new_embeddings):
+            for i in indices:
+                embeddings[i] = embedding
+        self._cache.put_many(self._model_id, list(missing), new_embeddings)
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._get_cached(
+            "query", [query.encode("utf-8")],
+            lambda _: [self._embed_model._get_query_embedding(query)],
+        )[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        async def aembed_missing(_):
+            return [await self._embed_model._aget_query_embedding(query)]
+        return (await self._aget_cached("query", [query.encode("utf-8")], aembed_missing))[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._get_cached(
+            "text", [text.encode("utf-8") for text in texts],
+            lambda missing: self._embed_model._get_text_embeddings([texts[i] for i in missing]),
+        )
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        async def aembed_missing(missing):
+            return await self._embed_model._aget_text_embeddings([texts[i] for i in missing])
+        return await self._aget_cached("text", [text.encode("utf-8") for text in texts], aembed_missing)
+
+
+class CachedMultiModalEmbedding(CachedEmbedding, MultiModalEmbedding):
+    """CachedEmbedding for multimodal models, additionally caching image embeddings keyed on the image file (or content)."""
+
+    _embed_model: MultiModalEmbedding = PrivateAttr()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedMultiModalEmbedding"
+
+    def _get_image_embedding(self, img_file_path: ImageType) -> Embedding:
+        return self._get_image_embeddings([img_file_path])[0]
+
+    async def _aget_image_embedding(self, img_file_path: ImageType) -> Embedding:
+        return (await self._aget_image_embeddings([img_file_path]))[0]
+
+    def _get_image_embeddings(self, img_file_paths: List[ImageType]) -> List[Embedding]:
+        return self._get_cached(
+            "image", [_image_cache_content(path) for path in img_file_paths],
+            lambda missing: self._embed_model._get_image_embeddings([img_file_paths[i] for i in missing]),
+        )
+
+    async def _aget_image_embeddings(self, img_file_paths: List[ImageType]) -> List[Embedding]:
+        async def aembed_missing(missing):
+            return await self._embed_model._aget_image_embeddings([img_file_paths[i] for i in missing])
+        return await self._aget_cached("image", [_image_cache_content(path) for path in img_file_paths], aembed_missing)
+
+
+def with_embedding_cache(embed_model: BaseEmbedding) -> BaseEmbedding:
+    """
+    Wraps the embedding model with the process-wide embedding cache (returns the model
+    itself if the cache is disabled).
+
+    Args:
+        embed_model (BaseEmbedding): embedding model to wrap
+
+    Returns:
+        BaseEmbedding: cached embedding model
+    """
+    cache = get_embedding_cache()
+    if cache is None:
+        return embed_model
+    if isinstance(embed_model, MultiModalEmbedding):
+        return CachedMultiModalEmbedding(embed_model, cache)
+    return CachedEmbedding(embed_model, cache)
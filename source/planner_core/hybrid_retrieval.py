@@ -0,0 +1,175 @@
+import logging
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+
+logger = logging.getLogger("TEXT")
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+# Constant of the reciprocal rank fusion (score = sum of 1 / (RRF_K + rank))
+RRF_K = 60
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens of a text."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Local Okapi BM25 index over the nodes of a LlamaIndex index."""
+
+    def __init__(self, nodes: Sequence[BaseNode], k1: float = 1.5, b: float = 0.75) -> None:
+        """
+        Constructor
+
+        Args:
+            nodes (Sequence[BaseNode]): nodes to index
+            k1 (float): term frequency saturation parameter
+            b (float): document length normalization parameter
+
+        Returns:
+            None
+        """
+        self.nodes: List[BaseNode] = list(nodes)
+        self._k1: float = k1
+        self._b: float = b
+
+        # Inverted index: term -> (node indices, term frequencies)
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        lengths = np.zeros(len(self.nodes))
+        for i, node in enumerate(self.nodes):
+            tokens = tokenize(node.get_content())
+            lengths[i] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings[term][i] = tf
+
+        n_nodes = len(self.nodes)
+        avg_length = lengths.mean() if n_nodes > 0 else 0.0
+        self._length_norm: np.ndarray = k1 * (1 - b + b * lengths / max(avg_length, 1e-9))
+        self._postings: Dict[str, tuple] = {
+            term: (np.fromiter(docs.keys(), dtype=int), np.fromiter(docs.values(), dtype=float))
+            for term, docs in postings.items()
+        }
+        self._idf: Dict[str, float] = {
+            term: math.log(1 + (n_nodes - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in postings.items()
+        }
+        # IDF of a term that occurs in no node
+        self._unseen_idf: float = math.log(1 + (n_nodes + 0.5) / 0.5)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every node for the query."""
+        scores = np.zeros(len(self.nodes))
+        for term in set(tokenize(query)):
+            if term not in self._postings:
+                continue
+            node_ids, tfs = self._postings[term]
+            scores[node_ids] += self._idf[term] * tfs * (self._k1 + 1) / (tfs + self._length_norm[node_ids])
+        return scores
+
+    def reference_score(self, query: str) -> float:
+        """
+        BM25 score of a node of average length containing every query term once (terms
+        that no node contains count with the IDF of an unseen term).
+        """
+        return sum(self._idf.get(term, self._unseen_idf) for term in set(tokenize(query)))
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever combining the local BM25 index with the vector index. When the lexical match
+    is decisive (the best BM25 score is at least `decisive_ratio` times the second best, or,
+    for a single lexical hit, at least `min_decisive_score` times the score of a node
+    containing every query term), the BM25 results are returned directly and the query is not embedded; otherwise
+    the lexical and vector rankings are fused with reciprocal rank fusion.
+    """
+
+    def __init__(
+        self,
+        bm25_index: BM25Index,
+        vector_retriever: BaseRetriever,
+        top_k: int = 3,
+        decisive_ratio: float = 2.0,
+        min_decisive_score: float = 0.5,
+        room_name: Optional[str] = None,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            bm25_index (BM25Index): lexical index over the nodes of the vector index
+            vector_retriever (BaseRetriever): retriever of the vector index (embeds the query)
+            top_k (int): number of nodes to retrieve
+            decisive_ratio (float): ratio between the best and second best BM25 scores above
+                which the lexical results are used without the vector retrieval
+            min_decisive_score (float): minimum BM25 score of a single lexical hit, relative
+                to the score of a node containing every query term (BM25Index.reference_score),
+                to use it without the vector retrieval
+            room_name (optional, str): only retrieve nodes of this room (metadata filter)
+
+        Returns:
+            None
+        """
+        super().__init__()
+        self._bm25_index: BM25Index = bm25_index
+        self._vector_retriever: BaseRetriever = vector_retriever
+        self._top_k: int = top_k
+        self._decisive_ratio: float = decisive_ratio
+        self._min_decisive_score: float = min_decisive_score
+        self._room_name: Optional[str] = room_name
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        start = time.perf_counter()
+        scores = self._bm25_index.scores(query_bundle.query_str)
+        if self._room_name is not None:
+            for i, node in enumerate(self._bm25_index.nodes):
+                if node.metadata.get("room_name") != self._room_name:
+                    scores[i] = 0.0
+        ranking = [int(i) for i in np.argsort(-scores, kind="stable") if scores[i] > 0]
+        lexical_ms = (time.perf_counter() - start) * 1000
+
+        if len(ranking) > 1:
+            is_decisive = scores[ranking[0]] >= self._decisive_ratio * scores[ranking[1]]
+        elif ranking:
+            # A single hit may share only a common word with the query
+            reference_score = self._bm25_index.reference_score(query_bundle.query_str)
+            is_decisive = scores[ranking[0]] >= self._min_decisive_score * reference_score
+        else:
+            is_decisive = False
+        if is_decisive:
+            logger.info(
+                "Lexical retrieval is decisive, skipping the embedding call (retrieval took %.1f ms).",
+                lexical_ms,
+            )
+            return [
+                NodeWithScore(node=self._bm25_index.nodes[i], score=float(scores[i]))
+                for i in ranking[:self._top_k]
+            ]
+
+        vector_start = time.perf_counter()
+        vector_results = self._vector_retriever.retrieve(query_bundle)
+        vector_ms = (time.perf_counter() - vector_start) * 1000
+
+        fused: Dict[str, float] = defaultdict(float)
+        nodes: Dict[str, BaseNode] = {}
+        for rank, i in enumerate(ranking):
+            node = self._bm25_index.nodes[i]
+            fused[node.node_id] += 1 / (RRF_K + rank + 1)
+            nodes[node.node_id] = node
+        for rank, result in enumerate(vector_results):
+            fused[result.node.node_id] += 1 / (RRF_K + rank + 1)
+            nodes[result.node.node_id] = result.node
+
+        logger.info(
+            "Hybrid retrieval took %.1f ms (%.1f ms lexical, %.1f ms embedding and vector search).",
+            lexical_ms + vector_ms, lexical_ms, vector_ms,
+        )
+        best_ids = sorted(fused, key=fused.get, reverse=True)[:self._top_k]
+        return [NodeWithScore(node=nodes[node_id], score=fused[node_id]) for node_id in best_ids]
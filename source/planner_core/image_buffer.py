@@ -0,0 +1,198 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger("main")
+
+
+@dataclass
+class ImageFrame:
+    """A captured camera frame with the state of the robot at capture time."""
+
+    image: np.ndarray
+    source: str
+    timestamp: float = field(default_factory=time.time)
+    depth_image: Optional[np.ndarray] = None
+    robot_pose: Optional[np.ndarray] = None
+    description: Optional[str] = None
+
+    def __str__(self) -> str:
+        pose = np.round(self.robot_pose, 2).tolist() if self.robot_pose is not None else "unknown"
+        description = f" ({self.description})" if self.description else ""
+        return f"{time.strftime('%H:%M:%S', time.localtime(self.timestamp))} {self.source}{description}, robot pose {pose}"
+
+
+class ImageRingBuffer:
+    """Bounded, thread-safe buffer of the most recent camera frames (the oldest frame is dropped when full)."""
+
+    def __init__(self, capacity: int = 32) -> None:
+        """
+        Constructor
+
+        Args:
+            capacity (int): maximum number of frames kept
+
+        Returns:
+            None
+        """
+        self._frames: Deque[ImageFrame] = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._frames)
+
+    def append(self, frame: ImageFrame) -> None:
+        """Adds a frame to the buffer."""
+        with self._lock:
+            self._frames.append(frame)
+
+    def latest(self, source: Optional[str] = None) -> Optional[ImageFrame]:
+        """
+        Gets the most recent frame.
+
+        Args:
+            source (optional, str): only consider frames of this camera
+
+        Returns:
+            Optional[ImageFrame]: the most recent frame, None if there is none
+        """
+        frames = self.recent(1, source)
+        return frames[0] if frames else None
+
+    def recent(self, count: Optional[int] = None, source: Optional[str] = None,
+               max_age: Optional[float] = None) -> List[ImageFrame]:
+        """
+        Gets the most recent frames, newest first.
+
+        Args:
+            count (optional, int): maximum number of frames (all frames if None)
+            source (optional, str): only consider frames of this camera
+            max_age (optional, float): only consider frames captured at most this many seconds ago
+
+        Returns:
+            List[ImageFrame]: the frames
+        """
+        now = time.time()
+        with self._lock:
+            frames = list(self._frames)
+        selected = []
+        for frame in reversed(frames):
+            if count is not None and len(selected) >= count:
+                break
+            if source is not None and frame.source != source:
+                continue
+            if max_age is not None and now - frame.timestamp > max_age:
+                break
+            selected.append(frame)
+        return selected
+
+
+class ImageWriter:
+    """
+    Background thread writing images to disk. The queue is bounded: when the thread cannot
+    keep up, the oldest pending image is dropped so that the callers never block on encoding.
+    """
+
+    def __init__(self, max_queue_size: int = 16) -> None:
+        """
+        Constructor
+
+        Args:
+            max_queue_size (int): maximum number of images waiting to be written
+
+        Returns:
+            None
+        """
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Path]]]" = queue.Queue(maxsize=max(1, max_queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped: int = 0
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="image-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                image, path = item
+                path.parent.mkdir(parents=True, exist_ok=True)
+                Image.fromarray(image).save(path)
+            except Exception as e:
+                logger.error("Error writing image %s: %s", item[1] if item else None, e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, image: np.ndarray, path: Path) -> None:
+        """
+        Queues an image to be written as a file (format given by the suffix of the path).
+
+        Args:
+            image (np.ndarray): the image
+            path (Path): file to write
+
+        Returns:
+            None
+        """
+        self._ensure_started()
+        while True:
+            try:
+                self._queue.put_nowait((image, Path(path)))
+                return
+            except queue.Full:
+                try:
+                    dropped = self._queue.get_nowait()
+                    self._queue.task_done()
+                except queue.Empty:
+                    continue
+                self.dropped += 1
+                logger.warning("Image writer queue full, dropped the oldest pending image %s.", dropped[1] if dropped else None)
+
+    def flush(self) -> None:
+        """Blocks until all queued images are written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Writes the queued images and stops the thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self.flush()
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+
+_image_writer: Optional[ImageWriter] = None
+_image_writer_lock = threading.Lock()
+
+
+def get_image_writer(max_queue_size: int = 16) -> ImageWriter:
+    """Gets the image writer shared by all robot states (created on first use)."""
+    global _image_writer
+    with _image_writer_lock:
+        if _image_writer is None:
+            _image_writer = ImageWriter(max_queue_size)
+        return _image_writer
+
+
+def _stop_image_writer() -> None:
+    if _image_writer is not None:
+        _image_writer.stop()
+
+
+atexit.register(_stop_image_writer)
@@ -0,0 +1,159 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from llama_index.core import Document
+from llama_index.core.indices.base import BaseIndex
+
+from planner_core.rag_document_loaders import IMAGE_EXTENSIONS
+from utils.files import file_sha256
+
+logger = logging.getLogger("main")
+
+MANIFEST_FILE_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class ManifestDiff:
+    """Differences between the sources an index was built from and the current sources."""
+
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    @property
+    def to_load(self) -> List[str]:
+        """Sources whose documents have to be (re-)embedded and inserted."""
+        return self.added + self.changed
+
+    @property
+    def stale(self) -> List[str]:
+        """Sources whose documents have to be deleted from the index."""
+        return self.changed + self.removed
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def __str__(self) -> str:
+        return f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed"
+
+
+class IndexManifest:
+    """
+    Manifest persisted next to an index (persist_dir/manifest.json), mapping each source
+    (file, class name, ...) the index was built from to its content hash.
+    """
+
+    def __init__(self, sources: Optional[Dict[str, str]] = None, source_version: Optional[str] = None) -> None:
+        """
+        Constructor
+
+        Args:
+            sources (optional, Dict[str, str]): source key -> content hash
+            source_version (optional, str): hash of the whole input (e.g. the scene JSON),
+                allowing to skip the per-source comparison when nothing changed
+
+        Returns:
+            None
+        """
+        self.sources: Dict[str, str] = dict(sources or {})
+        self.source_version: Optional[str] = source_version
+
+    @classmethod
+    def load(cls, persist_dir: Path) -> Optional["IndexManifest"]:
+        """Loads the manifest of the index persisted in persist_dir (None if there is no valid manifest)."""
+        path = Path(persist_dir) / MANIFEST_FILE_NAME
+        if not path.is_file():
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("Ignoring unreadable index manifest %s: %s", path, e)
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(data.get("sources", {}), data.get("source_version"))
+
+    def save(self, persist_dir: Path) -> None:
+        """Writes the manifest to persist_dir."""
+        persist_dir = Path(persist_dir)
+        persist_dir.mkdir(parents=True, exist_ok=True)
+        with open(persist_dir / MANIFEST_FILE_NAME, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": MANIFEST_VERSION, "source_version": self.source_version, "sources": self.sources},
+                file, indent=2, sort_keys=True,
+            )
+
+    def diff(self, current_sources: Dict[str, str]) -> ManifestDiff:
+        """Compares the sources recorded in the manifest with the current sources."""
+        return ManifestDiff(
+            added=sorted(key for key in current_sources if key not in self.sources),
+            changed=sorted(
+                key for key, digest in current_sources.items()
+                if key in self.sources and self.sources[key] != digest
+            ),
+            removed=sorted(key for key in self.sources if key not in current_sources),
+        )
+
+
+def hash_text_sources(text_dir: Path) -> Dict[str, str]:
+    """
+    Hashes the text files used by load_text_documents.
+
+    Args:
+        text_dir (Path): path to the directory with .txt files
+
+    Returns:
+        Dict[str, str]: file name -> SHA-256 of the file
+    """
+    return {
+        entry.name: file_sha256(entry)
+        for entry in sorted(text_dir.iterdir())
+        if entry.name.endswith(".txt")
+    }
+
+
+def hash_image_sources(image_dir: Path) -> Dict[str, str]:
+    """
+    Hashes the images used by load_image_documents.
+
+    Args:
+        image_dir (Path): path to the directory with one subdirectory of images per room
+
+    Returns:
+        Dict[str, str]: '<room>/<file name>' -> SHA-256 of the image
+    """
+    image_files = {
+        f"{room_dir.name}/{entry.name}": entry
+        for room_dir in sorted(image_dir.iterdir()) if room_dir.is_dir()
+        for entry in sorted(room_dir.iterdir())
+        if entry.is_file() and entry.suffix.lower() in IMAGE_EXTENSIONS
+    }
+    # hashlib releases the GIL for large buffers, so the images are hashed in parallel
+    with ThreadPoolExecutor() as executor:
+        return dict(zip(image_files, executor.map(file_sha256, image_files.values())))
+
+
+def refresh_index(index: BaseIndex, diff: ManifestDiff, documents: Iterable[Document]) -> None:
+    """
+    Applies the source changes to an index whose documents use the source keys as ids:
+    the documents of changed and removed sources are deleted and the documents of added
+    and changed sources are embedded and inserted.
+
+    Args:
+        index (BaseIndex): index to update in place
+        diff (ManifestDiff): differences between the indexed and the current sources
+        documents (Iterable[Document]): documents of the sources in diff.to_load
+
+    Returns:
+        None
+    """
+    for ref_doc_id in diff.stale:
+        index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+    for document in documents:
+        index.insert(document)
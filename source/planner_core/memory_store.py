@@ -0,0 +1,198 @@
+import logging
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from planner_core.hybrid_retrieval import tokenize
+from utils.recursive_config import Config
+
+logger = logging.getLogger("main")
+
+# Without an embedding model only (near) exact duplicates are replaced
+LEXICAL_DUPLICATE_THRESHOLD = 0.95
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough number of LLM tokens of a text (about 4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def _numeric_tokens(text: str) -> frozenset:
+    """Tokens containing a digit (object ids, counts, distances, ...)."""
+    return frozenset(token for token in tokenize(text) if re.search(r"\d", token))
+
+
+@dataclass
+class MemoryEntry:
+    """A piece of core information stored by an agent."""
+
+    text: str
+    source: str
+    timestamp: float = field(default_factory=time.time)
+    embedding: Optional[np.ndarray] = None
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+    def __str__(self) -> str:
+        return f"[{datetime.fromtimestamp(self.timestamp).strftime('%H:%M:%S')}, {self.source}] {self.text}"
+
+
+class CoreMemory:
+    """
+    Bounded store of the core information acquired by the agents during a goal. Entries
+    similar to an existing entry replace it instead of being added, the oldest entries are
+    evicted when the token budget is exceeded, and prompts only get the entries most
+    relevant to the current goal or task.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1000,
+        prompt_tokens: int = 400,
+        similarity_threshold: float = 0.85,
+        embed_model: Optional[BaseEmbedding] = None,
+    ) -> None:
+        """
+        Constructor
+
+        Args:
+            max_tokens (int): token budget of all stored entries
+            prompt_tokens (int): token budget of the entries added to a prompt
+            similarity_threshold (float): cosine similarity of the embeddings above which a new
+                entry replaces an existing one (entries with different ids/numbers are kept)
+            embed_model (optional, BaseEmbedding): embedding model for the similarities, if
+                None token count vectors are compared and only near exact duplicates replaced
+
+        Returns:
+            None
+        """
+        self.entries: List[MemoryEntry] = []
+        self._max_tokens: int = max_tokens
+        self._prompt_tokens: int = prompt_tokens
+        self._similarity_threshold: float = similarity_threshold
+        self._embed_model: Optional[BaseEmbedding] = embed_model
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        if self._embed_model is None:
+            return None
+        try:
+            embedding = np.asarray(self._embed_model.get_text_embedding(text), dtype=float)
+        except Exception as e:
+            logger.warning("Could not embed the core memory text, using lexical similarity: %s", e)
+            return None
+        return embedding / max(np.linalg.norm(embedding), 1e-12)
+
+    @staticmethod
+    def _lexical_similarity(counts: Counter, other_text: str) -> float:
+        other_counts = Counter(tokenize(other_text))
+        dot = sum(c * other_counts[token] for token, c in counts.items())
+        norm = np.sqrt(sum(c * c for c in counts.values())) * np.sqrt(sum(c * c for c in other_counts.values()))
+        return dot / max(norm, 1e-12)
+
+    def _similarities(self, text: str, embedding: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Similarities of the text to the entries and whether each of them is semantic (embeddings) or lexical."""
+        similarities = np.zeros(len(self.entries))
+        semantic = np.zeros(len(self.entries), dtype=bool)
+        counts = Counter(tokenize(text))
+        for i, entry in enumerate(self.entries):
+            if embedding is not None and entry.embedding is not None:
+                similarities[i] = float(entry.embedding @ embedding)
+                semantic[i] = True
+            else:
+                similarities[i] = self._lexical_similarity(counts, entry.text)
+        return similarities, semantic
+
+    def store(self, text: str, source: str) -> Tuple[MemoryEntry, bool]:
+        """
+        Stores a piece of information.
+
+        Args:
+            text (str): the information
+            source (str): name of the agent storing it
+
+        Returns:
+            Tuple[MemoryEntry, bool]: the stored entry and whether it replaced a similar entry
+        """
+        embedding = self._embed(text)
+        similarities, semantic = self._similarities(text, embedding)
+        entry = MemoryEntry(text=text.strip(), source=source, embedding=embedding)
+
+        # Entries about other objects/quantities (different ids or numbers) are never duplicates
+        numeric_tokens = _numeric_tokens(text)
+        thresholds = np.where(semantic, self._similarity_threshold, max(self._similarity_threshold, LEXICAL_DUPLICATE_THRESHOLD))
+        candidates = [
+            i for i, existing in enumerate(self.entries)
+            if similarities[i] >= thresholds[i] and _numeric_tokens(existing.text) == numeric_tokens
+        ]
+        replaced = len(candidates) > 0
+        if replaced:
+            # The newer information supersedes the similar one
+            duplicate = self.entries.pop(max(candidates, key=lambda i: similarities[i]))
+            logger.info("Core memory entry '%s' replaced by '%s'.", duplicate.text, entry.text)
+        self.entries.append(entry)
+
+        while sum(e.tokens for e in self.entries) > self._max_tokens and len(self.entries) > 1:
+            evicted = self.entries.pop(0)
+            logger.info("Core memory budget exceeded, evicted the oldest entry: %s", evicted.text)
+        return entry, replaced
+
+    def retrieve(self, query: str, max_tokens: Optional[int] = None) -> List[MemoryEntry]:
+        """
+        Gets the entries most relevant to the query within a token budget.
+
+        Args:
+            query (str): the current goal/task
+            max_tokens (optional, int): token budget (the prompt budget if None)
+
+        Returns:
+            List[MemoryEntry]: the selected entries in chronological order
+        """
+        max_tokens = self._prompt_tokens if max_tokens is None else max_tokens
+        if not self.entries:
+            return []
+        similarities, _ = self._similarities(query, self._embed(query))
+        # Most relevant first, the most recent first among equally relevant entries
+        order = sorted(range(len(self.entries)), key=lambda i: (-similarities[i], -self.entries[i].timestamp))
+        selected, used = [], 0
+        for i in order:
+            if used + self.entries[i].tokens <= max_tokens:
+                selected.append(i)
+                used += self.entries[i].tokens
+        return [self.entries[i] for i in sorted(selected)]
+
+    def get_prompt(self, query: str) -> str:
+        """Formats the entries relevant to the query (the current goal/task) for a prompt."""
+        entries = self.retrieve(query)
+        if not entries:
+            return "No core information stored yet."
+        return "\n".join(f"- {entry}" for entry in entries)
+
+    def __str__(self) -> str:
+        return "\n".join(f"- {entry}" for entry in self.entries)
+
+
+def create_core_memory(embed_model: Optional[BaseEmbedding] = None) -> CoreMemory:
+    """
+    Creates an empty core memory with the budgets of the configuration (core_memory section).
+
+    Args:
+        embed_model (optional, BaseEmbedding): embedding model for the similarities
+
+    Returns:
+        CoreMemory: the core memory
+    """
+    settings = Config().get("core_memory", {})
+    return CoreMemory(
+        max_tokens=settings.get("max_tokens", 1000),
+        prompt_tokens=settings.get("prompt_tokens", 400),
+        similarity_threshold=settings.get("similarity_threshold", 0.85),
+        embed_model=embed_model,
+    )
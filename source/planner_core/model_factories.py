@@ -14,6 +14,7 @@ from llama_index.multi_modal_llms.openai import OpenAIMultiModal
 
 from planner_core.interfaces import AbstractLlmChat, AbstractLlmChatFactory, AbstractModelFactory
 from planner_core.config_handler import ConfigHandler, ConfigPrefix
+from planner_core.embedding_cache import with_embedding_cache
 
 # region OpenAI Model Factory Implementation
 class OpenAiLlmChat(AbstractLlmChat):
@@ -79,11 +80,11 @@ class OpenAiModelFactory(AbstractModelFactory):
 
     def get_embed_model(self, config_type: ConfigPrefix) -> BaseEmbedding:
         cnf = self.config_h.get_config(config_type)
-        return OpenAIEmbedding(
+        return with_embedding_cache(OpenAIEmbedding(
             model=cnf.embed_model,
             api_key=cnf.api_key,
             max_tokens=2000,
-        )
+        ))
 # endregion OpenAI Model Factory Implementation
 
 # region Azure OpenAI Model Factory Implementation
@@ -164,7 +165,7 @@ class AzureOpenAiModelFactory(AbstractModelFactory):
         token_provider = get_bearer_token_provider(
             DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
         )
-        return AzureOpenAIEmbedding(
+        return with_embedding_cache(AzureOpenAIEmbedding(
             model=cnf.embed_model,
             deployment_name=cnf.embed_deployment,
             use_azure_ad=True,
@@ -172,5 +173,5 @@ class AzureOpenAiModelFactory(AbstractModelFactory):
             base_url=f"{cnf.endpoint}/openai/deployments/{cnf.embed_deployment}",
             api_version=cnf.api_version,
             max_tokens=2000,
-        )
+        ))
 # endregion Azure OpenAI Model Factory Implementation
\ No newline at end of file
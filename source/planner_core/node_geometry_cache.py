@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import pickle
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import open3d as o3d
+
+from planner_core.scene_graph_store import points_digest
+
+logger = logging.getLogger("main")
+
+NODE_GEOMETRY_CACHE_FILE_NAME = "node_geometry_cache.pkl"
+NODE_GEOMETRY_CACHE_VERSION = 1
+
+
+def snap_to_cardinal(normal: np.ndarray) -> np.ndarray:
+    """
+    Snaps a normal vector to the closest cardinal direction in the XY plane.
+
+    Args:
+        normal: The normal vector to snap
+
+    Returns:
+        The snapped normal vector (aligned to X or Y axis)
+    """
+    # Get the XY component and normalize it
+    normal_xy = np.array([normal[0], normal[1], 0])
+    if np.linalg.norm(normal_xy) < 1e-6:  # Handle zero vector case
+        return np.array([1, 0, 0])  # Default to X-axis
+
+    normal_xy = normal_xy / np.linalg.norm(normal_xy)
+
+    # Determine the closest cardinal direction
+    # We check which cardinal direction has the highest dot product
+    cardinal_directions = [
+        np.array([1, 0, 0]),   # +X
+        np.array([0, 1, 0]),   # +Y
+        np.array([-1, 0, 0]),  # -X
+        np.array([0, -1, 0]),  # -Y
+    ]
+
+    dot_products = [np.dot(normal_xy, cardinal) for cardinal in cardinal_directions]
+    best_idx = np.argmax(np.abs(dot_products))
+
+    # Use the sign of the dot product to determine direction
+    if dot_products[best_idx] < 0:
+        return -cardinal_directions[best_idx]  # Return opposite direction
+    else:
+        return cardinal_directions[best_idx]
+
+
+def get_vertical_faces(R: np.ndarray, extents: np.ndarray, center: np.ndarray) -> List[dict]:
+    """
+    Gets the vertical faces of an oriented bounding box.
+
+    Args:
+        R (np.ndarray): rotation of the bounding box (3, 3)
+        extents (np.ndarray): extents of the bounding box along its axes (3,)
+        center (np.ndarray): center of the object
+
+    Returns:
+        List[dict]: faces with their normal snapped to a cardinal direction, original normal,
+            area, center and half width/height
+    """
+    vertical_faces = []
+    for axis in range(3):
+        for direction in [1, -1]:
+            # calculate face normal
+            normal = R[:, axis] * direction
+            # check if normal is roughly horizontal (= vertical face)
+            if abs(normal[2]) < 0.1:
+                # calculate face dimensions
+                dim1 = (axis + 1) % 3
+                dim2 = (axis + 2) % 3
+                area = extents[dim1] * extents[dim2]
+                # the face width is the extent of the horizontal face axis, its height the extent of the vertical one
+                vertical_dim, horizontal_dim = sorted((dim1, dim2), key=lambda dim: abs(R[2, dim]), reverse=True)
+
+                # Snap normal to cardinal direction in XY plane
+                snapped_normal = snap_to_cardinal(normal)
+
+                vertical_faces.append({
+                    'normal': snapped_normal,
+                    'original_normal': normal,
+                    'area': area,
+                    'center': center + snapped_normal * extents[axis] / 2,
+                    'half_size': (extents[horizontal_dim] / 2, extents[vertical_dim] / 2),
+                })
+    return vertical_faces
+
+
+@dataclass
+class NodeGeometry:
+    """Geometry of a scene graph node derived from its points."""
+
+    key: str
+    points: np.ndarray
+    obb_center: np.ndarray
+    obb_R: np.ndarray
+    obb_extent: np.ndarray
+    vertical_faces: List[dict] = field(default_factory=list)
+
+
+def _node_key(node) -> str:
+    # The digest of points loaded from the scene graph store is known without reading them
+    digest = hashlib.blake2b(points_digest(node.points).encode(), digest_size=16)
+    digest.update(np.asarray(node.centroid, dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+class NodeGeometryCache:
+    """
+    Cache of the geometry of the scene graph nodes (voxel-downsampled points, oriented
+    bounding box and vertical faces), persisted next to the scene graph. An entry is keyed
+    on a hash of the node points and centroid and recomputed when the node changes.
+    """
+
+    def __init__(self, path: Optional[Path] = None, voxel_size: float = 0.02) -> None:
+        """
+        Constructor
+
+        Args:
+            path (optional, Path): file the cache is persisted to
+            voxel_size (float): voxel size used to downsample the node points, in meters
+
+        Returns:
+            None
+        """
+        self._path: Optional[Path] = Path(path) if path is not None else None
+        self._voxel_size: float = voxel_size
+        self._entries: Dict[int, NodeGeometry] = {}
+        # Points arrays already checked against the entries (restored scene graphs share them)
+        self._verified: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        if self._path is not None and self._path.is_file():
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self._path, "rb") as file:
+                data = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning("Ignoring unreadable node geometry cache %s: %s", self._path, e)
+            return
+        if data.get("version") == NODE_GEOMETRY_CACHE_VERSION and data.get("voxel_size") == self._voxel_size:
+            self._entries = data["entries"]
+
+    def save(self) -> None:
+        """Persists the cache."""
+        if self._path is None:
+            return
+        with open(self._path, "wb") as file:
+            pickle.dump(
+                {"version": NODE_GEOMETRY_CACHE_VERSION, "voxel_size": self._voxel_size, "entries": self._entries},
+                file,
+            )
+
+    def _compute(self, node, key: str) -> NodeGeometry:
+        pcd = o3d.geometry.PointCloud()
+        pcd.points = o3d.utility.Vector3dVector(np.asarray(node.points, dtype=float))
+        pcd = pcd.voxel_down_sample(self._voxel_size)
+        obb = pcd.get_oriented_bounding_box()
+        R, extent = np.asarray(obb.R), np.asarray(obb.extent)
+        return NodeGeometry(
+            key=key,
+            points=np.asarray(pcd.points),
+            obb_center=np.asarray(obb.center),
+            obb_R=R,
+            obb_extent=extent,
+            vertical_faces=get_vertical_faces(R, extent, np.asarray(node.centroid, dtype=float)),
+        )
+
+    def get(self, node_id: int, node) -> NodeGeometry:
+        """
+        Gets the geometry of a node, (re)computing it if the node is not cached or changed.
+
+        Args:
+            node_id (int): id of the node
+            node (ObjectNode): the scene graph node
+
+        Returns:
+            NodeGeometry: geometry of the node
+        """
+        entry = self._entries.get(node_id)
+        verified = self._verified.get(node_id)
+        if (entry is not None and verified is not None and verified[0] is node.points
+                and np.array_equal(verified[1], node.centroid)):
+            return entry
+
+        key = _node_key(node)
+        if entry is None or entry.key != key:
+            entry = self._entries[node_id] = self._compute(node, key)
+        self._verified[node_id] = (node.points, np.array(node.centroid, dtype=float))
+        return entry
+
+    def update(self, scene_graph) -> None:
+        """
+        Computes the geometry of all nodes of the scene graph that are not cached yet or
+        changed, drops the entries of removed nodes and persists the cache if it changed.
+
+        Args:
+            scene_graph (SceneGraph): scene graph to cache the geometry of
+
+        Returns:
+            None
+        """
+        start = time.perf_counter()
+        before = dict(self._entries)
+        for node_id, node in scene_graph.nodes.items():
+            self.get(node_id, node)
+        for node_id in set(self._entries) - set(scene_graph.nodes):
+            del self._entries[node_id]
+        changed = [node_id for node_id, entry in self._entries.items() if before.get(node_id) is not entry]
+        if changed or len(before) != len(self._entries):
+            self.save()
+        logger.info(
+            "Node geometry cache ready in %.2f s (%d of %d nodes computed).",
+            time.perf_counter() - start, len(changed), len(self._entries),
+        )
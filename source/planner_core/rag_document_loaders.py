@@ -1,60 +1,116 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Iterable, List, Optional
 import base64
 from mimetypes import guess_type
 
-from llama_index.core import Document, SimpleDirectoryReader
+from llama_index.core import Document
 from llama_index.core.schema import ImageDocument
 
+logger = logging.getLogger("IMAGE")
 
-def load_text_documents(dir_path: Path) -> List[Document]:
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+
+def load_text_documents(dir_path: Path, file_names: Optional[Iterable[str]] = None) -> List[Document]:
     """
     Loads the textual data from files in a directory into LLamaIndex's
     Documents (each file being a separate document, its metadata's
-    specifying the room name)
+    specifying the room name and its id being the file name)
 
     Args:
         dir_path (Path): path to the directory with .txt files
+        file_names (optional, Iterable[str]): names of the files to load (all if None)
 
     Returns:
         List[Document]: list of documents created from the files
     """
+    selected = set(file_names) if file_names is not None else None
     docs: List[Document] = []
     for entry in dir_path.iterdir():
-        if entry.name.endswith(".txt"):
+        if entry.name.endswith(".txt") and (selected is None or entry.name in selected):
             with entry.open("r") as file:
                 content = file.read()
-                docs.append(Document(text=content, metadata={"room_name": entry.stem}))
+                docs.append(Document(text=content, metadata={"room_name": entry.stem}, id_=entry.name))
 
     return docs
 
 
-def load_image_documents(dir_path: Path) -> List[Document]:
+def _image_file_to_document(image_path: Path, room_name: str) -> ImageDocument:
+    """
+    Creates the document of an image file (referencing the file, the image itself is
+    only decoded when embedded).
+
+    Args:
+        image_path (Path): path to the image
+        room_name (str): name of the room the image was taken in
+
+    Returns:
+        ImageDocument: document with the same file metadata as SimpleDirectoryReader's
+    """
+    stat = image_path.stat()
+    mime_type, _ = guess_type(str(image_path))
+    return ImageDocument(
+        id_=f"{room_name}/{image_path.name}",
+        image_path=str(image_path),
+        image_mimetype=mime_type,
+        metadata={
+            "file_path": str(image_path),
+            "file_name": image_path.name,
+            "file_type": mime_type,
+            "file_size": stat.st_size,
+            "creation_date": datetime.fromtimestamp(stat.st_ctime).strftime("%Y-%m-%d"),
+            "last_modified_date": datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d"),
+            "room_name": room_name,
+        },
+    )
+
+
+def load_image_documents(
+    dir_path: Path, file_names: Optional[Iterable[str]] = None, max_workers: Optional[int] = None
+) -> List[Document]:
     """
     Loads the images (PNG, JPG, JPEG formats) from a specified directory
     into LLamaIndex's Documents; the directory contains subdirectories
-    whose name indicate the corresponding room name
+    whose name indicate the corresponding room name. The id of each document
+    is '<room name>/<file name>'. The documents are created in a thread pool.
 
     Args:
         dir_path (Path): path to the directory with subdirectories
             containing corresponding images
+        file_names (optional, Iterable[str]): '<room name>/<file name>' of the
+            images to load (all if None)
+        max_workers (optional, int): number of threads (None for the default)
 
     Returns:
         List[Document]: list of documents created from the images
     """
+    selected = set(file_names) if file_names is not None else None
+    image_files = [
+        (entry, room_dir.name)
+        for room_dir in sorted(dir_path.iterdir()) if room_dir.is_dir()
+        for entry in sorted(room_dir.iterdir())
+        if entry.is_file()
+        and entry.suffix.lower() in IMAGE_EXTENSIONS
+        and (selected is None or f"{room_dir.name}/{entry.name}" in selected)
+    ]
+
+    start = time.perf_counter()
     docs = []
-    for entry in dir_path.iterdir():
-        if entry.is_dir():
-            curr_docs = SimpleDirectoryReader(
-                input_dir=dir_path / entry.name, required_exts=[".png", ".jpg", ".jpeg"]
-            ).load_data()
-            for i in range(len(curr_docs)):
-                curr_docs[i].metadata = {
-                    **curr_docs[i].metadata,
-                    "room_name": entry.name,
-                }
-            docs.extend(curr_docs)
-
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_image_file_to_document, path, room) for path, room in image_files]
+        for i, future in enumerate(futures, start=1):
+            docs.append(future.result())
+            if i % 500 == 0:
+                logger.info("Loaded %d/%d images", i, len(futures))
+    duration = time.perf_counter() - start
+    logger.info(
+        "Loaded %d images in %.2f s (%.1f images/s)",
+        len(docs), duration, len(docs) / max(duration, 1e-9),
+    )
     return docs
 
 
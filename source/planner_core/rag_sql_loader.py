@@ -1,13 +1,29 @@
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import json
+import logging
+import math
+import os
 
-from sqlalchemy import create_engine, Column, String, Integer, Float, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, inspect, text, Column, String, Integer, Float, ForeignKey, Index
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import declarative_base
 from llama_index.core import SQLDatabase
 
+from utils.files import file_sha256
+
 Base = declarative_base()
 
+logger = logging.getLogger("SQL")
+
+# Prefix of the cached, file-backed databases: <persist_dir>/<prefix>v<schema version>_<hash of the source JSON>.sqlite
+SQL_DB_FILE_PREFIX = "sql_db_"
+# Bump whenever the schema (tables, indexes) changes, such that cached databases get rebuilt
+SQL_DB_SCHEMA_VERSION = 2
+
+# SQLite R-tree virtual table over the axis-aligned bounding boxes of the detected objects
+SPATIAL_INDEX_TABLE = "detected_objects_rtree"
+
 
 class Room(Base):
     """
@@ -35,8 +51,8 @@ class DetectedObject(Base):
 
     __tablename__ = "detected_objects"
     id = Column(Integer, primary_key=True)
-    class_name = Column(String(16), nullable=False)
-    room = Column(String(16), ForeignKey("rooms.room"), nullable=False)
+    class_name = Column(String(16), nullable=False, index=True)
+    room = Column(String(16), ForeignKey("rooms.room"), nullable=False, index=True)
     position_x = Column(Float)
     position_y = Column(Float)
     position_z = Column(Float)
@@ -44,6 +60,10 @@ class DetectedObject(Base):
     size_y = Column(Float)
     size_z = Column(Float)
 
+    __table_args__ = (
+        Index("ix_detected_objects_position", "position_x", "position_y", "position_z"),
+    )
+
     _column_to_index: str = "class_name"
 
 
@@ -89,39 +109,146 @@ def parse_data(data: dict) -> Tuple[List[dict], List[dict]]:
     return rows_rooms, rows_objects
 
 
-def load_sql_database(json_file_path: Path) -> SQLDatabase:
+def dist3d(x1: float, y1: float, z1: float, x2: float, y2: float, z2: float) -> Optional[float]:
+    """Euclidean distance between two 3D points, registered as SQL function `dist3d`."""
+    if None in (x1, y1, z1, x2, y2, z2):
+        return None
+    return math.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2 + (z1 - z2) ** 2)
+
+
+def within_radius(x1: float, y1: float, z1: float, x2: float, y2: float, z2: float, radius: float) -> Optional[int]:
+    """1 if the two 3D points are at most radius apart, else 0. Registered as SQL function `within_radius`."""
+    if None in (x1, y1, z1, x2, y2, z2, radius):
+        return None
+    return int((x1 - x2) ** 2 + (y1 - y2) ** 2 + (z1 - z2) ** 2 <= radius ** 2)
+
+
+def _register_spatial_functions(dbapi_connection, _connection_record) -> None:
+    """Registers the spatial SQL functions on every new SQLite connection of an engine."""
+    dbapi_connection.create_function("dist3d", 6, dist3d, deterministic=True)
+    dbapi_connection.create_function("within_radius", 7, within_radius, deterministic=True)
+
+
+def _create_spatial_index(engine: Engine) -> None:
     """
-    Loads a SQL database from a JSON file containing room and object information.
+    Creates and fills the R-tree virtual table over the bounding boxes of the detected objects.
+    Skipped (with a warning) if the SQLite build does not include the R-tree module.
 
     Args:
-        json_file_path (Path): path to the JSON file containing object detections and room information
+        engine (Engine): engine of the database with a populated detected_objects table
+    """
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {SPATIAL_INDEX_TABLE} "
+                "USING rtree(id, min_x, max_x, min_y, max_y, min_z, max_z)"
+            ))
+            conn.execute(text(
+                f"INSERT INTO {SPATIAL_INDEX_TABLE} "
+                "SELECT id, "
+                "position_x - size_x / 2, position_x + size_x / 2, "
+                "position_y - size_y / 2, position_y + size_y / 2, "
+                "position_z - size_z / 2, position_z + size_z / 2 "
+                f"FROM {DetectedObject.__tablename__}"
+            ))
+    except Exception as e:
+        logger.warning("Could not create the R-tree spatial index (%s), falling back to full scans.", e)
 
-    Returns:
-        SQLDatabase: SQL database with room- and object-related tables
+
+def has_spatial_index(sql_db: SQLDatabase) -> bool:
+    """Whether the R-tree spatial index exists in the given database."""
+    return inspect(sql_db.engine).has_table(SPATIAL_INDEX_TABLE)
+
+
+def _populate_database(engine: Engine, json_file_path: Path) -> None:
+    """
+    Creates the tables (including their secondary indexes) and bulk inserts the rows
+    parsed from the JSON file with one executemany per table, in a single transaction.
+
+    Args:
+        engine (Engine): engine of the (empty) database to populate
+        json_file_path (Path): path to the JSON file containing object detections and room information
     """
-    f = open(json_file_path)
-    data = json.load(f)
+    with open(json_file_path) as f:
+        data = json.load(f)
 
     rows_rooms, rows_objects = parse_data(data)
 
-    engine = create_engine("sqlite:///:memory:")
     Base.metadata.create_all(engine)
-    Session = sessionmaker(bind=engine)
-    session = Session()
+    with engine.begin() as conn:
+        if rows_rooms:
+            conn.execute(Room.__table__.insert(), rows_rooms)
+        if rows_objects:
+            conn.execute(DetectedObject.__table__.insert(), rows_objects)
 
-    try:
-        session.add_all([Room(**room) for room in rows_rooms])
-        session.add_all([DetectedObject(**obj) for obj in rows_objects])
-        session.commit()
-    except Exception as e:
-        session.rollback()
-        raise e
-    finally:
-        session.close()
+    _create_spatial_index(engine)
+
+
+def _get_cached_engine(json_file_path: Path, db_dir: Path, source_hash: str) -> Engine:
+    """
+    Returns an engine for the file-backed database in db_dir that corresponds to the
+    current content of the JSON file. The database is (re)built only if no database
+    exists for the hash of the JSON file; stale databases are removed.
+
+    Args:
+        json_file_path (Path): path to the JSON file containing object detections and room information
+        db_dir (Path): directory in which the database files of the scene are cached
+        source_hash (str): SHA-256 digest of the JSON file
+
+    Returns:
+        Engine: engine connected to the cached database
+    """
+    db_dir.mkdir(parents=True, exist_ok=True)
+    db_path = db_dir / f"{SQL_DB_FILE_PREFIX}v{SQL_DB_SCHEMA_VERSION}_{source_hash[:16]}.sqlite"
+
+    if not db_path.is_file():
+        logger.info("Building SQL database cache %s from %s", db_path, json_file_path)
+        for stale_db_path in db_dir.glob(f"{SQL_DB_FILE_PREFIX}*.sqlite"):
+            stale_db_path.unlink()
+
+        # Build into a temporary file first, such that an interrupted build never leaves a partial cache behind
+        tmp_db_path = db_path.with_suffix(".sqlite.tmp")
+        if tmp_db_path.exists():
+            tmp_db_path.unlink()
+        tmp_engine = create_engine(f"sqlite:///{tmp_db_path}")
+        try:
+            _populate_database(tmp_engine, json_file_path)
+        finally:
+            tmp_engine.dispose()
+        os.replace(tmp_db_path, db_path)
+    else:
+        logger.info("Using cached SQL database %s", db_path)
+
+    return create_engine(f"sqlite:///{db_path}")
+
+
+def load_sql_database(json_file_path: Path, db_dir: Optional[Path] = None) -> Tuple[SQLDatabase, str]:
+    """
+    Loads a SQL database from a JSON file containing room and object information.
+    The spatial SQL functions `dist3d` and `within_radius` are registered on all its connections.
+
+    Args:
+        json_file_path (Path): path to the JSON file containing object detections and room information
+        db_dir (Optional[Path]): directory in which the database is cached as an SQLite file,
+            keyed on the hash of the JSON file. If None, an in-memory database is built.
+
+    Returns:
+        Tuple[SQLDatabase, str]: SQL database with room- and object-related tables and the
+            SHA-256 digest of the JSON file (the version of the database)
+    """
+    source_hash = file_sha256(json_file_path)
+    if db_dir is None:
+        engine = create_engine("sqlite:///:memory:")
+        event.listen(engine, "connect", _register_spatial_functions)
+        _populate_database(engine, json_file_path)
+    else:
+        engine = _get_cached_engine(Path(json_file_path), Path(db_dir), source_hash)
+        event.listen(engine, "connect", _register_spatial_functions)
 
-    return SQLDatabase(
+    sql_db = SQLDatabase(
         engine, include_tables=[Room.__tablename__, DetectedObject.__tablename__]
     )
+    return sql_db, source_hash
 
 
 def get_dict_to_index() -> Tuple[str, str]:
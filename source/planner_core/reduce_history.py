@@ -32,15 +32,15 @@ else:
 
 
 # will only reduce every (threshold - untouched_messages - 1) messages
-async def reduce_and_log_chat_history(chat_thread, thread_name, threshold=10, untouched_messages=3):
-    """Helper function to reduce chat history and log the results."""
+async def reduce_and_log_chat_history(chat_thread, thread_name, threshold=10, untouched_messages=3) -> bool:
+    """Helper function to reduce chat history and log the results. Returns whether the history was reduced."""
     try:
         initial_messages = await chat_thread.get_messages()
         initial_count = len(initial_messages.messages)
         
         if initial_count <= threshold:
             logger.info(f"@ {thread_name} History count is equal orbelow threshold of {threshold}: {initial_count}")
-            return
+            return False
         
         logger.info("History count above threshold, attempting to reduce...")
         logger.info(f"@ {thread_name} History count BEFORE reduction attempt: {initial_count}") # Log count before
@@ -51,7 +51,7 @@ async def reduce_and_log_chat_history(chat_thread, thread_name, threshold=10, un
             untouched_messages = untouched_messages + 1
             if untouched_messages > initial_count:
                 logger.info("No non-tool messages found in the chat history. Exiting reduction.")
-                return
+                return False
         
         # Summarize all messages except the last 'untouched_messages'
         prompt = HISTORY_SUMMARY_REDUCER_INSTRUCTIONS.format(
@@ -78,6 +78,7 @@ async def reduce_and_log_chat_history(chat_thread, thread_name, threshold=10, un
         logger.info(f"@ {thread_name} Final Message Count AFTER reduction: {final_count}")
         
         chat_thread._chat_history = chat_history
+        return True
         
     except AgentThreadOperationException:
         logger.warning(f"Could not reduce chat history for {thread_name} as the thread is not active.")
@@ -89,3 +90,4 @@ async def reduce_and_log_chat_history(chat_thread, thread_name, threshold=10, un
             logger.info(f"@ {thread_name} Final Message Count (reduction skipped): {final_count_except}\n")
         except Exception as e:
             logger.warning(f"Could not retrieve messages for {thread_name} after failed reduction: {e}")
+        return False
@@ -0,0 +1,184 @@
+import asyncio
+import functools
+import inspect
+import logging
+import threading
+import time
+import typing
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from utils.singletons import _SingletonWrapper
+
+logger = logging.getLogger("plugins")
+
+
+@dataclass
+class _RegistryEntry:
+    """A registered retrieval plugin and its loading state."""
+
+    factory_func: Callable[..., Any]
+    args: List[Any]
+    plugin_class: type
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    instance: Optional[Any] = None
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+
+class RetrievalPluginRegistry:
+    """
+    Process-wide registry of the retrieval plugins (text, SQL, image, navigation).
+
+    Constructing a retrieval plugin loads its indexes, database or navigation mesh, so each
+    plugin is only built on the first invocation of one of its kernel functions and the
+    instance is then shared by all agents and goals. Plugins can also be warmed up in the
+    background at startup.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, _RegistryEntry] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def register(self, name: str, factory_func: Callable[..., Any], args: Iterable[Any],
+                 plugin_class: Optional[type] = None) -> None:
+        """
+        Registers a retrieval plugin (registering an already registered name is a no-op).
+
+        Args:
+            name (str): name of the plugin (key of the plugin configurations)
+            factory_func (Callable): function creating the plugin from args
+            args (Iterable): arguments of the factory function
+            plugin_class (optional, type): class of the plugin, inferred from the return
+                annotation of the factory function if not given
+
+        Returns:
+            None
+        """
+        if name in self._entries:
+            return
+        if plugin_class is None:
+            plugin_class = typing.get_type_hints(factory_func).get("return")
+            if not inspect.isclass(plugin_class):
+                raise ValueError(f"Cannot infer the plugin class of '{name}', pass plugin_class explicitly.")
+        self._entries[name] = _RegistryEntry(factory_func, list(args), plugin_class)
+
+    def get(self, name: str) -> Any:
+        """
+        Returns the instance of the plugin, building it on the first call.
+
+        Args:
+            name (str): name of the plugin
+
+        Returns:
+            Any: the plugin instance
+        """
+        entry = self._entries[name]
+        if entry.instance is not None:
+            return entry.instance
+        with entry.lock:
+            if entry.instance is None:
+                logger.info("Loading the %s retrieval plugin...", name)
+                start = time.perf_counter()
+                try:
+                    entry.instance = entry.factory_func(*entry.args)
+                except Exception as e:
+                    entry.error = str(e)
+                    logger.error("Failed to load the %s retrieval plugin: %s", name, e)
+                    raise
+                entry.load_seconds = time.perf_counter() - start
+                entry.error = None
+                logger.info("Loaded the %s retrieval plugin in %.2f s.", name, entry.load_seconds)
+        return entry.instance
+
+    async def aget(self, name: str) -> Any:
+        """
+        Returns the instance of the plugin, building it in a worker thread on the first
+        call (or waiting for a pending warm-up) without blocking the event loop.
+
+        Args:
+            name (str): name of the plugin
+
+        Returns:
+            Any: the plugin instance
+        """
+        instance = self._entries[name].instance
+        if instance is not None:
+            return instance
+        return await asyncio.to_thread(self.get, name)
+
+    def get_lazy_plugin(self, name: str) -> Dict[str, Callable[..., Any]]:
+        """
+        Creates the kernel functions of the plugin without building it: each function
+        forwards its call to the shared plugin instance, which is built on the first call.
+        The result can be passed to Kernel.add_plugin like a plugin instance.
+
+        Args:
+            name (str): name of the plugin
+
+        Returns:
+            Dict[str, Callable]: method name -> kernel function
+        """
+        plugin_class = self._entries[name].plugin_class
+        return {
+            method_name: self._lazy_kernel_function(name, method_name, method)
+            for method_name, method in inspect.getmembers(plugin_class, inspect.isfunction)
+            if hasattr(method, "__kernel_function__")
+        }
+
+    def _lazy_kernel_function(self, name: str, method_name: str, method: Callable[..., Any]) -> Callable[..., Any]:
+        # functools.wraps copies the kernel function metadata set by the kernel_function decorator
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def kernel_function(*args, **kwargs):
+                return await getattr(await self.aget(name), method_name)(*args, **kwargs)
+        else:
+            @functools.wraps(method)
+            def kernel_function(*args, **kwargs):
+                return getattr(self.get(name), method_name)(*args, **kwargs)
+        return kernel_function
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Future]:
+        """
+        Builds the plugins in background threads.
+
+        Args:
+            names (optional, Iterable[str]): names of the plugins to build (all if None)
+
+        Returns:
+            Dict[str, Future]: name -> future resolving to the plugin instance
+        """
+        names = list(self._entries) if names is None else [n for n in names if n in self._entries]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(len(self._entries), 1), thread_name_prefix="plugin_warm_up"
+            )
+        logger.info("Warming up the retrieval plugins: %s", ", ".join(names))
+        return {name: self._executor.submit(self.get, name) for name in names}
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the readiness, load time (seconds) and last error of each registered plugin."""
+        return {
+            name: {
+                "ready": entry.instance is not None,
+                "load_seconds": entry.load_seconds,
+                "error": entry.error,
+            }
+            for name, entry in self._entries.items()
+        }
+
+    def log_status(self) -> None:
+        """Logs the readiness and load time of each registered plugin."""
+        for name, status in self.status().items():
+            if status["ready"]:
+                logger.info("Retrieval plugin %s: ready (loaded in %.2f s)", name, status["load_seconds"])
+            elif status["error"]:
+                logger.info("Retrieval plugin %s: failed to load (%s)", name, status["error"])
+            else:
+                logger.info("Retrieval plugin %s: not loaded", name)
+
+
+class RetrievalPluginRegistrySingleton(_SingletonWrapper):
+    """Singleton wrapper for the RetrievalPluginRegistry class."""
+    _type_of_class = RetrievalPluginRegistry
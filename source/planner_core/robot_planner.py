@@ -28,6 +28,7 @@ from configs.goal_execution_log_models import (
 
 from planner_core.robot_state import RobotStateSingleton
 from utils.agent_utils import invoke_agent
+from utils.logging_utils import LazyJson
 from robot_utils.frame_transformer import FrameTransformerSingleton
 from utils.recursive_config import Config
 from utils.singletons import _SingletonWrapper
@@ -99,11 +100,11 @@ class RobotPlanner:
             model_description=model_desc,
             scene_graph=str(robot_state.scene_graph.scene_graph_to_dict()), 
             robot_position=str(robot_state.virtual_robot_pose) if not use_robot else str(frame_transformer.get_current_body_position_in_frame(robot_state.frame_name)),
-            core_memory=str(robot_state.core_memory)
+            core_memory=robot_state.core_memory.get_prompt(self.goal)
         )
 
         logger.debug("========================================")
-        logger.debug(f"Plan generation prompt: {plan_generation_prompt}")
+        logger.debug("Plan generation prompt: %s", plan_generation_prompt)
         logger.debug("========================================")
 
 
@@ -115,7 +116,7 @@ class RobotPlanner:
         )
         
         logger.debug("========================================")
-        logger.debug(f"Initial plan full response: {str(plan_response)}")
+        logger.debug("Initial plan full response: %s", plan_response)
         logger.debug("========================================")
 
         # Convert ChatMessageContent to string
@@ -142,10 +143,10 @@ class RobotPlanner:
             logger.info("Successfully parsed JSON from initial plan generation response.")
             
             # logger.info(f"Plan JSON string: {plan_json_str}")   
-            logger.info(f"Chain of thought of initial plan (in case of reasoning model): {chain_of_thought}")
+            logger.info("Chain of thought of initial plan (in case of reasoning model): %s", chain_of_thought)
             self.plan = json.loads(plan_json_str)
             
-            logger.info(f"Plan:\n{json.dumps(self.plan, indent=2)}")
+            logger.info("Plan:\n%s", LazyJson(self.plan))
             
             agent_response_logs.plan_id = 0
             self.task_planner_invocations.append(agent_response_logs)
@@ -169,7 +170,7 @@ class RobotPlanner:
             
             
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from response: {e}")
+            logger.error("Failed to parse JSON from response: %s", e)
             await self._create_task_plan(additional_message="Failed to parse JSON from response with error: " + str(e) + ". Please try again.")
         
 
@@ -181,14 +182,14 @@ class RobotPlanner:
         """
         Sets the goal for the robot planner, resets state, clears history, and creates an initial task plan.
         """
-        logger.info(f"Setting new goal: {goal}")
+        logger.info("Setting new goal: %s", goal)
 
         self.goal = goal
         
         # Create initial plan for the new goal
         chain_of_thought = await self._create_task_plan()
         
-        logger.info(f"Goal set to: {self.goal}. Initial plan created.")
+        logger.info("Goal set to: %s. Initial plan created.", self.goal)
 
         return self.plan, chain_of_thought
 
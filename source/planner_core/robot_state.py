@@ -5,7 +5,7 @@ import tempfile
 import time
 import numpy as np
 from dataclasses import dataclass, field
-from typing import Optional, Union
+from typing import List, Optional, Union
 from PIL import Image
 
 # Third-party imports
@@ -51,6 +51,11 @@ world_object_client = WorldObjectClientSingleton()
 
 # Import the scene graph class
 from LostFound.src.scene_graph import SceneGraph
+from planner_core.image_buffer import ImageFrame, ImageRingBuffer, get_image_writer
+from planner_core.memory_store import CoreMemory, create_core_memory
+from planner_core.node_geometry_cache import NodeGeometry, NodeGeometryCache
+from planner_core.scene_graph_index import SceneGraphSpatialIndex, refresh_spatial_index
+from planner_core.scene_graph_journal import SceneGraphChangeType, SceneGraphJournal
 
 # Set up logger
 logger = logging.getLogger("main")
@@ -74,7 +79,8 @@ class RobotState:
     # objects_in_view: List[int] = field(default_factory=list)
     
     
-    def __init__(self, scene_graph_object: Optional[SceneGraph] = None, scene_graph_str: Optional[str] = None):
+    def __init__(self, scene_graph_object: Optional[SceneGraph] = None, scene_graph_str: Optional[str] = None,
+                 node_geometry_cache: Optional[NodeGeometryCache] = None, core_memory: Optional[CoreMemory] = None):
 
         # Image state
         if self.use_robot:
@@ -85,6 +91,10 @@ class RobotState:
         # Initialize image and depth image states
         self.image_state = None
         self.depth_image_state = None
+        # Recent frames (with capture time, camera and robot pose), written to disk on a background thread
+        image_buffer_settings = self.config.get("image_buffer", {})
+        self.image_buffer = ImageRingBuffer(image_buffer_settings.get("capacity", 32))
+        self._image_writer = get_image_writer(image_buffer_settings.get("writer_queue_size", 16))
 
         # # The image state gets updated in the main function
         # self.save_image_state(image_description="initial_image")
@@ -93,6 +103,12 @@ class RobotState:
             self.scene_graph = scene_graph_object  # Explicitly set the scene_graph attribute
         else:
             self.scene_graph = None
+        self._spatial_index: Optional[SceneGraphSpatialIndex] = None
+        # Incremented when a node moves, so the spatial index knows when to rebuild
+        self._node_positions_version: int = 0
+        self.scene_graph_journal = SceneGraphJournal()
+        # Shared across goals (the nodes of restored scene graphs share their points)
+        self.node_geometry_cache = node_geometry_cache if node_geometry_cache is not None else NodeGeometryCache()
         
         self.current_room: str = "unknown" # Can be loaded from the scene configuration file
         
@@ -103,28 +119,135 @@ class RobotState:
         self.virtual_robot_pose = np.array([1, 0, 0.6])
         
         # Core memory
-        self.core_memory = dict()
+        self.core_memory: CoreMemory = core_memory if core_memory is not None else create_core_memory()
         
+    def get_spatial_index(self) -> SceneGraphSpatialIndex:
+        """Get the spatial index of the scene graph nodes (rebuilt only when nodes were added, removed or moved)."""
+        self._spatial_index = refresh_spatial_index(self.scene_graph, self._spatial_index, self._node_positions_version)
+        return self._spatial_index
+
+    def get_node_geometry(self, node_id: int) -> NodeGeometry:
+        """Get the cached geometry (downsampled points, oriented bounding box, vertical faces) of a scene graph node."""
+        return self.node_geometry_cache.get(node_id, self.scene_graph.nodes[node_id])
+
+    def get_scene_graph_prompt(self, thread_key: Optional[str] = None) -> str:
+        """
+        Get the scene graph for a prompt: the full scene graph for the first message of the thread,
+        afterwards only the scene graph changes since the last message of the thread.
+        """
+        return self.scene_graph_journal.get_prompt(
+            thread_key,
+            lambda: str(self.scene_graph.scene_graph_to_dict()),
+            lambda node_id: self.scene_graph.label_mapping.get(self.scene_graph.nodes[node_id].sem_label, "object"),
+        )
+
+    def add_node_interaction(self, node_id: int, interaction: str) -> None:
+        """Log an interaction with a scene graph node."""
+        node = self.scene_graph.nodes[node_id]
+        if not hasattr(node, 'interactions_with_object'):
+            node.interactions_with_object = []
+        node.interactions_with_object.append(interaction)
+        self.scene_graph_journal.record(SceneGraphChangeType.INTERACTION, node_id, interaction)
+
+    def connect_node(self, node_id: int, parent_id: int) -> None:
+        """Connect a scene graph node to the node it is placed on/in, removing its previous connection."""
+        if node_id in self.scene_graph.outgoing:
+            old_connection = self.scene_graph.outgoing[node_id]
+            if old_connection in self.scene_graph.ingoing:
+                self.scene_graph.ingoing[old_connection].remove(node_id)
+        self.scene_graph.outgoing[node_id] = parent_id
+        self.scene_graph.ingoing.setdefault(parent_id, []).append(node_id)
+        self.scene_graph_journal.record(SceneGraphChangeType.CONNECTION, node_id, parent_id)
+
+    def set_node_normal(self, node_id: int, normal: np.ndarray) -> None:
+        """Set the interaction normal of a scene graph node."""
+        self.scene_graph.nodes[node_id].set_normal(normal)
+        self.scene_graph_journal.record(SceneGraphChangeType.NORMAL, node_id, np.round(normal, 2).tolist())
+
+    def set_node_affordances(self, node_id: int, affordance_dict: dict) -> None:
+        """Set the affordances of a scene graph node."""
+        self.scene_graph.nodes[node_id].affordance_dict = affordance_dict
+        self.scene_graph_journal.record(SceneGraphChangeType.AFFORDANCES, node_id, affordance_dict)
+
+    def set_node_open_state(self, node_id: int, is_open: bool) -> None:
+        """Set whether a scene graph node (e.g. a drawer) is open."""
+        self.scene_graph.nodes[node_id].is_open = is_open
+        self.scene_graph_journal.record(SceneGraphChangeType.OPEN_STATE, node_id, is_open)
+
+    def move_node(self, node_id: int, centroid: np.ndarray) -> None:
+        """Move a scene graph node to a new centroid."""
+        self.scene_graph.nodes[node_id].centroid = centroid
+        self._node_positions_version += 1
+        self.scene_graph_journal.record(SceneGraphChangeType.MOVED, node_id, np.round(centroid, 2).tolist())
+
     def set_image_state(self, image: np.ndarray) -> None:
         """Set the current image state."""
         self.image_state = image
     
-    def set_depth_image_state(self, depth_image: np.ndarray) -> None:
-        """Set the current depth image state."""
+    def set_depth_image_state(self, depth_image: np.ndarray, source: Optional[str] = None) -> None:
+        """Set the current depth image state (and attach it to the latest buffered frame of the source if it has none)."""
         self.depth_image_state = depth_image
+        if source is not None:
+            frame = self.image_buffer.latest(source)
+            if frame is not None and frame.depth_image is None:
+                frame.depth_image = depth_image
+
+    def add_image_frame(self, image: np.ndarray, source: Optional[str] = None, depth_image: Optional[np.ndarray] = None,
+                        robot_pose: Optional[np.ndarray] = None, description: Optional[str] = None) -> ImageFrame:
+        """
+        Set the current image (and depth image) state and add the frame to the buffer of recent frames.
+
+        Args:
+            image (np.ndarray): the color image
+            source (optional, str): camera the image was captured with (the default image source if None)
+            depth_image (optional, np.ndarray): the depth image captured with the color image
+            robot_pose (optional, np.ndarray): position of the robot at capture time
+            description (optional, str): what the frame shows, e.g. "inspection_object_3"
+
+        Returns:
+            ImageFrame: the buffered frame
+        """
+        frame = ImageFrame(
+            image=image,
+            source=source or self.default_image_source,
+            depth_image=depth_image,
+            robot_pose=np.asarray(robot_pose, dtype=float) if robot_pose is not None else None,
+            description=description,
+        )
+        self.image_state = image
+        if depth_image is not None:
+            self.depth_image_state = depth_image
+        self.image_buffer.append(frame)
+        return frame
+
+    def get_recent_frames(self, count: Optional[int] = None, source: Optional[str] = None,
+                          max_age: Optional[float] = None) -> List[ImageFrame]:
+        """Get the most recent buffered frames (newest first), optionally of one camera and at most max_age seconds old."""
+        return self.image_buffer.recent(count, source, max_age)
+
+    def get_recent_frames_prompt(self, count: int = 5) -> str:
+        """Describe the most recent buffered frames (capture time, camera, what they show and robot pose) for the agents."""
+        frames = self.get_recent_frames(count)
+        if not frames:
+            return "No images have been captured yet."
+        return "Most recent camera images (newest first):\n" + "\n".join(f"- {frame}" for frame in frames)
 
     def save_image_state(self, image_description: Optional[str] = None) -> None:
+        """Queue the current image state to be written to the scene images on a background thread."""
+        if self.image_state is None:
+            logger.warning("No image state to save.")
+            return
         save_dir = Path(self.config["robot_planner_settings"]["path_to_scene_data"]) / self.config["robot_planner_settings"]["active_scene"] / "images"
-        
-        if not save_dir.exists():
-            save_dir.mkdir(parents=True)
+
+        # Name the file after the capture time of the frame if it is buffered
+        latest_frame = self.image_buffer.latest()
+        timestamp = latest_frame.timestamp if latest_frame is not None and latest_frame.image is self.image_state else time.time()
         if image_description is not None:
-            save_path = save_dir / f"{time.time()}_{image_description}.png"
+            save_path = save_dir / f"{timestamp}_{image_description}.png"
         else:
-            save_path = save_dir / f"{time.time()}.png"
+            save_path = save_dir / f"{timestamp}.png"
 
-        image = Image.fromarray(self.image_state)
-        image.save(save_path)
+        self._image_writer.submit(self.image_state, save_path)
 
     # def save_depth_image_state(self, image_description: Optional[str] = None) -> None:
     #     save_dir = Path(self.config["robot_planner_settings"]["path_to_scene_data"]) / self.config["robot_planner_settings"]["active_scene"] / "images"
@@ -0,0 +1,194 @@
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+logger = logging.getLogger("main")
+
+
+class SceneGraphSpatialIndex:
+    """
+    Spatial index over the nodes of a scene graph: a KD-tree over the node centroids and
+    the axis-aligned half extents of the node bounding boxes, stored as arrays so that
+    radius, k-nearest-neighbour and face (half-space) queries are vectorized over all nodes.
+    """
+
+    def __init__(self, scene_graph, version: int = 0) -> None:
+        """
+        Constructor
+
+        Args:
+            scene_graph (SceneGraph): scene graph whose nodes are indexed
+            version (int): version of the node positions (incremented when a node moves)
+
+        Returns:
+            None
+        """
+        self.version: int = version
+        self.node_ids: np.ndarray = np.array(list(scene_graph.nodes.keys()))
+        nodes = list(scene_graph.nodes.values())
+        self.centroids: np.ndarray = self._get_centroids(scene_graph)
+        self.half_extents: np.ndarray = np.array(
+            [self._get_half_extents(node) for node in nodes]
+        ).reshape(-1, 3)
+        self.sem_labels: np.ndarray = np.array([node.sem_label for node in nodes], dtype=object)
+        self._tree: Optional[cKDTree] = cKDTree(self.centroids) if len(nodes) > 0 else None
+
+    @staticmethod
+    def _get_centroids(scene_graph) -> np.ndarray:
+        return np.array(
+            [node.centroid for node in scene_graph.nodes.values()], dtype=float
+        ).reshape(-1, 3)
+
+    @staticmethod
+    def _get_half_extents(node) -> np.ndarray:
+        dimensions = getattr(node, "dimensions", None)
+        if dimensions is None:
+            points = np.asarray(node.points)
+            dimensions = np.ptp(points, axis=0) if len(points) > 0 else np.zeros(3)
+        return np.asarray(dimensions, dtype=float)[:3] / 2
+
+    def is_stale(self, scene_graph, version: int = 0) -> bool:
+        """
+        Checks whether the index no longer matches the scene graph (nodes were added,
+        removed or moved).
+
+        Args:
+            scene_graph (SceneGraph): scene graph the index was built from
+            version (int): current version of the node positions
+
+        Returns:
+            bool: True if the index has to be rebuilt
+        """
+        if version != self.version or len(scene_graph.nodes) != len(self.node_ids):
+            return True
+        return not all(a == b for a, b in zip(scene_graph.nodes.keys(), self.node_ids))
+
+    def _candidate_mask(self, sem_labels: Optional[Iterable] = None,
+                        exclude: Optional[Iterable[int]] = None) -> np.ndarray:
+        mask = np.ones(len(self.node_ids), dtype=bool)
+        if sem_labels is not None:
+            mask &= np.isin(self.sem_labels, list(sem_labels))
+        if exclude is not None:
+            mask &= ~np.isin(self.node_ids, list(exclude))
+        return mask
+
+    def query_radius(self, point: np.ndarray, radius: float) -> List[int]:
+        """
+        Gets the nodes whose centroid is within the radius of the point.
+
+        Args:
+            point (np.ndarray): query point (3,)
+            radius (float): radius in meters
+
+        Returns:
+            List[int]: node ids sorted by distance to the point
+        """
+        if self._tree is None:
+            return []
+        indices = np.asarray(self._tree.query_ball_point(point, radius), dtype=int)
+        distances = np.linalg.norm(self.centroids[indices] - point, axis=1)
+        return self.node_ids[indices[np.argsort(distances)]].tolist()
+
+    def query_knn(self, point: np.ndarray, k: int = 1, max_distance: float = np.inf,
+                  sem_labels: Optional[Iterable] = None,
+                  exclude: Optional[Iterable[int]] = None) -> Tuple[List[int], np.ndarray]:
+        """
+        Gets the k nodes with the centroids closest to the point.
+
+        Args:
+            point (np.ndarray): query point (3,)
+            k (int): number of nodes
+            max_distance (float): maximum distance of the returned nodes in meters
+            sem_labels (optional, Iterable): only consider nodes with these semantic labels
+            exclude (optional, Iterable[int]): ids of nodes not to consider
+
+        Returns:
+            Tuple[List[int], np.ndarray]: node ids and their distances, closest first
+        """
+        if self._tree is None or k <= 0:
+            return [], np.zeros(0)
+        mask = self._candidate_mask(sem_labels, exclude)
+        num_candidates = int(mask.sum())
+        num_nodes = len(self.node_ids)
+        # Query more neighbours until k of them pass the filters (or no node is left within the distance)
+        num_queried = min(k + num_nodes - num_candidates, num_nodes)
+        while True:
+            distances, indices = self._tree.query(
+                np.asarray(point, dtype=float), k=num_queried, distance_upper_bound=max_distance
+            )
+            distances, indices = np.atleast_1d(distances), np.atleast_1d(indices)
+            within = np.isfinite(distances)
+            distances, indices = distances[within], indices[within]
+            keep = mask[indices]
+            if keep.sum() >= k or len(indices) < num_queried or num_queried == num_nodes:
+                break
+            num_queried = min(2 * num_queried, num_nodes)
+        distances, indices = distances[keep][:k], indices[keep][:k]
+        return self.node_ids[indices].tolist(), distances
+
+    def query_faces(self, face_centers: np.ndarray, face_normals: np.ndarray,
+                    face_half_sizes: np.ndarray, depth: float = 1.0,
+                    exclude: Optional[Iterable[int]] = None) -> List[List[int]]:
+        """
+        Gets the nodes in front of vertical faces, i.e. whose bounding box intersects the box
+        spanned by the face and extruded along its normal by depth. All faces are tested
+        against all nodes at once.
+
+        Args:
+            face_centers (np.ndarray): centers of the faces (F, 3)
+            face_normals (np.ndarray): horizontal unit normals of the faces (F, 3)
+            face_half_sizes (np.ndarray): half width and half height of the faces (F, 2)
+            depth (float): distance in front of the faces that has to be free, in meters
+            exclude (optional, Iterable[int]): ids of nodes not to consider (e.g. the
+                object the faces belong to)
+
+        Returns:
+            List[List[int]]: for each face, the ids of the nodes in front of it
+        """
+        face_centers = np.asarray(face_centers, dtype=float).reshape(-1, 3)
+        face_normals = np.asarray(face_normals, dtype=float).reshape(-1, 3)
+        face_half_sizes = np.asarray(face_half_sizes, dtype=float).reshape(-1, 2)
+        up = np.array([0.0, 0.0, 1.0])
+        face_tangents = np.cross(up, face_normals)
+
+        # (F, N, 3) offsets of the node centroids from the face centers
+        offsets = self.centroids[None, :, :] - face_centers[:, None, :]
+        along_normal = np.einsum("fnk,fk->fn", offsets, face_normals)
+        along_tangent = np.einsum("fnk,fk->fn", offsets, face_tangents)
+        along_up = offsets[:, :, 2]
+
+        # Projections of the node bounding boxes onto the face axes
+        normal_radius = self.half_extents @ np.abs(face_normals).T
+        tangent_radius = self.half_extents @ np.abs(face_tangents).T
+
+        in_front = (
+            (along_normal + normal_radius.T > 0)
+            & (along_normal - normal_radius.T < depth)
+            & (np.abs(along_tangent) - tangent_radius.T < face_half_sizes[:, :1])
+            & (np.abs(along_up) - self.half_extents[None, :, 2] < face_half_sizes[:, 1:])
+        )
+        in_front &= self._candidate_mask(exclude=exclude)[None, :]
+        return [self.node_ids[row].tolist() for row in in_front]
+
+
+def refresh_spatial_index(scene_graph, index: Optional[SceneGraphSpatialIndex],
+                          version: int = 0) -> SceneGraphSpatialIndex:
+    """
+    Returns the spatial index of the scene graph, rebuilding the given index only if the
+    nodes changed since it was built.
+
+    Args:
+        scene_graph (SceneGraph): scene graph to index
+        index (optional, SceneGraphSpatialIndex): previously built index
+        version (int): version of the node positions, incremented whenever a node moves
+            (RobotState.move_node)
+
+    Returns:
+        SceneGraphSpatialIndex: up-to-date spatial index
+    """
+    if index is None or index.is_stale(scene_graph, version):
+        index = SceneGraphSpatialIndex(scene_graph, version)
+        logger.debug("Built the scene graph spatial index over %d nodes.", len(index.node_ids))
+    return index
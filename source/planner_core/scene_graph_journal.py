@@ -0,0 +1,109 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("main")
+
+
+class SceneGraphChangeType(Enum):
+    INTERACTION = "interaction"
+    CONNECTION = "connection"
+    NORMAL = "normal"
+    AFFORDANCES = "affordances"
+    OPEN_STATE = "open_state"
+    MOVED = "moved"
+
+
+@dataclass
+class SceneGraphChange:
+    """A mutation of a scene graph node."""
+
+    seq: int
+    change_type: SceneGraphChangeType
+    node_id: int
+    value: Any
+    timestamp: float = field(default_factory=time.time)
+
+    def describe(self, label: str) -> str:
+        """Describes the change for a prompt."""
+        node = f"object {self.node_id} ({label})"
+        if self.change_type == SceneGraphChangeType.INTERACTION:
+            return f"{node}: new interaction '{self.value}'"
+        if self.change_type == SceneGraphChangeType.CONNECTION:
+            return f"{node}: now connected to (placed on/in) object {self.value}"
+        if self.change_type == SceneGraphChangeType.NORMAL:
+            return f"{node}: interaction normal set to {self.value}"
+        if self.change_type == SceneGraphChangeType.AFFORDANCES:
+            return f"{node}: affordances set to {self.value}"
+        if self.change_type == SceneGraphChangeType.OPEN_STATE:
+            return f"{node}: {'opened' if self.value else 'closed'}"
+        return f"{node}: moved to {self.value}"
+
+
+class SceneGraphJournal:
+    """
+    Journal of the mutations of the scene graph during a goal. It remembers, per chat thread,
+    which changes were already sent so that only the changes since the last message have to
+    be added to the next prompt of that thread.
+    """
+
+    def __init__(self) -> None:
+        self.changes: List[SceneGraphChange] = []
+        self._thread_cursors: Dict[str, int] = {}
+
+    def record(self, change_type: SceneGraphChangeType, node_id: int, value: Any) -> SceneGraphChange:
+        """
+        Records a mutation of a node.
+
+        Args:
+            change_type (SceneGraphChangeType): type of the mutation
+            node_id (int): id of the mutated node
+            value (Any): new value (interaction, connected node id, normal, ...)
+
+        Returns:
+            SceneGraphChange: the recorded change
+        """
+        change = SceneGraphChange(len(self.changes) + 1, change_type, node_id, value)
+        self.changes.append(change)
+        logger.debug("Scene graph change %d: %s of node %s", change.seq, change_type.value, node_id)
+        return change
+
+    def changes_since(self, seq: int) -> List[SceneGraphChange]:
+        """Changes recorded after the change with sequence number seq."""
+        return self.changes[seq:]
+
+    def get_prompt(self, thread_key: Optional[str], get_full_scene_graph: Callable[[], str],
+                   get_label: Callable[[int], str]) -> str:
+        """
+        Gets the scene graph part of a prompt: the full scene graph for the first message
+        of a thread (or without a thread key), afterwards only the changes since the last
+        message of the thread.
+
+        Args:
+            thread_key (optional, str): name of the chat thread the prompt is sent to
+            get_full_scene_graph (Callable): returns the full scene graph as a string
+            get_label (Callable): returns the label of a node id
+
+        Returns:
+            str: scene graph (changes) for the prompt
+        """
+        cursor = self._thread_cursors.get(thread_key) if thread_key is not None else None
+        if thread_key is not None:
+            self._thread_cursors[thread_key] = len(self.changes)
+        if cursor is None:
+            return get_full_scene_graph()
+
+        changes = self.changes_since(cursor)
+        if not changes:
+            return "No scene graph changes since your last message (use the scene graph from the previous messages)."
+        lines = [change.describe(get_label(change.node_id)) for change in changes]
+        return (
+            "Scene graph changes since your last message (apply them to the scene graph from the previous messages):\n- "
+            + "\n- ".join(lines)
+        )
+
+    def reset_thread(self, thread_key: str) -> None:
+        """Makes the next prompt of the thread contain the full scene graph again (e.g. after its history was reduced)."""
+        self._thread_cursors.pop(thread_key, None)
@@ -0,0 +1,69 @@
+import copy
+import logging
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+logger = logging.getLogger("main")
+
+# Arrays with at least this many bytes (point clouds, masks, ...) are shared between snapshots
+SHARED_ARRAY_MIN_BYTES = 4096
+
+
+def _is_heavy(value: Any) -> bool:
+    if isinstance(value, np.ndarray):
+        return value.nbytes >= SHARED_ARRAY_MIN_BYTES
+    # Open3D geometries (meshes, point clouds) are never mutated by the planner
+    return type(value).__module__.startswith("open3d")
+
+
+class SceneGraphSnapshot:
+    """
+    Copy-on-write snapshot of a scene graph. The heavy node data (point arrays, masks,
+    Open3D geometries) is shared between the snapshot and all graphs restored from it and
+    made read-only, while the mutable metadata (interactions, connections, normals, open
+    states, ...) is copied, so restoring a pristine graph for each goal is cheap.
+    """
+
+    def __init__(self, scene_graph) -> None:
+        """
+        Takes a snapshot of the scene graph.
+
+        Args:
+            scene_graph (SceneGraph): scene graph to snapshot (mutating it afterwards does
+                not affect the snapshot)
+
+        Returns:
+            None
+        """
+        start = time.perf_counter()
+        self._shared: Dict[int, Any] = {}
+        for owner in [scene_graph, *scene_graph.nodes.values()]:
+            for value in vars(owner).values():
+                if _is_heavy(value):
+                    if isinstance(value, np.ndarray):
+                        value.flags.writeable = False
+                    self._shared[id(value)] = value
+        self._scene_graph = self._copy(scene_graph)
+        logger.info(
+            "Took a scene graph snapshot in %.1f ms (%d shared arrays/geometries).",
+            (time.perf_counter() - start) * 1000, len(self._shared),
+        )
+
+    def _copy(self, scene_graph):
+        # Pre-populating the deepcopy memo with the heavy objects makes deepcopy reuse them
+        memo = dict(self._shared)
+        return copy.deepcopy(scene_graph, memo)
+
+    def restore(self):
+        """
+        Creates a pristine scene graph from the snapshot.
+
+        Returns:
+            SceneGraph: copy of the scene graph as it was when the snapshot was taken
+        """
+        start = time.perf_counter()
+        scene_graph = self._copy(self._scene_graph)
+        logger.info("Restored the scene graph snapshot in %.1f ms.", (time.perf_counter() - start) * 1000)
+        return scene_graph
@@ -0,0 +1,177 @@
+import copy
+import hashlib
+import json
+import logging
+import pickle
+import shutil
+import time
+import weakref
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("main")
+
+SCENE_GRAPH_STORE_DIR_NAME = "scene_graph_store"
+SCENE_GRAPH_STORE_VERSION = 1
+_INDEX_FILE_NAME = "index.json"
+_SKELETON_FILE_NAME = "skeleton.pkl"
+
+# Node arrays with at least this many bytes are moved to the memory-mapped buffers
+STORED_ARRAY_MIN_BYTES = 4096
+
+# id of a stored points array -> (weak reference to the array, digest computed when it was saved)
+_points_digests: Dict[int, Tuple[weakref.ref, str]] = {}
+
+
+def points_digest(points: np.ndarray) -> str:
+    """
+    Digest of a node points array. The digest of an array loaded from the store is known
+    and returned without reading the (memory-mapped) points.
+
+    Args:
+        points (np.ndarray): points of a node
+
+    Returns:
+        str: hex digest of the points
+    """
+    known = _points_digests.get(id(points))
+    if known is not None and known[0]() is points:
+        return known[1]
+    return hashlib.blake2b(np.ascontiguousarray(points).data, digest_size=16).hexdigest()
+
+
+def _source_signature(source_path: Optional[Path]) -> Optional[List[int]]:
+    if source_path is None or not Path(source_path).is_file():
+        return None
+    stat = Path(source_path).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _stored_attributes(nodes: dict) -> Dict[str, Tuple[np.dtype, tuple]]:
+    """Array attributes stored in the buffers: large in some node, with the same dtype and trailing shape in all nodes."""
+    candidates: Dict[str, Optional[Tuple[np.dtype, tuple]]] = {}
+    for node in nodes.values():
+        for name, value in vars(node).items():
+            if not isinstance(value, np.ndarray) or value.ndim == 0:
+                continue
+            layout = (value.dtype, value.shape[1:])
+            if name in candidates and candidates[name] != layout:
+                candidates[name] = None
+            elif value.nbytes >= STORED_ARRAY_MIN_BYTES:
+                candidates.setdefault(name, layout)
+    # An attribute that is not an array in every node stays in the skeleton
+    return {
+        name: layout for name, layout in candidates.items()
+        if layout is not None and all(isinstance(vars(node).get(name), np.ndarray) for node in nodes.values())
+    }
+
+
+def save_scene_graph_store(scene_graph, store_dir: Path, source_path: Optional[Path] = None) -> None:
+    """
+    Saves the scene graph in the store format: the large node arrays (points, masks, ...)
+    are concatenated into one .npy buffer per attribute with per-node offsets (index.json),
+    everything else is pickled as a light skeleton of the scene graph.
+
+    Args:
+        scene_graph (SceneGraph): scene graph to save
+        store_dir (Path): directory of the store (replaced if it exists)
+        source_path (optional, Path): file the scene graph was loaded from (e.g. the
+            full_scene_graph.pkl), the store is invalidated when it changes
+
+    Returns:
+        None
+    """
+    start = time.perf_counter()
+    store_dir = Path(store_dir)
+    tmp_dir = store_dir.with_name(store_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    attributes = _stored_attributes(scene_graph.nodes)
+    offsets: Dict[str, Dict[str, List[int]]] = {str(node_id): {} for node_id in scene_graph.nodes}
+    for name, (dtype, trailing_shape) in attributes.items():
+        total = sum(len(getattr(node, name)) for node in scene_graph.nodes.values())
+        buffer = np.lib.format.open_memmap(tmp_dir / f"{name}.npy", mode="w+", dtype=dtype,
+                                           shape=(total, *trailing_shape))
+        position = 0
+        for node_id, node in scene_graph.nodes.items():
+            value = getattr(node, name)
+            buffer[position:position + len(value)] = value
+            offsets[str(node_id)][name] = [position, position + len(value)]
+            position += len(value)
+        buffer.flush()
+        del buffer
+
+    skeleton = copy.copy(scene_graph)
+    skeleton.nodes = {}
+    for node_id, node in scene_graph.nodes.items():
+        node_skeleton = copy.copy(node)
+        for name in attributes:
+            setattr(node_skeleton, name, None)
+        skeleton.nodes[node_id] = node_skeleton
+    with open(tmp_dir / _SKELETON_FILE_NAME, "wb") as file:
+        pickle.dump(skeleton, file)
+
+    digests = {
+        str(node_id): points_digest(node.points)
+        for node_id, node in scene_graph.nodes.items() if "points" in attributes
+    }
+    with open(tmp_dir / _INDEX_FILE_NAME, "w", encoding="utf-8") as file:
+        json.dump({
+            "version": SCENE_GRAPH_STORE_VERSION,
+            "source": _source_signature(source_path),
+            "attributes": sorted(attributes),
+            "offsets": offsets,
+            "points_digests": digests,
+        }, file)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    tmp_dir.rename(store_dir)
+    logger.info("Saved the scene graph store to %s in %.2f s.", store_dir, time.perf_counter() - start)
+
+
+def load_scene_graph_store(store_dir: Path, source_path: Optional[Path] = None):
+    """
+    Loads a scene graph from the store. The node arrays are zero-copy views of the
+    memory-mapped buffers, so only the data of the nodes actually used is read from disk.
+
+    Args:
+        store_dir (Path): directory of the store
+        source_path (optional, Path): file the scene graph was saved from, the store is
+            considered outdated if it changed or no longer exists since
+
+    Returns:
+        Optional[SceneGraph]: the scene graph, None if there is no valid store
+    """
+    start = time.perf_counter()
+    store_dir = Path(store_dir)
+    try:
+        with open(store_dir / _INDEX_FILE_NAME, "r", encoding="utf-8") as file:
+            index = json.load(file)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if index.get("version") != SCENE_GRAPH_STORE_VERSION:
+        return None
+    # A store saved from a file is outdated if that file changed or is missing now
+    if index.get("source") != _source_signature(source_path):
+        logger.info("The scene graph store in %s is outdated.", store_dir)
+        return None
+
+    with open(store_dir / _SKELETON_FILE_NAME, "rb") as file:
+        scene_graph = pickle.load(file)
+    buffers = {name: np.load(store_dir / f"{name}.npy", mmap_mode="r") for name in index["attributes"]}
+    for node_id, node in scene_graph.nodes.items():
+        for name, (begin, end) in index["offsets"][str(node_id)].items():
+            setattr(node, name, buffers[name][begin:end])
+        digest = index["points_digests"].get(str(node_id))
+        if digest is not None:
+            key = id(node.points)
+            _points_digests[key] = (weakref.ref(node.points, lambda _, key=key: _points_digests.pop(key, None)), digest)
+
+    logger.info(
+        "Loaded the scene graph store from %s in %.2f s (%d nodes, memory-mapped %s).",
+        store_dir, time.perf_counter() - start, len(scene_graph.nodes), ", ".join(index["attributes"]),
+    )
+    return scene_graph
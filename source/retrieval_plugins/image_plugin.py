@@ -1,4 +1,5 @@
 import logging
+import time
 from pathlib import Path
 from typing import Annotated, Optional, Set
 
@@ -12,6 +13,7 @@ from llama_index.core.multi_modal_llms import MultiModalLLM
 
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 
+from planner_core.index_manifest import IndexManifest, hash_image_sources, refresh_index
 from planner_core.rag_document_loaders import load_image_documents, local_image_to_document
 from planner_core.interfaces import AbstractLlmChat
 from configs.plugin_prompts import (
@@ -86,7 +88,9 @@ class ImagePlugin:
     ) -> BaseIndex:
         """
         Creates an index based on the data in the provided image directory or in
-            the previously saved storage context.
+            the previously saved storage context. A persisted index is brought up to
+            date with the image directory using its manifest of image hashes: only
+            added, changed or removed images are re-embedded/deleted.
 
         Args:
             persist_dir (Path): path to a directory in which the storage context
@@ -101,38 +105,54 @@ class ImagePlugin:
             FileNotFoundError: if neither the persist directory nor the input text file
                 exists/is valid
         """
+        has_sources = image_dir is not None and image_dir.is_dir()
+        manifest = IndexManifest.load(persist_dir)
 
-        if persist_dir.is_dir():
+        if persist_dir.is_dir() and (manifest is not None or not has_sources):
             storage_context: StorageContext = StorageContext.from_defaults(
                 persist_dir=persist_dir
             )
-
-            for doc in storage_context.docstore.docs.values():
-                self._rooms.add(doc.metadata["room_name"])
-
             image_index = load_index_from_storage(
                 storage_context, embed_model=self._embed_model
             )
 
-        elif image_dir and image_dir.is_dir():
+            if has_sources:
+                sources = hash_image_sources(image_dir)
+                diff = manifest.diff(sources)
+                if diff:
+                    logger.info("Updating the image index: %s", diff)
+                    refresh_index(image_index, diff, load_image_documents(image_dir, diff.to_load))
+                    image_index.storage_context.persist(persist_dir=persist_dir)
+                    IndexManifest(sources).save(persist_dir)
+
+        elif has_sources:
+            if persist_dir.is_dir():
+                logger.info("Image index in %s has no manifest, rebuilding it.", persist_dir)
+            sources = hash_image_sources(image_dir)
             img_documents = load_image_documents(image_dir)
 
+            start = time.perf_counter()
             image_index = MultiModalVectorStoreIndex.from_documents(
                 img_documents,
                 embed_model=self._embed_model,
                 is_text_vector_store_empty=True,
                 show_progress=True,
             )
-
-            for doc in img_documents:
-                self._rooms.add(doc.metadata["room_name"])
+            duration = time.perf_counter() - start
+            logger.info(
+                "Embedded %d images in %.2f s (%.1f images/s)",
+                len(img_documents), duration, len(img_documents) / max(duration, 1e-9),
+            )
 
             image_index.storage_context.persist(persist_dir=persist_dir)
+            IndexManifest(sources).save(persist_dir)
         else:
             raise FileNotFoundError(
                 "Neither the persist directory nor the text data directory exists."
             )
 
+        for doc in image_index.docstore.docs.values():
+            self._rooms.add(doc.metadata["room_name"])
         return image_index
 
     def _get_retriever(self, query: str) -> BaseRetriever:
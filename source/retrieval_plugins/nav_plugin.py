@@ -1,14 +1,22 @@
+import json
 import logging
-from typing import Annotated, Optional
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Annotated, Dict, List, Optional, Tuple
 from pathlib import Path
 import numpy as np
 
 import pygeodesic.geodesic as geodesic
 import igl
+from scipy.spatial import cKDTree
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
 
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 
 from planner_core.interfaces import AbstractLlmChat
+from utils.files import file_sha256
 from utils.navmesh_vis import visualize_navmesh_3d
 from configs.plugin_prompts import (
     NAV_FUN_ACTUAL_PROMPT,
@@ -17,10 +25,65 @@ from configs.plugin_prompts import (
     NAV_SYSTEM_PROMPT,
     NAV_OUT_LINE_PROMPT,
     NAV_OUT_LINE_PROMPT,
+    NAV_FUN_NEAREST_PROMPT,
+    NAV_FUN_RANK_PROMPT,
+    NAV_IN_OBJECT_ID_PROMPT,
+    NAV_IN_K_PROMPT,
+    NAV_IN_LABEL_PROMPT,
+    NAV_IN_OBJECT_IDS_PROMPT,
+    NAV_OUT_NEAREST_PROMPT,
+    NAV_FUN_ACTUAL_STRUCTURED_PROMPT,
+    NAV_FUN_LINE_STRUCTURED_PROMPT,
+    NAV_IN_POSITION_PROMPT,
 )
 
 logger = logging.getLogger("NAV")
 
+# Persisted next to scene_graph.json
+OBJECT_DISTANCES_FILE_NAME = "object_distances.npz"
+
+_NUMBER_PATTERN = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_TRIPLE_PATTERN = re.compile(
+    r"[(\[]\s*({0})\s*,\s*({0})\s*,\s*({0})\s*[)\]]".format(_NUMBER_PATTERN.pattern)
+)
+_OBJECT_ID_PATTERN = re.compile(r"\b(?:object|node)(?:\s+id)?\s*[:#]?\s*(\d+)\b", re.IGNORECASE)
+
+
+@dataclass
+class ObjectDistanceMatrix:
+    """All-pairs navigable distances between the objects of the scene graph."""
+
+    object_ids: np.ndarray  # (N,) object IDs of the scene graph nodes
+    labels: np.ndarray  # (N,) semantic labels of the nodes
+    distances: np.ndarray  # (N, N) navigable distances between the nodes (inf if not navigable)
+
+    def rank(self, object_id: int, candidate_ids: Optional[List[int]] = None,
+             label: Optional[str] = None) -> List[Tuple[int, str, float]]:
+        """
+        Ranks objects by their navigable distance to the reference object.
+
+        Args:
+            object_id (int): object ID of the reference object
+            candidate_ids (optional, List[int]): object IDs to rank (all other objects if None)
+            label (optional, str): only rank the objects with this semantic label
+
+        Returns:
+            List[Tuple[int, str, float]]: (object ID, label, distance), from closest to farthest
+
+        Raises:
+            KeyError: if an object ID is not in the matrix
+        """
+        index_of = {int(oid): i for i, oid in enumerate(self.object_ids)}
+        row = self.distances[index_of[object_id]]
+        if candidate_ids is None:
+            candidates = [i for i in range(len(self.object_ids)) if i != index_of[object_id]]
+        else:
+            candidates = [index_of[candidate_id] for candidate_id in candidate_ids]
+        if label:
+            candidates = [i for i in candidates if str(self.labels[i]).lower() == label.strip().lower()]
+        candidates.sort(key=lambda i: row[i])
+        return [(int(self.object_ids[i]), str(self.labels[i]), float(row[i])) for i in candidates]
+
 
 class NavPlugin:
     def __init__(
@@ -28,6 +91,9 @@ class NavPlugin:
         llm: AbstractLlmChat,
         navmesh_filepath: Path,
         vis_dirpath: Optional[Path] = None,
+        approximate: bool = False,
+        distance_cache_size: int = 1024,
+        scene_graph_json_path: Optional[Path] = None,
     ) -> None:
         """
         Constructor
@@ -38,13 +104,35 @@ class NavPlugin:
                 (compatible with Habitat Sim format)
             vis_dirpath (optional, Path): path to a directory in which the visualization
                 of the resulting navigable paths should be stored
+            approximate (bool): if True, the navigable distances are approximated by the
+                shortest paths along the mesh edges (Dijkstra) instead of exact geodesics
+            distance_cache_size (int): maximum number of (start vertex, goal vertex) paths
+                kept in the LRU cache
+            scene_graph_json_path (optional, Path): path to the scene_graph.json of the scene;
+                if given, the navigable distances between all its objects are precomputed
+                (or loaded from object_distances.npz next to it)
 
         Returns:
             None
         """
         self._llm: AbstractLlmChat = llm
         self._vertices, self._faces = geodesic.read_mesh_from_file(navmesh_filepath)
+        self._vertex_tree: cKDTree = cKDTree(self._vertices)
         self._vis_dirpath: Optional[Path] = vis_dirpath
+        self._approximate: bool = approximate
+        # Built on first use, once per navmesh
+        self._geoalg: Optional[geodesic.PyGeodesicAlgorithmExact] = None
+        self._edge_graph: Optional[csr_matrix] = None
+        self._distance_cache: "OrderedDict[Tuple[int, int, bool], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._distance_cache_size: int = distance_cache_size
+        # Object ID -> (semantic label, centroid) of the scene graph nodes
+        self._objects: Dict[int, Tuple[str, np.ndarray]] = {}
+        self._object_distances: Optional[ObjectDistanceMatrix] = None
+        if scene_graph_json_path is not None:
+            self._objects = self._load_scene_objects(Path(scene_graph_json_path))
+            self._object_distances = self._get_object_distances(
+                Path(navmesh_filepath), Path(scene_graph_json_path)
+            )
 
     @kernel_function(description=NAV_FUN_ACTUAL_PROMPT, name="NavigationActual")
     def get_actual_distance_from_query(
@@ -103,6 +191,154 @@ class NavPlugin:
         logger.info(f"Response: {response}")
         return response
 
+    @kernel_function(description=NAV_FUN_ACTUAL_STRUCTURED_PROMPT, name="NavigationActualBetween")
+    def get_actual_distance(
+        self,
+        start: Annotated[str, NAV_IN_POSITION_PROMPT],
+        goal: Annotated[str, NAV_IN_POSITION_PROMPT],
+    ) -> Annotated[str, NAV_OUT_ACTUAL_PROMPT]:
+        """
+        Calculates the real distance between the start and goal, given as object IDs of the
+        scene graph or explicit coordinates, considering the obstacles.
+
+        Args:
+            start (str): object ID or 'x, y, z' coordinates of the start
+            goal (str): object ID or 'x, y, z' coordinates of the goal
+
+        Returns:
+            str: textual answer to the distance question between the points
+        """
+        logger.info("Calling the navigable distance function between %s and %s.", start, goal)
+        start_point, goal_point = self._resolve_position(start), self._resolve_position(goal)
+        if start_point is None or goal_point is None:
+            response = self._unresolved_position_response(start if start_point is None else goal)
+        else:
+            response = self._get_navigable_distance(start=start_point, goal=goal_point)
+        logger.info("Response: %s", response)
+        return response
+
+    @kernel_function(description=NAV_FUN_LINE_STRUCTURED_PROMPT, name="NavigationLineBetween")
+    def get_straight_line_distance(
+        self,
+        start: Annotated[str, NAV_IN_POSITION_PROMPT],
+        goal: Annotated[str, NAV_IN_POSITION_PROMPT],
+    ) -> Annotated[str, NAV_OUT_LINE_PROMPT]:
+        """
+        Calculates the straight-line distance between the start and goal, given as object IDs
+        of the scene graph or explicit coordinates.
+
+        Args:
+            start (str): object ID or 'x, y, z' coordinates of the start
+            goal (str): object ID or 'x, y, z' coordinates of the goal
+
+        Returns:
+            str: textual answer to the straight-line distance question between the points
+        """
+        logger.info("Calling the straight-line distance function between %s and %s.", start, goal)
+        start_point, goal_point = self._resolve_position(start), self._resolve_position(goal)
+        if start_point is None or goal_point is None:
+            response = self._unresolved_position_response(start if start_point is None else goal)
+        else:
+            dist = np.linalg.norm(goal_point - start_point)
+            response = f"The distance between specified points is {dist} meters."
+        logger.info("Response: %s", response)
+        return response
+
+    def _resolve_position(self, position: str) -> Optional[np.ndarray]:
+        """
+        Resolves a position given as an object ID of the scene graph (its centroid) or
+        as explicit 'x, y, z' coordinates.
+
+        Args:
+            position (str): object ID or coordinates
+
+        Returns:
+            Optional[np.ndarray[3,]]: the 3D position (None if it could not be resolved)
+        """
+        values = [float(v) for v in _NUMBER_PATTERN.findall(str(position))]
+        if len(values) == 3:
+            return np.array(values)
+        if len(values) == 1 and values[0].is_integer() and int(values[0]) in self._objects:
+            return self._objects[int(values[0])][1]
+        return None
+
+    def _unresolved_position_response(self, position: str) -> str:
+        if not self._objects:
+            return f"Could not parse the position '{position}', the coordinates must be given as 'x, y, z'."
+        return (
+            f"Could not resolve the position '{position}', it must be an object ID of the "
+            "scene graph or coordinates given as 'x, y, z'."
+        )
+
+    @kernel_function(description=NAV_FUN_NEAREST_PROMPT, name="NavigationNearestObjects")
+    def get_nearest_objects(
+        self,
+        object_id: Annotated[int, NAV_IN_OBJECT_ID_PROMPT],
+        k: Annotated[int, NAV_IN_K_PROMPT] = 3,
+        label: Annotated[Optional[str], NAV_IN_LABEL_PROMPT] = None,
+    ) -> Annotated[str, NAV_OUT_NEAREST_PROMPT]:
+        """
+        Finds the k objects with the smallest navigable distance to the reference object
+        (optionally only objects with a given label), based on the precomputed distances.
+
+        Args:
+            object_id (int): object ID of the reference object
+            k (int): number of objects to return
+            label (optional, str): semantic label the returned objects must have
+
+        Returns:
+            str: textual answer listing the closest objects
+        """
+        logger.info("Nearest objects to %s (k=%s, label=%s).", object_id, k, label)
+        return self._rank_objects(object_id, label=label, k=k)
+
+    @kernel_function(description=NAV_FUN_RANK_PROMPT, name="NavigationRankObjects")
+    def rank_objects_by_distance(
+        self,
+        object_id: Annotated[int, NAV_IN_OBJECT_ID_PROMPT],
+        object_ids: Annotated[str, NAV_IN_OBJECT_IDS_PROMPT],
+    ) -> Annotated[str, NAV_OUT_NEAREST_PROMPT]:
+        """
+        Ranks the given objects by their navigable distance to the reference object, based
+        on the precomputed distances.
+
+        Args:
+            object_id (int): object ID of the reference object
+            object_ids (str): comma-separated object IDs of the objects to rank
+
+        Returns:
+            str: textual answer listing the objects from closest to farthest
+        """
+        logger.info("Ranking objects %s by distance to %s.", object_ids, object_id)
+        try:
+            candidate_ids = [int(oid) for oid in object_ids.replace(" ", "").split(",") if oid]
+        except ValueError:
+            return f"Could not parse the object IDs '{object_ids}'."
+        return self._rank_objects(object_id, candidate_ids=candidate_ids)
+
+    def _rank_objects(self, object_id: int, candidate_ids: Optional[List[int]] = None,
+                      label: Optional[str] = None, k: Optional[int] = None) -> str:
+        """Creates the textual answer of the ranking kernel functions."""
+        if self._object_distances is None:
+            return "The navigable distances between the objects of the scene are not available."
+        try:
+            ranking = self._object_distances.rank(object_id, candidate_ids, label)
+        except KeyError as e:
+            return f"The object with ID {e.args[0]} is not in the scene graph."
+        if k is not None:
+            ranking = ranking[:k]
+        if not ranking:
+            return f"No matching objects found for object with ID {object_id}."
+
+        lines = [
+            f"- object {oid} ({label_}): "
+            + (f"{dist:.2f} meters" if np.isfinite(dist) else "not navigable")
+            for oid, label_, dist in ranking
+        ]
+        response = f"Objects by navigable distance to object {object_id}:\n" + "\n".join(lines)
+        logger.info("Response: %s", response)
+        return response
+
     def _nl_to_numpy(
         self, natural_language_descr: str
     ) -> Optional[tuple[np.ndarray, np.ndarray]]:
@@ -117,6 +353,11 @@ class NavPlugin:
             np.ndarray: 3D coordinates of the objects
         """
         logger.info(f"Natural language description: {natural_language_descr}")
+        positions = self._parse_positions(natural_language_descr)
+        if positions is not None:
+            logger.info(f"The distance is calculated between {positions[0]} and {positions[1]}.")
+            return positions
+
         response = self._llm.get_response(
             NAV_SYSTEM_PROMPT, natural_language_descr
         )
@@ -137,6 +378,53 @@ class NavPlugin:
                 logger.info("Could not parse the positions.")
                 return None, None
 
+    def _parse_positions(self, natural_language_descr: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Extracts the start and goal positions without the LLM when they are given explicitly:
+        as two '(x, y, z)' / '[x, y, z]' triples, as a bare list of six numbers or as two
+        object IDs of the scene graph ('object 3 ... object 12').
+
+        Args:
+            natural_language_descr (str): natural language description of the 3D positions
+
+        Returns:
+            Optional[Tuple[np.ndarray, np.ndarray]]: start and goal positions (None if the
+                description has to be parsed by the LLM)
+        """
+        triples = _TRIPLE_PATTERN.findall(natural_language_descr)
+        if len(triples) == 2:
+            return tuple(np.array(triple, dtype=float) for triple in triples)
+
+        if not re.search(r"[A-Za-z]", natural_language_descr):
+            values = _NUMBER_PATTERN.findall(natural_language_descr)
+            if len(values) == 6:
+                points = np.array(values, dtype=float).reshape(2, 3)
+                return points[0], points[1]
+
+        object_ids = [int(oid) for oid in _OBJECT_ID_PATTERN.findall(natural_language_descr)]
+        if len(object_ids) == 2 and all(oid in self._objects for oid in object_ids):
+            return self._objects[object_ids[0]][1], self._objects[object_ids[1]][1]
+        return None
+
+    def snap_points(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Snaps the given points to the navigation mesh: each point is projected onto the
+        closest face (one batched AABB tree query for all points) and the projection is
+        snapped to the closest vertex with the KD-tree over the mesh vertices.
+
+        Args:
+            points (np.ndarray[N, 3]): 3D positions to snap
+
+        Returns:
+            np.ndarray[N, 3]: closest points on the navigation mesh
+            np.ndarray[N, 3]: closest vertices in the navigation mesh
+            np.ndarray[N,]: indices of the closest vertices in the navigation mesh
+        """
+        points = np.asarray(points, dtype=self._vertices.dtype).reshape(-1, 3)
+        _, _, closest_points = igl.point_mesh_squared_distance(points, self._vertices, self._faces)
+        _, closest_vertex_indices = self._vertex_tree.query(closest_points)
+        return closest_points, self._vertices[closest_vertex_indices], closest_vertex_indices
+
     def _snap_to_closest_vertex(self, point):
         """
         Snaps the given point to the closest vertex in the navigation mesh.
@@ -145,15 +433,12 @@ class NavPlugin:
             point (np.ndarray[3,]): 3D position to snap to the closest vertex
         
         Returns:
-            np.ndarray[3,]: closest point on the navigation mesh
+            np.ndarray[1, 3]: closest point on the navigation mesh
             np.ndarray[3,]: closest vertex in the navigation mesh
             int: index of the closest vertex in the navigation mesh
         """
-        _, _, closest_point = igl.signed_distance(np.array([point]), self._vertices, self._faces)
-        distances = np.linalg.norm(self._vertices - closest_point, axis=1)
-        closest_vertex_index = np.argmin(distances)
-        closest_vertex = self._vertices[closest_vertex_index]
-        return closest_point, closest_vertex, closest_vertex_index
+        closest_points, closest_vertices, closest_vertex_indices = self.snap_points(np.array([point]))
+        return closest_points, closest_vertices[0], closest_vertex_indices[0]
 
     def _get_navigable_distance(self, start: np.ndarray, goal: np.ndarray) -> str:
         """
@@ -178,11 +463,18 @@ class NavPlugin:
 
         closest_s, closest_v_s, closest_vid_s = self._snap_to_closest_vertex(start)
         closest_g, closest_v_g, closest_vid_g = self._snap_to_closest_vertex(goal)
-        geoalg = geodesic.PyGeodesicAlgorithmExact(self._vertices, self._faces)
-        dist, path = geoalg.geodesicDistance(closest_vid_s, closest_vid_g)
+        dist, path = self._get_vertex_path(closest_vid_s, closest_vid_g)
 
         if path is not None and path.size != 0:
-            response = f"The distance between specified points is {dist} meters."
+            if self._approximate:
+                # The exact geodesic lies between the straight line and the path along the edges
+                max_error = dist - np.linalg.norm(closest_v_g - closest_v_s)
+                response = (
+                    f"The distance between specified points is approximately {dist} meters "
+                    f"(at most {max_error:.2f} meters more than the exact navigable distance)."
+                )
+            else:
+                response = f"The distance between specified points is {dist} meters."
 
         if self._vis_dirpath:
             points = {
@@ -200,3 +492,171 @@ class NavPlugin:
             visualize_navmesh_3d(self._vertices, self._faces, filename, path, points)
 
         return response
+
+    def _get_vertex_path(self, start_vid: int, goal_vid: int) -> Tuple[float, np.ndarray]:
+        """
+        Computes the navigable distance and path between two vertices of the navigation mesh
+        (exact geodesic or Dijkstra along the mesh edges, depending on the mode), reusing the
+        cached result of previous queries between the same vertices.
+
+        Args:
+            start_vid (int): index of the start vertex
+            goal_vid (int): index of the goal vertex
+
+        Returns:
+            float: navigable distance between the vertices
+            np.ndarray[N, 3]: navigable path between the vertices
+        """
+        key = (int(start_vid), int(goal_vid), self._approximate)
+        if key in self._distance_cache:
+            self._distance_cache.move_to_end(key)
+            return self._distance_cache[key]
+
+        reverse_key = (key[1], key[0], key[2])
+        if reverse_key in self._distance_cache:
+            dist, path = self._distance_cache[reverse_key]
+            result = (dist, path[::-1] if path is not None else path)
+        elif self._approximate:
+            result = self._get_edge_path(key[0], key[1])
+        else:
+            if self._geoalg is None:
+                self._geoalg = geodesic.PyGeodesicAlgorithmExact(self._vertices, self._faces)
+            result = self._geoalg.geodesicDistance(key[0], key[1])
+
+        self._distance_cache[key] = result
+        if len(self._distance_cache) > self._distance_cache_size:
+            self._distance_cache.popitem(last=False)
+        return result
+
+    def _get_edge_graph(self) -> csr_matrix:
+        """Returns the graph of the navigation mesh edges weighted by their lengths (built on first use)."""
+        if self._edge_graph is None:
+            edges = np.concatenate(
+                [self._faces[:, [0, 1]], self._faces[:, [1, 2]], self._faces[:, [2, 0]]]
+            )
+            edges = np.unique(np.sort(edges, axis=1), axis=0)
+            lengths = np.linalg.norm(self._vertices[edges[:, 0]] - self._vertices[edges[:, 1]], axis=1)
+            n_vertices = len(self._vertices)
+            self._edge_graph = csr_matrix(
+                (lengths, (edges[:, 0], edges[:, 1])), shape=(n_vertices, n_vertices)
+            )
+        return self._edge_graph
+
+    def _get_edge_path(self, start_vid: int, goal_vid: int) -> Tuple[float, np.ndarray]:
+        """
+        Approximates the geodesic between two vertices by the shortest path along the
+        edges of the navigation mesh (Dijkstra). The approximation is never shorter than
+        the exact geodesic.
+
+        Args:
+            start_vid (int): index of the start vertex
+            goal_vid (int): index of the goal vertex
+
+        Returns:
+            float: length of the shortest path along the mesh edges (inf if not connected)
+            np.ndarray[N, 3]: the path (empty if the vertices are not connected)
+        """
+        distances, predecessors = dijkstra(
+            self._get_edge_graph(), directed=False, indices=start_vid, return_predecessors=True
+        )
+        dist = distances[goal_vid]
+        if not np.isfinite(dist):
+            return dist, np.empty((0, 3))
+
+        path_vids = [goal_vid]
+        while path_vids[-1] != start_vid:
+            path_vids.append(predecessors[path_vids[-1]])
+        return dist, self._vertices[path_vids[::-1]]
+
+    @staticmethod
+    def _load_scene_objects(scene_graph_json_path: Path) -> Dict[int, Tuple[str, np.ndarray]]:
+        """
+        Loads the semantic labels and centroids of the scene graph nodes.
+
+        Args:
+            scene_graph_json_path (Path): path to the scene_graph.json of the scene
+
+        Returns:
+            Dict[int, Tuple[str, np.ndarray]]: object ID -> (semantic label, centroid)
+        """
+        if not scene_graph_json_path.is_file():
+            return {}
+        with open(scene_graph_json_path, "r") as file:
+            nodes = json.load(file)["nodes"]
+        return {
+            int(node_id): (str(node.get("label", "object")), np.array(node["centroid"], dtype=float))
+            for node_id, node in nodes.items()
+        }
+
+    def _get_object_distances(self, navmesh_filepath: Path, scene_graph_json_path: Path) -> Optional[ObjectDistanceMatrix]:
+        """
+        Loads the navigable distances between all objects of the scene graph from
+        object_distances.npz next to scene_graph.json, or computes and persists them if the
+        file is missing or outdated (scene graph, navmesh or distance mode changed).
+
+        Args:
+            navmesh_filepath (Path): path to the navigation mesh file
+            scene_graph_json_path (Path): path to the scene_graph.json of the scene
+
+        Returns:
+            Optional[ObjectDistanceMatrix]: the distance matrix (None if there is no scene graph)
+        """
+        if not scene_graph_json_path.is_file():
+            logger.warning("No scene graph at %s, object distances are not precomputed.", scene_graph_json_path)
+            return None
+
+        source_hash = "-".join([
+            file_sha256(scene_graph_json_path),
+            file_sha256(navmesh_filepath),
+            "approximate" if self._approximate else "exact",
+        ])
+        matrix_path = scene_graph_json_path.with_name(OBJECT_DISTANCES_FILE_NAME)
+        if matrix_path.is_file():
+            with np.load(matrix_path, allow_pickle=False) as data:
+                if str(data["source_hash"]) == source_hash:
+                    logger.info("Loaded the object distances from %s", matrix_path)
+                    return ObjectDistanceMatrix(data["object_ids"], data["labels"], data["distances"])
+
+        object_ids = np.array(list(self._objects), dtype=int)
+        labels = np.array([label for label, _ in self._objects.values()])
+        centroids = np.array([centroid for _, centroid in self._objects.values()], dtype=float).reshape(-1, 3)
+
+        logger.info("Computing the navigable distances between %d objects.", len(object_ids))
+        matrix = ObjectDistanceMatrix(object_ids, labels, self._compute_object_distances(centroids))
+        np.savez(
+            matrix_path,
+            object_ids=matrix.object_ids,
+            labels=matrix.labels,
+            distances=matrix.distances,
+            source_hash=np.array(source_hash),
+        )
+        return matrix
+
+    def _compute_object_distances(self, centroids: np.ndarray) -> np.ndarray:
+        """
+        Computes the all-pairs navigable distances between points by snapping them to the
+        navigation mesh and running one single-source geodesic (or Dijkstra) per distinct
+        snapped vertex.
+
+        Args:
+            centroids (np.ndarray[N, 3]): the points
+
+        Returns:
+            np.ndarray[N, N]: navigable distances between the points (inf if not navigable)
+        """
+        if len(centroids) == 0:
+            return np.zeros((0, 0))
+        _, _, vertex_ids = self.snap_points(centroids)
+        unique_vids, inverse = np.unique(vertex_ids, return_inverse=True)
+
+        if self._approximate:
+            rows = dijkstra(self._get_edge_graph(), directed=False, indices=unique_vids)[:, unique_vids]
+        else:
+            if self._geoalg is None:
+                self._geoalg = geodesic.PyGeodesicAlgorithmExact(self._vertices, self._faces)
+            rows = np.stack([
+                self._geoalg.geodesicDistances(np.array([vid]))[0][unique_vids] for vid in unique_vids
+            ])
+        rows = np.where(np.isfinite(rows) & (rows < 1e99), rows, np.inf)
+        rows = np.minimum(rows, rows.T)  # remove numerical asymmetries
+        return rows[inverse][:, inverse]
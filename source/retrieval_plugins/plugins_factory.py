@@ -1,13 +1,13 @@
 from pathlib import Path
 from typing import Optional
 
-from llama_index.embeddings.clip import ClipEmbedding
-
 from retrieval_plugins.text_plugin import TextPlugin
 from retrieval_plugins.sql_plugin import SqlPlugin
 from retrieval_plugins.image_plugin import ImagePlugin
 from retrieval_plugins.nav_plugin import NavPlugin
+from planner_core.clip_embedding import BatchedClipEmbedding
 from planner_core.config_handler import ConfigPrefix
+from planner_core.embedding_cache import with_embedding_cache
 from planner_core.interfaces import AbstractModelFactory, AbstractLlmChatFactory
 
 
@@ -58,7 +58,7 @@ class PluginsFactory:
             ImagePlugin: instance of the image plugin
         """
         image_llm = self._model_factory.get_multimodal_llm_model(ConfigPrefix.IMAGES)
-        image_embed = ClipEmbedding()
+        image_embed = with_embedding_cache(BatchedClipEmbedding())
         chat_llm = self._chat_model_factory.get_llm_chat()
         return ImagePlugin(image_llm, chat_llm, image_embed, image_dir, persist_dir)
 
@@ -81,7 +81,10 @@ class PluginsFactory:
         return TextPlugin(llm_text, text_embed, llm_chat, text_dir, persist_dir)
 
     def get_nav_plugin(
-        self, navmesh_path: Path, vis_dir_path: Optional[Path] = None
+        self,
+        navmesh_path: Path,
+        vis_dir_path: Optional[Path] = None,
+        scene_graph_json_path: Optional[Path] = None,
     ) -> NavPlugin:
         """
         Creates an instance of the navigation plugin.
@@ -89,9 +92,10 @@ class PluginsFactory:
         Args:
             navmesh_path (Path): path to the navmesh file
             vis_dir_path (Optional[Path]): path to the directory where the plugin will save visualizations of the results
+            scene_graph_json_path (Optional[Path]): path to the scene graph JSON, whose object-to-object distances are precomputed
 
         Returns:
             NavPlugin: instance of the navigation plugin
         """
         llm_nav = self._model_factory.get_llm_model(ConfigPrefix.NAVIGATION)
-        return NavPlugin(llm_nav, navmesh_path, vis_dir_path)
+        return NavPlugin(llm_nav, navmesh_path, vis_dir_path, scene_graph_json_path=scene_graph_json_path)
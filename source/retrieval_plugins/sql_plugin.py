@@ -1,12 +1,16 @@
+import hashlib
 import json
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Annotated, Dict
+from typing import Annotated, Dict, List, Tuple
 import logging
 
+import numpy as np
 from sqlalchemy import text
 from llama_index.core import ServiceContext
 from llama_index.core.schema import TextNode
-from llama_index.core.llms import ChatMessage
 from llama_index.core.retrievers import SQLRetriever
 from llama_index.core.prompts.default_prompts import DEFAULT_TEXT_TO_SQL_PROMPT
 from llama_index.core.llms import ChatResponse
@@ -32,7 +36,13 @@ from llama_index.core import (
 
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 
-from planner_core.rag_sql_loader import load_sql_database, get_dict_to_index
+from planner_core.index_manifest import IndexManifest
+from planner_core.rag_sql_loader import (
+    DetectedObject,
+    load_sql_database,
+    get_dict_to_index,
+    has_spatial_index,
+)
 from configs.plugin_prompts import (
     SQL_FUN_PROMPT,
     SQL_IN_PROMPT,
@@ -41,12 +51,30 @@ from configs.plugin_prompts import (
     SQL_MENTIONED_ELEMENTS_PROMPT,
     SQL_FUN_DIST_PROMPT,
     SQL_IN_DIST_PROMPT,
-    SQL_DIST_DISCARD_PROMPT
+    SQL_DIST_DISCARD_PROMPT,
+    SQL_SPATIAL_FUNCTIONS_CONTEXT,
+    SQL_SPATIAL_INDEX_CONTEXT,
 )
 
 logger = logging.getLogger("SQL")
 
 
+@dataclass(frozen=True)
+class SqlTranslation:
+    """Result of translating a natural language question into SQL."""
+
+    mentioned_elements: Dict[str, List[str]]
+    sql_query: str
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a natural language query for use as a cache key (case, whitespace
+    and trailing punctuation are ignored).
+    """
+    return re.sub(r"\s+", " ", query.strip().lower()).rstrip("?.! ")
+
+
 class SqlPlugin:
     def __init__(
         self,
@@ -55,6 +83,7 @@ class SqlPlugin:
         json_file_path: Path,
         persist_dir: Path = Path(".SQL_DIR"),
         top_k: int = 5,
+        translation_cache_size: int = 256,
     ) -> None:
         """
         Constructor.
@@ -68,30 +97,46 @@ class SqlPlugin:
             json_file_path (Path): path to a JSON file containing data
                 for the tables in the database
             persist_dir (Path): path to a directory in which the storage context
-                is persisted (or is to be persisted if it does not exist yet)
+                and the SQLite database are persisted (or are to be persisted if they
+                do not exist yet)
             top_k (int): number of most similar classes to retrieve from the vector
                 stores for each table
+            translation_cache_size (int): maximum number of cached question to
+                (mentioned elements, SQL) translations
 
         Returns:
             None
         """
         self._embed_model: BaseEmbedding = embed_model
         self._llm: BaseLLM = llm
-        self._sql_db: SQLDatabase = load_sql_database(json_file_path)
+        # The digest of the JSON file versions the database (and the cached translations)
+        self._sql_db, self._db_version = load_sql_database(json_file_path, persist_dir)
         self._to_index: Dict[str, str] = get_dict_to_index()
+        self._spatial_context: Dict[str, str] = self._get_spatial_context()
+        # The schema part of the table contexts only depends on the database, so it is
+        # assembled once instead of on every question
+        self._table_infos: Dict[str, str] = self._get_table_infos()
         self._vector_index_dict: Dict[str, VectorStoreIndex] = self._index_columns(
             persist_dir
         )
+        self._class_embeddings: Dict[str, Tuple[List[str], np.ndarray]] = (
+            self._get_class_embeddings()
+        )
         self._top_k: int = top_k
         self._parser: BaseSQLParser = DefaultSQLParser()
 
         self._query_engine = NLSQLTableQueryEngine(
-            sql_database=self._sql_db, llm=llm, embed_model=self._embed_model
+            sql_database=self._sql_db,
+            llm=llm,
+            embed_model=self._embed_model,
+            context_query_kwargs=self._spatial_context,
         )
-        self._qp = self._get_query_pipeline()
+        self._translation_cache: "OrderedDict[Tuple[str, str], SqlTranslation]" = OrderedDict()
+        self._translation_cache_size: int = translation_cache_size
+        self._translation_qp, self._response_qp = self._get_query_pipelines()
 
     @kernel_function(description=SQL_FUN_PROMPT, name="Sql")
-    def get_quantitative_response(
+    async def get_quantitative_response(
         self, query: Annotated[str, SQL_IN_PROMPT]
     ) -> Annotated[str, SQL_OUT_PROMPT]:
         """
@@ -105,11 +150,43 @@ class SqlPlugin:
         Returns:
             str: natural language response to the query based on the data from SQL DB
         """
-        logger.info(f"Query: {query}")
-        response = str(self._qp.run(query=query))
+        logger.info("Query: %s", query)
+        cache_key = (normalize_query(query), self._db_version)
+        translation = self._translation_cache.get(cache_key)
+        if translation is not None:
+            self._translation_cache.move_to_end(cache_key)
+            logger.info("Reusing cached SQL translation: %s", translation.sql_query)
+        else:
+            translation = await self._translation_qp.arun(query_str=query)
+        try:
+            response = str(
+                await self._response_qp.arun(query_str=query, sql_query=translation.sql_query)
+            )
+        except Exception:
+            self._translation_cache.pop(cache_key, None)
+            raise
+        # Only translations whose SQL query executed successfully are reused
+        self._cache_translation(cache_key, translation)
         response = response.removeprefix("assistant: ")
-        logger.info(f"Response: {response}")
+        logger.info("Response: %s", response)
         return response
+
+    def _cache_translation(self, cache_key: Tuple[str, str], translation: SqlTranslation) -> None:
+        """
+        Caches the translation of an identical (normalized) question on the same version
+        of the database, evicting the least recently used translation when the cache is full.
+
+        Args:
+            cache_key (Tuple[str, str]): normalized query and version of the database
+            translation (SqlTranslation): mentioned elements and SQL query for the query
+
+        Returns:
+            None
+        """
+        self._translation_cache[cache_key] = translation
+        self._translation_cache.move_to_end(cache_key)
+        if len(self._translation_cache) > self._translation_cache_size:
+            self._translation_cache.popitem(last=False)
     
     @kernel_function(description=SQL_FUN_DIST_PROMPT, name="SqlDist")
     def get_distance_related_response(
@@ -136,7 +213,9 @@ class SqlPlugin:
         """
         Indexes columns in the SQL database in accordance to the specified columns in
         self._to_index[table_name], so that the unique classes in these columns are
-        stored in the vector stores.
+        stored in the vector stores. A persisted index is reused as long as its manifest
+        matches the scene data; otherwise only the added (removed) classes are embedded
+        and inserted (deleted).
 
         Args:
             persist_dir_path (Path): path to a directory in which the storage context
@@ -149,25 +228,102 @@ class SqlPlugin:
         vector_index_dict = {}
         for table_name in self._sql_db.get_usable_table_names():
             persist_subdir = persist_dir_path / table_name
-            if not persist_subdir.is_dir():
-                q = f'SELECT DISTINCT {self._to_index[table_name]} FROM "{table_name}"'
-                with self._sql_db.engine.connect() as conn:
-                    cursor = conn.execute(text(q))
-                    result = cursor.fetchall()
-                nodes = [TextNode(text=tuple(row)[0]) for row in result]
+            manifest = IndexManifest.load(persist_subdir)
+            if manifest is not None and manifest.source_version == self._db_version:
+                vector_index_dict[table_name] = load_index_from_storage(
+                    StorageContext.from_defaults(persist_dir=str(persist_subdir)),
+                    embed_model=self._embed_model,
+                )
+                continue
+
+            q = f'SELECT DISTINCT {self._to_index[table_name]} FROM "{table_name}"'
+            with self._sql_db.engine.connect() as conn:
+                cursor = conn.execute(text(q))
+                result = cursor.fetchall()
+            # The class names are the sources; their node ids are derived from them
+            sources = {
+                tuple(row)[0]: hashlib.sha256(tuple(row)[0].encode("utf-8")).hexdigest()
+                for row in result
+            }
+
+            if manifest is None:
+                if persist_subdir.is_dir():
+                    logger.info("Column index in %s has no manifest, rebuilding it.", persist_subdir)
+                nodes = [TextNode(text=name, id_=node_id) for name, node_id in sources.items()]
                 index = VectorStoreIndex(nodes, embed_model=self._embed_model)
-                index.storage_context.persist(str(persist_subdir))
             else:
-                storage_context = StorageContext.from_defaults(
-                    persist_dir=str(persist_subdir)
-                )
                 index = load_index_from_storage(
-                    storage_context, embed_model=self._embed_model
+                    StorageContext.from_defaults(persist_dir=str(persist_subdir)),
+                    embed_model=self._embed_model,
                 )
+                diff = manifest.diff(sources)
+                logger.info("Updating the column index of %s: %s", table_name, diff)
+                removed_ids = [manifest.sources[name] for name in diff.removed]
+                if removed_ids:
+                    index.delete_nodes(removed_ids, delete_from_docstore=True)
+                    for node_id in removed_ids:
+                        index.index_struct.delete(node_id)
+                    index.storage_context.index_store.add_index_struct(index.index_struct)
+                index.insert_nodes([TextNode(text=name, id_=sources[name]) for name in diff.added])
+
+            index.storage_context.persist(str(persist_subdir))
+            IndexManifest(sources, source_version=self._db_version).save(persist_subdir)
             vector_index_dict[table_name] = index
 
         return vector_index_dict
 
+    def _get_class_embeddings(self) -> Dict[str, Tuple[List[str], np.ndarray]]:
+        """
+        Collects the (already computed) embeddings of the distinct classes stored in the
+        vector indexes into one L2-normalized matrix per table, such that the similarity
+        search for the mentioned elements runs locally.
+
+        Returns:
+            Dict[str, Tuple[List[str], np.ndarray]]: dictionary with table names as keys and
+                values being the class names and their normalized embeddings (n_classes, dim)
+        """
+        class_embeddings = {}
+        for table_name, index in self._vector_index_dict.items():
+            class_names, embeddings = [], []
+            for node_id, node in index.docstore.docs.items():
+                class_names.append(node.get_content())
+                embeddings.append(index.vector_store.get(node_id))
+            matrix = np.asarray(embeddings, dtype=np.float32)
+            if len(class_names) > 0:
+                matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            class_embeddings[table_name] = (class_names, matrix)
+        return class_embeddings
+
+    def _get_spatial_context(self) -> Dict[str, str]:
+        """
+        Creates the context advertising the spatial SQL functions (and the R-tree spatial
+        index, if it exists) for the detected objects table.
+
+        Returns:
+            Dict[str, str]: dictionary with table names as keys and spatial context strings as values
+        """
+        spatial_context = SQL_SPATIAL_FUNCTIONS_CONTEXT
+        if has_spatial_index(self._sql_db):
+            spatial_context += SQL_SPATIAL_INDEX_CONTEXT
+        return {DetectedObject.__tablename__: spatial_context}
+
+    def _get_table_infos(self) -> Dict[str, str]:
+        """
+        Creates the static part of the context string (schema, table description and
+        spatial context) for each table in the SQL database.
+
+        Returns:
+            Dict[str, str]: dictionary with table names as keys and context strings as values
+        """
+        table_infos = {}
+        for table_name in self._sql_db.get_usable_table_names():
+            table_info = self._sql_db.get_single_table_info(table_name)
+            table_info += " Do not try to access columns that were not mentioned.\n"
+            table_info += SQL_TABLE_CONTEXTS[table_name]
+            table_info += self._spatial_context.get(table_name, "")
+            table_infos[table_name] = table_info
+        return table_infos
+
     def _get_table_context_str(self, available_classes_str: Dict[str, str]) -> str:
         """
         Based on the provided available classes strings, creates a context string for
@@ -180,42 +336,72 @@ class SqlPlugin:
         Returns:
             str: context string for each table in the SQL database
         """
-        context_strs = []
-        for table_name in self._sql_db.get_usable_table_names():
-            table_info = self._sql_db.get_single_table_info(table_name)
-            table_info += " Do not try to access columns that were not mentioned.\n"
-            table_info += SQL_TABLE_CONTEXTS[table_name]
-            table_info += available_classes_str.get(table_name, "")
-            context_strs.append(table_info)
-        return "\n\n".join(context_strs)
+        return "\n\n".join(
+            table_info + available_classes_str.get(table_name, "")
+            for table_name, table_info in self._table_infos.items()
+        )
 
-    def _get_relevant_classes(self, elements: ChatMessage) -> Dict[str, str]:
+    def _parse_mentioned_elements(self, elements: ChatResponse) -> Dict[str, List[str]]:
+        """
+        Parses the elements mentioned in the natural language query, extracted by a chat.
+
+        Args:
+            elements (ChatResponse): message containing the mentioned elements in a form
+                of json
+
+        Returns:
+            Dict[str, List[str]]: dictionary with table names as keys and lists of
+                mentioned elements as values (empty if the message could not be parsed)
+        """
+        try:
+            return json.loads(elements.message.content)
+        except (json.JSONDecodeError, AttributeError, TypeError):
+            logger.warning("Could not parse the mentioned elements: %s", elements)
+            return {}
+
+    def _get_relevant_classes(self, elements_dict: Dict[str, List[str]]) -> Dict[str, str]:
         """
         Retrieves classes from the SQL database which are most similar to the mentioned
         elements, extracted by a chat from the natural language query.
 
+        All mentioned elements (of all tables) are embedded in one batched request, the
+        cosine similarity search against the class embeddings is done locally.
+
         Args:
-            elements (ChatMessage): message containing the mentioned elements in a form
-                of json
+            elements_dict (Dict[str, List[str]]): dictionary with table names as keys and
+                lists of mentioned elements as values
         
         Returns:
             Dict[str, str]: dictionary with table names as keys and strings with the
                 most similar available classes as values
         """
         try:
-            elements_dict: Dict[str, str] = json.loads(elements.message.content)
             columns_context = {}
-            for table_name in elements_dict:
-                vector_retriever = self._vector_index_dict[table_name].as_retriever(
-                    similarity_top_k=self._top_k
+            all_elements = [el for table_name in elements_dict for el in elements_dict[table_name]]
+            if len(all_elements) > 0:
+                element_embeddings = np.asarray(
+                    self._embed_model.get_text_embedding_batch(all_elements), dtype=np.float32
+                )
+                element_embeddings /= np.maximum(
+                    np.linalg.norm(element_embeddings, axis=1, keepdims=True), 1e-12
                 )
+
+            offset = 0
+            for table_name in elements_dict:
+                n_elements = len(elements_dict[table_name])
+                table_element_embeddings = element_embeddings[offset:offset + n_elements] if n_elements else None
+                offset += n_elements
+
+                class_names, class_matrix = self._class_embeddings[table_name]
                 available_classes = set()
-                for el in elements_dict[table_name]:
-                    relevant_nodes = vector_retriever.retrieve(el)
-                    for node in relevant_nodes:
-                        available_classes.add(node.get_content())
+                if n_elements > 0 and len(class_names) > 0:
+                    # (n_elements, n_classes) cosine similarities
+                    similarities = table_element_embeddings @ class_matrix.T
+                    k = min(self._top_k, len(class_names))
+                    top_k_indices = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+                    available_classes.update(class_names[i] for i in top_k_indices.ravel())
                 logger.info(
-                    f"Most similar classes to {elements_dict[table_name]}: {available_classes}"
+                    "Most similar classes to %s: %s", elements_dict[table_name], available_classes
                 )
 
                 columns_context[table_name] = ""
@@ -230,8 +416,9 @@ class SqlPlugin:
                         + "."
                     )
             return columns_context
-        except:
-            return {}        
+        except Exception as e:
+            logger.warning("Could not retrieve the classes similar to %s: %s", elements_dict, e)
+            return {}
 
     def _parse_sql_response(self, response: ChatResponse) -> str:
         """
@@ -244,23 +431,44 @@ class SqlPlugin:
         Returns:
             str: SQL query response
         """
-        logger.info(f"SQL query: {response.message.content}")
+        logger.info("SQL query: %s", response.message.content)
         return self._parser.parse_response_to_sql(response.message.content, "")
 
-    def _get_query_pipeline(self) -> QP:
+    def _pack_translation(
+        self, mentioned_elements: Dict[str, List[str]], sql_query: str
+    ) -> SqlTranslation:
+        """
+        Packs the outputs of the translation query pipeline, such that they can be cached.
+
+        Args:
+            mentioned_elements (Dict[str, List[str]]): elements mentioned in the query
+            sql_query (str): SQL query generated for the natural language query
+
+        Returns:
+            SqlTranslation: mentioned elements and SQL query
         """
-        Creates a query pipeline for answering natural language questions,
-        based on the data of the SQL database.
+        return SqlTranslation(mentioned_elements=mentioned_elements, sql_query=sql_query)
+
+    def _get_query_pipelines(self) -> Tuple[QP, QP]:
+        """
+        Creates the query pipelines for answering natural language questions,
+        based on the data of the SQL database. The translation pipeline turns the
+        question into SQL (its result is cached per question), the response pipeline
+        executes the SQL query and synthesizes the response.
+
+        Independent modules of the pipelines are run concurrently by `arun`.
 
         Returns:
-            QP: LlamaIndex's query pipeline for the SQL plugin
+            Tuple[QP, QP]: LlamaIndex's translation and response query pipelines for the SQL plugin
         """
 
         sql_retriever = SQLRetriever(self._sql_db)
 
         context_parser_component = FnComponent(fn=self._get_table_context_str)
         sql_parser_component = FnComponent(fn=self._parse_sql_response)
+        elements_parser_component = FnComponent(fn=self._parse_mentioned_elements)
         elements_retriever_component = FnComponent(fn=self._get_relevant_classes)
+        translation_packer_component = FnComponent(fn=self._pack_translation)
 
         text2sql_prompt = DEFAULT_TEXT_TO_SQL_PROMPT.partial_format(
             dialect=self._sql_db.engine.dialect.name
@@ -279,44 +487,63 @@ class SqlPlugin:
             template=(SQL_MENTIONED_ELEMENTS_PROMPT + "Query: {query_str}\n")
         )
 
-        qp = QP(
+        translation_qp = QP(
             modules={
                 "input": InputComponent(),
                 "query2elements_prompt": mentioned_elements_prompt,
                 "query2elements_llm": self._llm,
+                "elements_parser": elements_parser_component,
                 "elements_retriever_parser": elements_retriever_component,
                 "context_parser": context_parser_component,
                 "text2sql_prompt": text2sql_prompt,
                 "text2sql_llm": self._llm,
                 "sql_output_parser": sql_parser_component,
-                "sql_retriever": sql_retriever,
-                "response_synthesis_prompt": response_synthesis_prompt,
-                "response_synthesis_llm": self._llm,
+                "translation_packer": translation_packer_component,
             },
         )
 
-        qp.add_link("input", "query2elements_prompt", dest_key="query_str")
-        qp.add_link("query2elements_prompt", "query2elements_llm")
-        qp.add_link(
-            "query2elements_llm", "elements_retriever_parser", dest_key="elements"
+        translation_qp.add_link("input", "query2elements_prompt", dest_key="query_str")
+        translation_qp.add_link("query2elements_prompt", "query2elements_llm")
+        translation_qp.add_link(
+            "query2elements_llm", "elements_parser", dest_key="elements"
         )
-        qp.add_link(
+        translation_qp.add_link(
+            "elements_parser", "elements_retriever_parser", dest_key="elements_dict"
+        )
+        translation_qp.add_link(
             "elements_retriever_parser",
             "context_parser",
             dest_key="available_classes_str",
         )
-        qp.add_link("input", "text2sql_prompt", dest_key="query_str")
-        qp.add_link("context_parser", "text2sql_prompt", dest_key="schema")
-        qp.add_chain(
-            ["text2sql_prompt", "text2sql_llm", "sql_output_parser", "sql_retriever"]
+        translation_qp.add_link("input", "text2sql_prompt", dest_key="query_str")
+        translation_qp.add_link("context_parser", "text2sql_prompt", dest_key="schema")
+        translation_qp.add_chain(["text2sql_prompt", "text2sql_llm", "sql_output_parser"])
+        translation_qp.add_link(
+            "elements_parser", "translation_packer", dest_key="mentioned_elements"
         )
-        qp.add_link(
-            "sql_output_parser", "response_synthesis_prompt", dest_key="sql_query"
+        translation_qp.add_link(
+            "sql_output_parser", "translation_packer", dest_key="sql_query"
         )
-        qp.add_link(
+
+        response_qp = QP(
+            modules={
+                "input": InputComponent(),
+                "sql_retriever": sql_retriever,
+                "response_synthesis_prompt": response_synthesis_prompt,
+                "response_synthesis_llm": self._llm,
+            },
+        )
+
+        response_qp.add_link("input", "sql_retriever", src_key="sql_query")
+        response_qp.add_link(
+            "input", "response_synthesis_prompt", src_key="sql_query", dest_key="sql_query"
+        )
+        response_qp.add_link(
             "sql_retriever", "response_synthesis_prompt", dest_key="context_str"
         )
-        qp.add_link("input", "response_synthesis_prompt", dest_key="query_str")
-        qp.add_link("response_synthesis_prompt", "response_synthesis_llm")
+        response_qp.add_link(
+            "input", "response_synthesis_prompt", src_key="query_str", dest_key="query_str"
+        )
+        response_qp.add_link("response_synthesis_prompt", "response_synthesis_llm")
 
-        return qp
+        return translation_qp, response_qp
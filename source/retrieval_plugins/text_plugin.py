@@ -1,4 +1,5 @@
 import logging
+import time
 from pathlib import Path
 from typing import Annotated, Optional, List, Set
 
@@ -6,6 +7,7 @@ from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.base.llms.base import BaseLLM
 from llama_index.core.vector_stores.types import MetadataFilters, ExactMatchFilter
 from llama_index.core.indices.base import BaseIndex
+from llama_index.core.query_engine import RetrieverQueryEngine
 from semantic_kernel.functions.kernel_function_decorator import kernel_function
 from llama_index.core import (
     Document,
@@ -14,7 +16,9 @@ from llama_index.core import (
     load_index_from_storage,
 )
 
+from planner_core.hybrid_retrieval import BM25Index, HybridRetriever
 from planner_core.interfaces import AbstractLlmChat
+from planner_core.index_manifest import IndexManifest, hash_text_sources, refresh_index
 from planner_core.rag_document_loaders import load_text_documents
 from configs.plugin_prompts import (
     TEXT_FUN_PROMPT,
@@ -35,6 +39,7 @@ class TextPlugin:
         txt_dir: Optional[Path] = None,
         persist_dir: Path = Path(".TEXT_DIR"),
         top_k: int = 3,
+        lexical_decisive_ratio: float = 2.0,
     ) -> None:
         """
         Constructor
@@ -49,6 +54,8 @@ class TextPlugin:
                 is persisted (or is to be persisted if it does not exist yet)
             top_k (int): number of documents most similar to the query taken into account
                 when answering the it
+            lexical_decisive_ratio (float): ratio between the best and second best BM25
+                scores above which the lexical matches are used without embedding the query
 
         Returns:
             None
@@ -57,8 +64,11 @@ class TextPlugin:
         self._llm_text: BaseLLM = llm_text #BaseLLM from LlamaIndex, especially made for RAG
         self._embed_model: BaseEmbedding = embed_model
         self._llm_chat: AbstractLlmChat = llm_chat
+        self._lexical_decisive_ratio: float = lexical_decisive_ratio
         self._rooms: Set[str] = set()
         self._index: BaseIndex = self._get_index(persist_dir, txt_dir)
+        # Built from the (refreshed) index nodes so that both indexes cover the same chunks
+        self._bm25_index: BM25Index = BM25Index(list(self._index.docstore.docs.values()))
 
     @kernel_function(description=TEXT_FUN_PROMPT, name="Text")
     def get_descriptive_response(
@@ -74,9 +84,11 @@ class TextPlugin:
             str: answer from the LLM
         """
         logger.info(f"Query: {query}")
+        start = time.perf_counter()
         query_engine = self._get_query_engine(query)
         result = query_engine.query(query)
         logger.info(f"Answer: {result}")
+        logger.info("Text query answered in %.2f s.", time.perf_counter() - start)
         return result.response
 
     def _get_index(
@@ -84,7 +96,9 @@ class TextPlugin:
     ) -> BaseIndex:
         """
         Creates an index based on the data in the provided text files or in the previously
-        saved storage context.
+        saved storage context. A persisted index is brought up to date with the text files
+        using its manifest of file hashes: only added, changed or removed files are
+        re-embedded/deleted.
 
         Args:
             persist_dir (Path): path to a directory in which the storage context
@@ -99,42 +113,55 @@ class TextPlugin:
             FileNotFoundError: if neither the persist directory nor the input text file
                 exists/is valid
         """
+        has_sources = text_dir is not None and text_dir.is_dir()
+        manifest = IndexManifest.load(persist_dir)
 
-        if persist_dir.is_dir():
+        if persist_dir.is_dir() and (manifest is not None or not has_sources):
             storage_context: StorageContext = StorageContext.from_defaults(
                 persist_dir=persist_dir
             )
-            for doc in storage_context.docstore.docs.values():
-                self._rooms.add(doc.metadata["room_name"])
-
             index: BaseIndex = load_index_from_storage(
                 storage_context, embed_model=self._embed_model
             )
 
-        elif text_dir and text_dir.is_dir():
+            if has_sources:
+                sources = hash_text_sources(text_dir)
+                diff = manifest.diff(sources)
+                if diff:
+                    logger.info("Updating the text index: %s", diff)
+                    refresh_index(index, diff, load_text_documents(text_dir, diff.to_load))
+                    index.storage_context.persist(persist_dir=persist_dir)
+                    IndexManifest(sources).save(persist_dir)
+
+        elif has_sources:
+            if persist_dir.is_dir():
+                logger.info("Text index in %s has no manifest, rebuilding it.", persist_dir)
+            sources = hash_text_sources(text_dir)
             docs: List[Document] = load_text_documents(text_dir)
             index: BaseIndex = VectorStoreIndex.from_documents(
                 docs, embed_model=self._embed_model
             )
-
-            for doc in docs:
-                self._rooms.add(doc.metadata["room_name"])
             index.storage_context.persist(persist_dir=persist_dir)
+            IndexManifest(sources).save(persist_dir)
         else:
             raise FileNotFoundError(
                 "Neither the persist directory nor the text data directory exists."
             )
+
+        for doc in index.docstore.docs.values():
+            self._rooms.add(doc.metadata["room_name"])
         return index
 
-    def _get_query_engine(self, query: str):
+    def _get_query_engine(self, query: str) -> RetrieverQueryEngine:
         """
-        Creates a query engine, including a metadata filter based on the query
+        Creates a query engine over the hybrid (BM25 and vector) retriever, including
+        a metadata filter based on the query
 
         Args:
             query (str): a query regarding the stored data
 
         Returns:
-            BaseQueryEngine: query engine with the metadata filter if the query is about
+            RetrieverQueryEngine: query engine with the metadata filter if the query is about
             specific rooms
         """
         system_msg = TEXT_METADATA_ROOM_PROMPT.format(self._rooms)
@@ -142,19 +169,24 @@ class TextPlugin:
 
         if response == "None" or response not in self._rooms:
             logger.info("No metadata filter")
-            return self._index.as_query_engine(
-                llm=self._llm_text,
-                embed_model=self._embed_model,
-                similarity_top_k=self._top_k,
-            )
+            room_name = None
+            filters = None
         else:
             logger.info(f"Rooms specified in the query: {response}")
+            room_name = response
             filters = MetadataFilters(
                 filters=[ExactMatchFilter(key="room_name", value=response)]
             )
-            return self._index.as_query_engine(
-                llm=self._llm_text,
+
+        retriever = HybridRetriever(
+            self._bm25_index,
+            self._index.as_retriever(
                 embed_model=self._embed_model,
                 similarity_top_k=self._top_k,
                 filters=filters,
-            )
+            ),
+            top_k=self._top_k,
+            decisive_ratio=self._lexical_decisive_ratio,
+            room_name=room_name,
+        )
+        return RetrieverQueryEngine.from_args(retriever, llm=self._llm_text)
@@ -16,14 +16,14 @@ class CoreMemoryPlugin:
     @kernel_function(description="Use this function to store core information that you acquired through interaction with the environment. The information can be certain things that you discovered, insights or results from a series of important calculations or a reasoning process.")
     def store_core_information(self, agent_name: Annotated[str, "The name of the agent that is storing this information."], information: Annotated[str, "A 1-2 sentence summary of the core information you want to store."]) -> str:
         """Store the core information in the robot's core memory."""
-        agent_name = agent_name.lower()
-        robot_state.core_memory.setdefault(agent_name, "")  # Ensure the key exists
-        robot_state.core_memory[agent_name] += information
+        _, replaced = robot_state.core_memory.store(information, source=agent_name.lower())
+        if replaced:
+            return f"Core information stored (replacing a similar entry): {information}"
         return f"Core information stored: {information}"
     
     
-    @kernel_function(description="Use this function to retrieve core information from the robot's core memory.")
-    def retrieve_core_information(self) -> str:
-        """Retrieve the core information from the robot's core memory."""
-        return robot_state.core_memory
+    @kernel_function(description="Use this function to retrieve the core information from the robot's core memory that is relevant to a query (e.g. your current task).")
+    def retrieve_core_information(self, query: Annotated[str, "What the core information should be relevant to, e.g. your current task."]) -> str:
+        """Retrieve the core information relevant to the query from the robot's core memory."""
+        return robot_state.core_memory.get_prompt(query)
     
\ No newline at end of file
@@ -52,13 +52,13 @@ class TaskExecutionGoalChecker:
             explanation=explanation,
             plan=robot_planner.plan,
             tasks_completed=robot_planner.tasks_completed,
-            scene_graph=str(robot_state.scene_graph.scene_graph_to_dict()),
+            scene_graph=robot_state.get_scene_graph_prompt(thread_key="planning"),
             robot_position=str(robot_state.virtual_robot_pose) if not use_robot else str(frame_transformer.get_current_body_position_in_frame(robot_state.frame_name)),
-            core_memory=str(robot_state.core_memory)
+            core_memory=robot_state.core_memory.get_prompt(robot_planner.goal)
         )
         
         logger.debug("========================================")
-        logger.debug(f"Goal checker prompt (task execution): {check_if_goal_is_completed_prompt}")
+        logger.debug("Goal checker prompt (task execution): %s", check_if_goal_is_completed_prompt)
         logger.debug("========================================")
 
         response, robot_planner.planning_chat_thread, agent_response_logs = await invoke_agent(
@@ -109,12 +109,12 @@ class TaskPlannerGoalChecker:
             plan=robot_planner.plan,
             tasks_completed=robot_planner.tasks_completed,
             explanation=explanation,
-            scene_graph=str(robot_state.scene_graph.scene_graph_to_dict()),
+            scene_graph=robot_state.get_scene_graph_prompt(thread_key="planning"),
             robot_position=str(robot_state.virtual_robot_pose) if not use_robot else str(frame_transformer.get_current_body_position_in_frame(robot_state.frame_name)),
-            core_memory=str(robot_state.core_memory)
+            core_memory=robot_state.core_memory.get_prompt(robot_planner.goal)
         )
         logger.debug("========================================")
-        logger.debug(f"Goal checker prompt (task planner): {check_if_goal_is_completed_prompt}")
+        logger.debug("Goal checker prompt (task planner): %s", check_if_goal_is_completed_prompt)
         logger.debug("========================================")
         
         response, robot_planner.planning_chat_thread, agent_response_logs = await invoke_agent(
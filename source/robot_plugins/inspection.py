@@ -119,8 +119,13 @@ class InspectionPlugin:
                 logging.info(f"Captured images: color_shape={color_image.shape}, depth_shape={depth_image.shape}")
                 
                 # Store in robot state
-                robot_state.set_image_state(color_image)
-                robot_state.set_depth_image_state(depth_image)
+                robot_state.add_image_frame(
+                    color_image,
+                    source=color_response.source.name,
+                    depth_image=depth_image,
+                    robot_pose=frame_transformer.get_current_body_position_in_frame(robot_state.frame_name),
+                    description=f"inspection_object_{object_id}",
+                )
 
                 if robot_state.image_state is None or robot_state.depth_image_state is None:
                     logger.error("Failed to save images to robot state")
@@ -135,6 +140,10 @@ class InspectionPlugin:
                 return False
 
 
+    @kernel_function(description="Call this function to list the camera images you captured most recently (capture time, camera, inspected object and robot position).")
+    def get_recent_images(self, count: Annotated[int, "Maximum number of images to list"] = 5) -> str:
+        return robot_state.get_recent_frames_prompt(count)
+
     @kernel_function(description="After having navigated to an object/furniture, you can call this function to inspect the object with gaze and save the image to your memory.")
     async def inspect_object_with_gaze(self, object_id: Annotated[int, "ID of the object in the scene graph"]) -> None:
         
@@ -195,10 +204,7 @@ class InspectionPlugin:
                 # No image available for this object
                 logger.warning(f"No image available for object with ID {object_id} and semantic label {sem_label}")
                 
-                # Check if interactions_with_object exists before appending
-                if not hasattr(object_node, 'interactions_with_object'):
-                    object_node.interactions_with_object = []
-                object_node.interactions_with_object.append("inspected")  # Log interaction anyway
+                robot_state.add_node_interaction(object_id, "inspected")  # Log interaction anyway
                 
                 feedback = f"Inspected object with id {object_id} and semantic label {sem_label}. No image available."
                 return feedback
@@ -221,6 +227,13 @@ class InspectionPlugin:
             observation_prompt = None
             # Set the image state if an image was successfully loaded
             if object_image is not None:
+                robot_state.add_image_frame(
+                    object_image,
+                    source="simulation",
+                    robot_pose=robot_state.virtual_robot_pose,
+                    description=f"inspection_object_{object_id}",
+                )
+
                 # Convert numpy array to base64 encoded data URI
                 pil_img = Image.fromarray(object_image)
                 buffered = io.BytesIO()
@@ -277,13 +290,10 @@ class InspectionPlugin:
                     )
                 
             # Log interaction
-            if not hasattr(object_node, 'interactions_with_object'):
-                object_node.interactions_with_object = []
-            
             if observation is not None:
-                object_node.interactions_with_object.append("Inspected, observation: " + str(observation))
+                robot_state.add_node_interaction(object_id, "Inspected, observation: " + str(observation))
             else:
-                object_node.interactions_with_object.append("Inspected")
+                robot_state.add_node_interaction(object_id, "Inspected")
             
             feedback = f"Inspected object with id {object_id} and semantic label {sem_label}. Observation: {str(observation)}"
             return feedback
@@ -308,20 +318,19 @@ class InspectionPlugin:
             object_node = robot_state.scene_graph.nodes[object_id]
 
             # Log interaction
-            if not hasattr(object_node, 'interactions_with_object'):
-                object_node.interactions_with_object = []
-            object_node.interactions_with_object.append("inspected") 
+            robot_state.add_node_interaction(object_id, "inspected")
             
             sem_label = robot_state.scene_graph.label_mapping.get(object_node.sem_label, "light switch")
 
             # TODO: check implementation of light switch inspection (valuable for on the real robot )
             if sem_label == "light switch":
-                object_node.affordance_dict = light_switch_detection.light_switch_affordance_detection(
+                affordance_dict = light_switch_detection.light_switch_affordance_detection(
                     object_node.centroid, 
                     robot_state.image_state, 
                     object_interaction_config["AFFORDANCE_DICT_LIGHT_SWITCHES"], 
                     general_config["OPENAI_API_KEY"]
                 )
+                robot_state.set_node_affordances(object_id, affordance_dict)
 
             logger.info(f"Object inspection (of {sem_label}) logged in the scene graph.")
         
@@ -210,8 +210,7 @@ class ItemInteractionsPlugin:
         if not use_robot:
             logger.info("Pushed light switch in simulation (without robot).")
             # Add a way in the scene graph to confirm that the light switch has been pushed (or other things changed)
-            light_switch_node = robot_state.scene_graph.nodes[light_switch_object_id]
-            light_switch_node.interactions_with_object.append("pressed") # Log interaction
+            robot_state.add_node_interaction(light_switch_object_id, "pressed") # Log interaction
             feedback = f"Light switch with ID {light_switch_object_id} pushed successfully"
             logger.info(feedback)
             return feedback
@@ -266,7 +265,7 @@ class ItemInteractionsPlugin:
                 function=self._Push_Light_Switch(), 
                 light_switch_object_id=light_switch_object_id
             )
-            light_switch_node.interactions_with_object.append("pressed") # Log interaction
+            robot_state.add_node_interaction(light_switch_object_id, "pressed") # Log interaction
             feedback = f"Light switch with ID {light_switch_object_id} pushed successfully"
             logger.info(feedback)
             return feedback
@@ -299,7 +298,7 @@ class ItemInteractionsPlugin:
             
             object_node = robot_state.scene_graph.nodes[object_id]
             robot_state.object_in_gripper = object_node
-            object_node.interactions_with_object.append("grasped object") # Log interaction
+            robot_state.add_node_interaction(object_id, "grasped object") # Log interaction
             feedback = f"Grasped object with ID {object_id}."
             logger.info(feedback)
             return feedback
@@ -398,14 +397,11 @@ class ItemInteractionsPlugin:
             # This can be simply solved be adding automatic navigation to the location first, when the robot is not close to the placing location
             
             # Place the object at the new location (for now the same location as the robot just navigated to)
-            object_node = robot_state.scene_graph.nodes[object_id]
             robot_state.object_in_gripper = None
-            object_node.centroid = placing_3d_coordinates_np
+            robot_state.move_node(object_id, placing_3d_coordinates_np)
             
             # Log the interaction
-            if not hasattr(object_node, 'interactions_with_object'):
-                object_node.interactions_with_object = []
-            object_node.interactions_with_object.append("placed object") # Log interaction
+            robot_state.add_node_interaction(object_id, "placed object") # Log interaction
             
             feedback = f"Placed object with ID {object_id} at location {placing_3d_coordinates}"
             logger.info(feedback)
@@ -429,10 +425,10 @@ class ItemInteractionsPlugin:
             
             # Open the drawer
             logger.info(f"Opening drawer with ID {drawer_id}.")
-            drawer_node.interactions_with_object.append("opened")  # Log interaction
+            robot_state.add_node_interaction(drawer_id, "opened")  # Log interaction
             
             # Set the is_open attribute to True
-            drawer_node.is_open = True
+            robot_state.set_node_open_state(drawer_id, True)
             
             feedback = f"Opened drawer with ID {drawer_id}."
             logger.info(feedback)
@@ -456,10 +452,10 @@ class ItemInteractionsPlugin:
             
             # Close the drawer
             logger.info(f"Closing drawer with ID {drawer_id}.")
-            drawer_node.interactions_with_object.append("closed")  # Log interaction
+            robot_state.add_node_interaction(drawer_id, "closed")  # Log interaction
             
             # Set the is_open attribute to False
-            drawer_node.is_open = False
+            robot_state.set_node_open_state(drawer_id, False)
             
             feedback = f"Closed drawer with ID {drawer_id}."
             logger.info(feedback)
@@ -473,12 +469,7 @@ class ItemInteractionsPlugin:
     async def use_object(self, object_id: Annotated[int, "The ID of the object to use"], description_of_use: Annotated[str, "A clear (3-5 words) description on how to use the object"]) -> str:
         if not use_robot:
             logger.info(f"Used object with ID {object_id} ({description_of_use}) in simulation (without robot).")
-            object_node = robot_state.scene_graph.nodes[object_id]
-            
-            # Check if interactions_with_object exists
-            if not hasattr(object_node, 'interactions_with_object'):
-                object_node.interactions_with_object = []
-            object_node.interactions_with_object.append(description_of_use)
+            robot_state.add_node_interaction(object_id, description_of_use)
             
             feedback = f"Used object with ID {object_id} ({description_of_use}) in simulation (without robot)."
             logger.info(feedback)
@@ -17,6 +17,7 @@ from configs.json_object_models import TaskPlannerResponse
 from configs.goal_execution_log_models import PlanGenerationLogs
 from robot_utils.frame_transformer import FrameTransformerSingleton
 from utils.agent_utils import invoke_agent
+from utils.logging_utils import LazyJson
 from utils.recursive_config import Config
 
 
@@ -51,7 +52,7 @@ class ReplanningPlugin:
             tasks_completed=', '.join(map(str, robot_planner.tasks_completed)),
             scene_graph=str(robot_state.scene_graph.scene_graph_to_dict()),
             robot_position=str(robot_state.virtual_robot_pose) if not use_robot else str(frame_transformer.get_current_body_position_in_frame(robot_state.frame_name)),
-            core_memory=str(robot_state.core_memory),
+            core_memory=robot_state.core_memory.get_prompt(f"{robot_planner.goal} {issue_description}"),
             model_description=model_desc
         )
         
@@ -91,7 +92,7 @@ class ReplanningPlugin:
         try:
             logger.info("Successfully parsed JSON from updated plan generation response.")
             logger.debug("========================================")
-            logger.debug(f"Updated plan JSON string: {updated_plan_json_str}")   
+            logger.debug("Updated plan JSON string: %s", updated_plan_json_str)
             logger.debug("========================================")
             
             robot_planner.plan = json.loads(updated_plan_json_str)
@@ -116,14 +117,14 @@ class ReplanningPlugin:
                 ))
             
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON from response: {e}")
+            logger.error("Failed to parse JSON from response: %s", e)
             await self.update_task_plan("Failed to parse JSON from response with error: " + str(e) + ". Please try again with valid JSON format.")
         
         await robot_planner.planning_chat_thread.on_new_message(ChatMessageContent(role=AuthorRole.USER, content="Issue description with previous plan:" + issue_description))
         await robot_planner.planning_chat_thread.on_new_message(ChatMessageContent(role=AuthorRole.ASSISTANT, content="Updated plan:" + str(robot_planner.plan)))
         
         logger.info("========================================")
-        logger.info(f"Extracted updated plan: {json.dumps(robot_planner.plan, indent=2)}")
+        logger.info("Extracted updated plan: %s", LazyJson(robot_planner.plan))
         logger.info("========================================")
         robot_planner.json_format_agent_thread = None
         
@@ -4,7 +4,7 @@ import copy
 import time
 
 import numpy as np
-from typing import List
+from typing import List, Optional
 
 import open3d as o3d
 from bosdyn.client.frame_helpers import BODY_FRAME_NAME, ODOM_FRAME_NAME
@@ -380,6 +380,7 @@ def collect_dynamic_point_cloud(
     nr_captures: int = 4,
     offset: float = 10,
     degrees: bool = True,
+    voxel_size: Optional[float] = None,
 ) -> PointCloud:
     """
     Collect a point cloud of an object in front of the gripper.
@@ -393,6 +394,7 @@ def collect_dynamic_point_cloud(
     :param nr_captures: number of poses calculated on the circle (equidistant on it)
     :param offset: offset from target to circle as an angle seen from the center
     :param degrees: whether offset is given in degrees
+    :param voxel_size: if given, keep only one point per voxel of this size in the overlap of the views
     :return: a point cloud stitched together from all views
     """
     if nr_captures > 0:
@@ -410,7 +412,7 @@ def collect_dynamic_point_cloud(
         depth_images.extend(depth_image)
 
     pcd_odom = point_cloud_from_camera_captures(
-        depth_images, frame_relative_to=ODOM_FRAME_NAME
+        depth_images, frame_relative_to=ODOM_FRAME_NAME, voxel_size=voxel_size
     )
 
     return pcd_odom
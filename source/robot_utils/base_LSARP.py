@@ -257,15 +257,20 @@ class EStopError(Exception):
 
         
 def update_image_state(image_source: Optional[str] = None) -> None:
-    """Updates the image that the planning framework has access to."""
+    """Updates the image that the planning framework has access to (and adds it to the buffer of recent frames)."""
 
     if image_source is None:
         image_source = robot_state.default_image_source
     
     if image_source in robot_state.hand_image_sources:
-        robot_state.image_state = get_rgb_pictures(image_sources=[image_source], gripper_open=True)[0]
+        image = get_rgb_pictures(image_sources=[image_source], gripper_open=True)[0]
     else: 
-        robot_state.image_state = get_greyscale_pictures(image_sources=[image_source], gripper_open=False)[0]
+        image = get_greyscale_pictures(image_sources=[image_source], gripper_open=False)[0]
+    robot_state.add_image_frame(
+        image,
+        source=image_source,
+        robot_pose=frame_transformer.get_current_body_position_in_frame(robot_state.frame_name),
+    )
 
 
 def update_depth_image_state(image_source: Optional[str] = None) -> None:
@@ -273,6 +278,7 @@ def update_depth_image_state(image_source: Optional[str] = None) -> None:
         image_source = robot_state.default_image_source
     
     if image_source in robot_state.hand_image_sources:
-        robot_state.depth_image_state = get_d_pictures(image_sources=[image_source], gripper_open=True)[0]
+        depth_image = get_d_pictures(image_sources=[image_source], gripper_open=True)[0]
     else:
-        robot_state.depth_image_state = get_d_pictures(image_sources=[image_source], gripper_open=False)[0]
\ No newline at end of file
+        depth_image = get_d_pictures(image_sources=[image_source], gripper_open=False)[0]
+    robot_state.set_depth_image_state(depth_image, source=image_source)
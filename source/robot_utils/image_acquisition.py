@@ -0,0 +1,272 @@
+"""
+Background acquisition of camera frames.
+
+The ImageAcquisitionService keeps the latest ImageResponse of a set of image sources fresh by
+issuing asynchronous image requests (ImageClient.get_image_async) at a target rate, so that
+a capture function can serve a recent enough frame immediately instead of waiting for a
+blocking round trip to the robot. FakeImageClient mimics the image service offline.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Iterable, Optional
+
+import numpy as np
+from bosdyn.api import image_pb2
+from bosdyn.client.image import build_image_request
+
+logger = logging.getLogger("main")
+
+_FRAME_KEY = tuple[str, int]  # (image source name, pixel format)
+
+
+class ImageAcquisitionService:
+    """
+    Background thread requesting frames of the configured image sources asynchronously and
+    keeping the latest response of every (source, pixel format). At most one request is in
+    flight, the next one is sent one period after the previous one (or as soon as it
+    returned if it took longer).
+    """
+
+    def __init__(
+        self,
+        client,
+        sources: Iterable[tuple[str, int]],
+        rate_hz: float = 5.0,
+        max_age: float = 0.5,
+        quality_percent: int = 100,
+    ) -> None:
+        """
+        Constructor
+        :param client: image client (bosdyn ImageClient or FakeImageClient)
+        :param sources: (image source name, pixel format) pairs to keep fresh
+        :param rate_hz: target number of requests per second
+        :param max_age: default maximum age (s) of a frame served by the service
+        :param quality_percent: JPEG quality of the requested frames
+        """
+        self._client = client
+        self._requests = [
+            build_image_request(source, pixel_format=pixel_format, quality_percent=quality_percent)
+            for source, pixel_format in sources
+        ]
+        self._period = 1.0 / max(rate_hz, 1e-3)
+        self.max_age = max_age
+        # (source, pixel format) -> (time the request was sent, response)
+        self._latest: dict[_FRAME_KEY, tuple[float, image_pb2.ImageResponse]] = {}
+        self._condition = threading.Condition()
+        self._request_done = threading.Event()
+        self._request_done.set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.num_requests = 0
+        self.num_errors = 0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the background acquisition (no-op if it is running)."""
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="image-acquisition", daemon=True)
+        self._thread.start()
+        logger.info(
+            "Started the image acquisition of %s at %.1f Hz.",
+            [request.image_source_name for request in self._requests], 1.0 / self._period,
+        )
+
+    def stop(self) -> None:
+        """Stop the background acquisition and wait for the thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        next_request = time.monotonic()
+        while not self._stop.is_set():
+            # Wait for the previous request, then for the next period
+            if not self._request_done.wait(timeout=self._period):
+                continue
+            delay = next_request - time.monotonic()
+            if delay > 0 and self._stop.wait(timeout=delay):
+                break
+            next_request = time.monotonic() + self._period
+            self._request_done.clear()
+            request_time = time.time()
+            try:
+                future = self._client.get_image_async(self._requests)
+            except Exception as e:
+                self._on_error(e)
+                continue
+            self.num_requests += 1
+            future.add_done_callback(lambda f, t=request_time: self._on_response(f, t))
+
+    def _on_error(self, error: Exception) -> None:
+        self.num_errors += 1
+        if self.num_errors == 1 or self.num_errors % 100 == 0:
+            logger.warning("Image acquisition request failed (%d failures): %s", self.num_errors, error)
+        self._request_done.set()
+
+    def _on_response(self, future, request_time: float) -> None:
+        try:
+            responses = future.result()
+        except Exception as e:
+            self._on_error(e)
+            return
+        with self._condition:
+            for response in responses:
+                key = (response.source.name, response.shot.image.pixel_format)
+                self._latest[key] = (request_time, response)
+            self._condition.notify_all()
+        self._request_done.set()
+
+    def get_responses(
+        self,
+        sources: Iterable[str],
+        pixel_format: int,
+        max_age: Optional[float] = None,
+        not_before: Optional[float] = None,
+        timeout: float = 0.0,
+    ) -> Optional[list[image_pb2.ImageResponse]]:
+        """
+        Get the latest frames of the sources if all of them are fresh enough.
+        :param sources: image source names
+        :param pixel_format: pixel format of the frames
+        :param max_age: maximum age (s) of the frames, measured from the time their request was sent (the default
+        max age of the service if None)
+        :param not_before: only serve frames requested after this time (time.time()), e.g. after the gripper moved
+        :param timeout: maximum time (s) to wait for fresh frames
+        :return: the responses in the order of the sources, None if some source has no fresh frame
+        """
+        sources = list(sources)
+        max_age = self.max_age if max_age is None else max_age
+        deadline = time.time() + timeout
+
+        def fresh_responses() -> Optional[list[image_pb2.ImageResponse]]:
+            oldest = time.time() - max_age
+            if not_before is not None:
+                oldest = max(oldest, not_before)
+            responses = []
+            for source in sources:
+                latest = self._latest.get((source, pixel_format))
+                if latest is None or latest[0] < oldest:
+                    return None
+                responses.append(latest[1])
+            return responses
+
+        with self._condition:
+            responses = fresh_responses()
+            while responses is None and self.is_running and time.time() < deadline:
+                self._condition.wait(timeout=deadline - time.time())
+                responses = fresh_responses()
+        return responses
+
+
+class FakeImageClient:
+    """
+    Offline stand-in of the bosdyn ImageClient: answers image requests with synthetic frames
+    (random raw images of the requested pixel format) after a simulated latency.
+    """
+
+    def __init__(self, rows: int = 480, cols: int = 640, latency: float = 0.05, seed: int = 0) -> None:
+        """
+        Constructor
+        :param rows: number of rows of the frames
+        :param cols: number of columns of the frames
+        :param latency: simulated round trip time (s) of a request
+        :param seed: seed of the random frames
+        """
+        self._rows = rows
+        self._cols = cols
+        self._latency = latency
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.num_requests = 0
+
+    def _make_response(self, request: image_pb2.ImageRequest) -> image_pb2.ImageResponse:
+        channels = {
+            image_pb2.Image.PIXEL_FORMAT_RGB_U8: 3,
+            image_pb2.Image.PIXEL_FORMAT_RGBA_U8: 4,
+        }.get(request.pixel_format, 1)
+        with self._lock:
+            if request.pixel_format in (image_pb2.Image.PIXEL_FORMAT_DEPTH_U16, image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U16):
+                img = self._rng.integers(0, 6000, (self._rows, self._cols), dtype=np.uint16)
+            else:
+                img = self._rng.integers(0, 255, (self._rows, self._cols, channels), dtype=np.uint8)
+
+        response = image_pb2.ImageResponse()
+        response.status = image_pb2.ImageResponse.STATUS_OK
+        response.source.name = request.image_source_name
+        response.shot.frame_name_image_sensor = request.image_source_name
+        response.shot.acquisition_time.FromNanoseconds(time.time_ns())
+        response.shot.image.rows = self._rows
+        response.shot.image.cols = self._cols
+        response.shot.image.format = image_pb2.Image.FORMAT_RAW
+        response.shot.image.pixel_format = request.pixel_format
+        response.shot.image.data = img.tobytes()
+        return response
+
+    def get_image(self, image_requests: list[image_pb2.ImageRequest], **kwargs) -> list[image_pb2.ImageResponse]:
+        """Blocking image request, like ImageClient.get_image."""
+        self.num_requests += 1
+        time.sleep(self._latency)
+        return [self._make_response(request) for request in image_requests]
+
+    def get_image_async(self, image_requests: list[image_pb2.ImageRequest], **kwargs) -> Future:
+        """Asynchronous image request, like ImageClient.get_image_async (the future supports result/add_done_callback)."""
+        future: Future = Future()
+
+        def respond():
+            try:
+                future.set_result(self.get_image(image_requests))
+            except Exception as e:
+                future.set_exception(e)
+
+        threading.Thread(target=respond, name="fake-image-service", daemon=True).start()
+        return future
+
+
+_acquisition_service: Optional[ImageAcquisitionService] = None
+
+
+def get_image_acquisition_service() -> Optional[ImageAcquisitionService]:
+    """Get the running image acquisition service (None if none is running)."""
+    if _acquisition_service is not None and _acquisition_service.is_running:
+        return _acquisition_service
+    return None
+
+
+def start_image_acquisition(
+    client,
+    sources: Iterable[tuple[str, int]],
+    rate_hz: float = 5.0,
+    max_age: float = 0.5,
+) -> ImageAcquisitionService:
+    """
+    Start the image acquisition service used by the capture functions of robot_utils.video (no-op if it is running).
+    :param client: image client (bosdyn ImageClient or FakeImageClient)
+    :param sources: (image source name, pixel format) pairs to keep fresh
+    :param rate_hz: target number of requests per second
+    :param max_age: default maximum age (s) of a served frame
+    :return: the service
+    """
+    global _acquisition_service
+    if get_image_acquisition_service() is None:
+        _acquisition_service = ImageAcquisitionService(client, sources, rate_hz=rate_hz, max_age=max_age)
+        _acquisition_service.start()
+    return _acquisition_service
+
+
+def stop_image_acquisition() -> None:
+    """Stop the image acquisition service."""
+    global _acquisition_service
+    if _acquisition_service is not None:
+        _acquisition_service.stop()
+        _acquisition_service = None
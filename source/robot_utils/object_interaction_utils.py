@@ -1,8 +1,8 @@
 import copy
 import logging
 import os
-import gc
 from pathlib import Path
+from typing import Optional
 from utils.coordinates import Pose2D, Pose3D
 from utils.recursive_config import Config
 from utils.vis import show_two_geometries_colored
@@ -15,6 +15,7 @@ from utils.openmask_interface import get_mask_points
 import open3d as o3d
 
 from planner_core.robot_state import RobotStateSingleton
+from planner_core.node_geometry_cache import get_vertical_faces, snap_to_cardinal
 from robot_utils.frame_transformer import FrameTransformerSingleton
 
 from utils.mask3D_interface import _get_list_of_items
@@ -65,54 +66,53 @@ def _get_distance_to_shelf(index: int=0, min_distance=1.10, load_from_json=False
     return max(circle_radius_width, circle_radius_height, min_distance), furniture_centroid
 
 
-def _get_shelf_front(cabinet_pcd: o3d.geometry.PointCloud, cabinet_center: np.ndarray) -> np.ndarray:
+def _get_shelf_front(cabinet_pcd: o3d.geometry.PointCloud, cabinet_center: np.ndarray, furniture_index: Optional[int] = None) -> np.ndarray:
     '''
     Get the normal of the front face of the furniture.
     
     :param cabinet_pcd: PointCloud of the shelf/cabinet. (o3d.geometry.PointCloud)
+    :param cabinet_center: Centroid of the shelf/cabinet.
+    :param furniture_index: Scene graph index of the shelf/cabinet, excluded from the objects in front of its faces.
     :return: Normal of the front face.
     '''
     try:
-        # get furniture oriented bounding box
+        # get furniture oriented bounding box and its vertical faces
         obb = cabinet_pcd.get_oriented_bounding_box()
-        R = obb.R
-        extents = obb.extent
-
-        # get vertical faces
-        vertical_faces = []
-        for axis in range(3):
-            for direction in [1, -1]:
-                try:
-                    # calculate face normal
-                    normal = R[:, axis] * direction
-                    # check if normal is roughly horizontal (= vertical face)
-                    if abs(normal[2]) < 0.1:
-                        # calculate face dimensions
-                        dim1 = (axis + 1) % 3
-                        dim2 = (axis + 2) % 3
-                        area = extents[dim1] * extents[dim2]
-
-                        # Snap normal to cardinal direction in XY plane
-                        snapped_normal = snap_to_cardinal(normal)
-                        
-                        # Default to empty list if get_nodes_in_front_of_object_face fails
-                        try:
-                            objects_in_front = robot_state.scene_graph.get_nodes_in_front_of_object_face(cabinet_center, snapped_normal)
-                        except Exception as e:
-                            logger.error("Error getting nodes in front of face: %s", e)
-                            objects_in_front = []
-                        
-                        logger.info("Found vertical face with original normal %s, snapped to %s. Area: %s. Objects in front: %s", normal, snapped_normal, area, objects_in_front)
-                        
-                        vertical_faces.append({
-                            'normal': snapped_normal,
-                            'original_normal': normal,
-                            'area': area,
-                            'objects_in_front': objects_in_front
-                        })
-                except Exception as e:
-                    logger.error("Error processing face at axis %s, direction %s: %s", axis, direction, e)
-                    continue
+        vertical_faces = get_vertical_faces(obb.R, obb.extent, cabinet_center)
+    except Exception as e:
+        logger.error("Error in _get_shelf_front: %s", e)
+        return np.array([-1, 0, 0])  # Default to -X direction
+    return _select_front_normal(vertical_faces, cabinet_center, furniture_index)
+
+
+def _select_front_normal(vertical_faces: list, cabinet_center: np.ndarray, furniture_index: Optional[int] = None) -> np.ndarray:
+    '''
+    Select the front face of the furniture among its vertical faces.
+    
+    :param vertical_faces: Vertical faces of the furniture (see get_vertical_faces).
+    :param cabinet_center: Centroid of the shelf/cabinet.
+    :param furniture_index: Scene graph index of the shelf/cabinet, excluded from the objects in front of its faces.
+    :return: Normal of the front face.
+    '''
+    try:
+        # the faces may come from the node geometry cache, so they are not modified in place
+        vertical_faces = [dict(face) for face in vertical_faces]
+
+        # Query the objects in front of all vertical faces at once (default to no objects if the query fails)
+        try:
+            objects_in_front_of_faces = robot_state.get_spatial_index().query_faces(
+                [face['center'] for face in vertical_faces],
+                [face['normal'] for face in vertical_faces],
+                [face['half_size'] for face in vertical_faces],
+                exclude=[furniture_index] if furniture_index is not None else None,
+            )
+        except Exception as e:
+            logger.error("Error getting nodes in front of faces: %s", e)
+            objects_in_front_of_faces = [[] for _ in vertical_faces]
+
+        for face, objects_in_front in zip(vertical_faces, objects_in_front_of_faces):
+            face['objects_in_front'] = objects_in_front
+            logger.info("Found vertical face with original normal %s, snapped to %s. Area: %s. Objects in front: %s", face['original_normal'], face['normal'], face['area'], objects_in_front)
 
         if not vertical_faces:
             logger.warning("No vertical faces found, defaulting to -X direction")
@@ -149,44 +149,9 @@ def _get_shelf_front(cabinet_pcd: o3d.geometry.PointCloud, cabinet_center: np.nd
         # To be more accurate, this should be extended to the face with the most free volume in front of it (for 1 meter distance)
         return front['normal']
     except Exception as e:
-        logger.error("Error in _get_shelf_front: %s", e)
+        logger.error("Error in _select_front_normal: %s", e)
         return np.array([-1, 0, 0])  # Default to -X direction
 
-def snap_to_cardinal(normal: np.ndarray) -> np.ndarray:
-    """
-    Snaps a normal vector to the closest cardinal direction in the XY plane.
-    
-    Args:
-        normal: The normal vector to snap
-        
-    Returns:
-        The snapped normal vector (aligned to X or Y axis)
-    """
-    # Get the XY component and normalize it
-    normal_xy = np.array([normal[0], normal[1], 0])
-    if np.linalg.norm(normal_xy) < 1e-6:  # Handle zero vector case
-        return np.array([1, 0, 0])  # Default to X-axis
-    
-    normal_xy = normal_xy / np.linalg.norm(normal_xy)
-    
-    # Determine the closest cardinal direction
-    # We check which cardinal direction has the highest dot product
-    cardinal_directions = [
-        np.array([1, 0, 0]),   # +X
-        np.array([0, 1, 0]),   # +Y
-        np.array([-1, 0, 0]),  # -X
-        np.array([0, -1, 0]),  # -Y
-    ]
-    
-    dot_products = [np.dot(normal_xy, cardinal) for cardinal in cardinal_directions]
-    best_idx = np.argmax(np.abs(dot_products))
-    
-    # Use the sign of the dot product to determine direction
-    if dot_products[best_idx] < 0:
-        return -cardinal_directions[best_idx]  # Return opposite direction
-    else:
-        return cardinal_directions[best_idx]
-
 def get_pose_in_front_of_furniture(index: int=0, min_distance=1.10, object_description="cabinet, shelf") -> Pose3D:
     '''
     Get the interaction pose for the robot in front of an object. 
@@ -198,62 +163,27 @@ def get_pose_in_front_of_furniture(index: int=0, min_distance=1.10, object_descr
     :return: The interaction pose (Pose3D).
     :raises: Various exceptions if the pose cannot be calculated.
     '''
-    furniture_centroid = None
-    furniture_point_cloud = None
-    points = None
+    # get necessary distance to shelf
+    radius, furniture_centroid = _get_distance_to_shelf(index, min_distance=min_distance)
+    radius = max(0.8, radius)
     
-    try:
-        # get necessary distance to shelf
-        radius, furniture_centroid = _get_distance_to_shelf(index, min_distance=min_distance)
-        radius = max(0.8, radius)
-        
-        # Shallow copy of points to prevent memory issues
-        # Get a small subset of points (max 5000) to reduce memory usage
-        original_points = robot_state.scene_graph.nodes[index].points
-        if len(original_points) > 5000:
-            # Randomly sample 5000 points
-            indices = np.random.choice(len(original_points), 5000, replace=False)
-            points = original_points[indices].copy()
-            logger.info(f"Reduced point cloud from {len(original_points)} to 5000 points to avoid memory issues")
-        else:
-            points = original_points.copy()
-            
-        # Create a new point cloud with the copied points
-        furniture_point_cloud = o3d.geometry.PointCloud()
-        furniture_point_cloud.points = o3d.utility.Vector3dVector(points)
-        
-        # Get front normal
-        logger.info(f"Finding front normal for furniture with {len(points)} points")
-        front_normal = _get_shelf_front(furniture_point_cloud, furniture_centroid)
-        
-        # Clean up point cloud to prevent memory leaks
-        del furniture_point_cloud
-        del points
-        furniture_point_cloud = None
-        points = None
-        
-        # Force garbage collection
-        gc.collect()
-        
-        if front_normal is None:
-            raise ValueError("Could not determine furniture front normal")
-            
-        # Save normal and calculate pose
-        robot_state.scene_graph.nodes[index].set_normal(front_normal)
-        interaction_position_3d = furniture_centroid + front_normal * radius
-        interaction_pose_3d = Pose3D(interaction_position_3d)
-        interaction_pose_3d.set_rot_from_direction(-front_normal)
-        
-        logger.info(f"Furniture interaction pose calculated: position={interaction_position_3d}, direction={interaction_pose_3d.direction()}")
+    # Get front normal from the cached vertical faces of the furniture
+    geometry = robot_state.get_node_geometry(index)
+    logger.info(f"Finding front normal for furniture with {len(geometry.points)} (downsampled) points")
+    front_normal = _select_front_normal(geometry.vertical_faces, furniture_centroid, furniture_index=index)
+    
+    if front_normal is None:
+        raise ValueError("Could not determine furniture front normal")
         
-        return interaction_pose_3d
-            
-    finally:
-        # Additional safeguard to ensure cleanup
-        if furniture_point_cloud is not None:
-            del furniture_point_cloud
-        if points is not None:
-            del points
+    # Save normal and calculate pose
+    robot_state.set_node_normal(index, front_normal)
+    interaction_position_3d = furniture_centroid + front_normal * radius
+    interaction_pose_3d = Pose3D(interaction_position_3d)
+    interaction_pose_3d.set_rot_from_direction(-front_normal)
+    
+    logger.info(f"Furniture interaction pose calculated: position={interaction_position_3d}, direction={interaction_pose_3d.direction()}")
+    
+    return interaction_pose_3d
 
 # def _get_fallback_pose(index: int, furniture_centroid: np.ndarray, radius: float) -> Pose3D:
 #     """
@@ -341,19 +271,12 @@ def get_best_pose_in_front_of_object(index: int, object_description: str, min_in
         if any(furniture_type in name.lower() for furniture_type in furniture_labels):
             furniture_sem_labels.append(label)
     
-    # Use scene_graph's get_nodes_in_radius method to find nodes within a reasonable radius
-    # We'll use a large enough radius to capture furniture the object might be on/in
-    nearby_nodes = robot_state.scene_graph.get_nodes_in_radius(item_centroid, 1.0)
-    
-    # Filter to only include furniture nodes
-    furniture_nodes = [node_id for node_id in nearby_nodes 
-                        if node_id != index and  # Skip self
-                        robot_state.scene_graph.nodes[node_id].sem_label in furniture_sem_labels]
-    if furniture_nodes:
-            # Find the closest furniture node
-            furniture_distances = [np.linalg.norm(robot_state.scene_graph.nodes[node_id].centroid - item_centroid) 
-                                  for node_id in furniture_nodes]
-            closest_furniture_idx = furniture_nodes[np.argmin(furniture_distances)]
+    # Find the closest furniture node within a radius large enough to capture furniture the object might be on/in
+    closest_furniture_nodes, _ = robot_state.get_spatial_index().query_knn(
+        item_centroid, k=1, max_distance=1.0, sem_labels=furniture_sem_labels, exclude=[index]
+    )
+    if closest_furniture_nodes:
+        closest_furniture_idx = closest_furniture_nodes[0]
 
     # Check if the object might be on the ground (low z-coordinate)
     is_on_ground = item_centroid[2] < 0.15  # If object is less than 15cm from ground
@@ -390,16 +313,8 @@ def get_best_pose_in_front_of_object(index: int, object_description: str, min_in
         # Check if there's already a scene graph connection
         if index not in robot_state.scene_graph.outgoing or robot_state.scene_graph.outgoing[index] != closest_furniture_idx:
             logger.info("Creating scene graph connection between object %s and furniture %s", index, closest_furniture_idx)
-            # Create a scene graph connection using scene_graph's built-in methods
-            # First remove any existing connections
-            if index in robot_state.scene_graph.outgoing:
-                old_connection = robot_state.scene_graph.outgoing[index]
-                if old_connection in robot_state.scene_graph.ingoing:
-                    robot_state.scene_graph.ingoing[old_connection].remove(index)
-            
-            # Add new connection
-            robot_state.scene_graph.outgoing[index] = closest_furniture_idx
-            robot_state.scene_graph.ingoing.setdefault(closest_furniture_idx, []).append(index)
+            # Replace any existing connection (recorded in the scene graph journal)
+            robot_state.connect_node(index, closest_furniture_idx)
         
         # Check if furniture has a normal
         if hasattr(furniture_node, 'equation') and furniture_node.equation is not None:
@@ -419,7 +334,7 @@ def get_best_pose_in_front_of_object(index: int, object_description: str, min_in
 
     # Make the object inherit the same normal as the furniture
     logger.info("Setting normal for object %s to %s", index, object_interaction_normal)
-    robot_state.scene_graph.nodes[index].set_normal(object_interaction_normal)
+    robot_state.set_node_normal(index, object_interaction_normal)
 
     logger.info("Calculating interaction pose for object %s", index)
     interaction_position_3d = item_centroid + object_interaction_normal * min_interaction_distance
@@ -14,7 +14,9 @@ PixelFormats: https://dev.bostondynamics.com/protos/bosdyn/api/proto_reference#i
 from __future__ import annotations
 
 import os.path
+import time
 from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import numpy as np
@@ -28,14 +30,13 @@ from bosdyn.client.frame_helpers import BODY_FRAME_NAME, ODOM_FRAME_NAME, get_a_
 from bosdyn.client.image import (
     ImageClient,
     build_image_request,
-    depth_image_to_pointcloud,
 )
 from bosdyn.client.gripper_camera_param import GripperCameraParamClient
 from bosdyn.client.world_object import WorldObjectClient
 from robot_utils import frame_transformer as ft
 from robot_utils.basic_movements import gaze, set_gripper, stow_arm
 from robot_utils.frame_transformer import FrameTransformerSingleton
-from scipy import ndimage
+from robot_utils.image_acquisition import get_image_acquisition_service
 from scipy.interpolate import griddata
 from utils import vis
 from utils.coordinates import Pose3D
@@ -60,6 +61,13 @@ GRIPPER_IMAGE_COLOR = "hand_color_image"
 GRIPPER_IMAGE_GRAYSCALE = "hand_image"
 GRIPPER_DEPTH_IN_COLOR = "hand_depth_in_hand_color_frame"
 GRIPPER_COLOR_IN_DEPTH = "hand_color_in_hand_depth_frame"
+GRIPPER_SOURCES = (
+    GRIPPER_DEPTH,
+    GRIPPER_IMAGE_COLOR,
+    GRIPPER_IMAGE_GRAYSCALE,
+    GRIPPER_DEPTH_IN_COLOR,
+    GRIPPER_COLOR_IN_DEPTH,
+)
 
 ROTATION_ANGLE = {
     "back_fisheye_image": 0,
@@ -97,6 +105,147 @@ ALL_DEPTH_SOURCES = (
     "right_depth",
 )
 
+# (rows, cols, angle) -> remap maps and output shape of the non right angle rotations
+_ROTATION_MAPS: dict[tuple[int, int, float], tuple[np.ndarray, np.ndarray, tuple[int, int]]] = {}
+_decode_executor: Optional[ThreadPoolExecutor] = None
+# (rows, cols, fx, fy, cx, cy) -> x/z and y/z of the rays through the pixels of a depth camera
+_PIXEL_RAYS: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+
+
+def _get_rotation_maps(rows: int, cols: int, angle: float) -> tuple[np.ndarray, np.ndarray, tuple[int, int]]:
+    """
+    Get the (cached) remap maps rotating an image of the given size counterclockwise by angle degrees, with the same
+    output geometry as scipy.ndimage.rotate(reshape=True): the output is enlarged to contain the whole rotated image.
+    :param rows: number of rows of the image
+    :param cols: number of columns of the image
+    :param angle: rotation angle in degrees
+    :return: fixed-point remap maps and the (rows, cols) of the rotated image
+    """
+    key = (rows, cols, angle)
+    if key not in _ROTATION_MAPS:
+        radians = np.deg2rad(angle)
+        cos, sin = abs(np.cos(radians)), abs(np.sin(radians))
+        out_rows = int(rows * cos + cols * sin + 0.5)
+        out_cols = int(cols * cos + rows * sin + 0.5)
+        matrix = cv2.getRotationMatrix2D(((cols - 1) / 2, (rows - 1) / 2), angle, 1.0)
+        matrix[:, 2] += ((out_cols - 1) / 2 - (cols - 1) / 2, (out_rows - 1) / 2 - (rows - 1) / 2)
+        inverse = cv2.invertAffineTransform(matrix)
+        xs, ys = np.meshgrid(
+            np.arange(out_cols, dtype=np.float32), np.arange(out_rows, dtype=np.float32)
+        )
+        map_x = inverse[0, 0] * xs + inverse[0, 1] * ys + inverse[0, 2]
+        map_y = inverse[1, 0] * xs + inverse[1, 1] * ys + inverse[1, 2]
+        map1, map2 = cv2.convertMaps(
+            map_x.astype(np.float32), map_y.astype(np.float32), cv2.CV_16SC2
+        )
+        _ROTATION_MAPS[key] = (map1, map2, (out_rows, out_cols))
+    return _ROTATION_MAPS[key]
+
+
+def rotate_image(img: np.ndarray, angle: float) -> np.ndarray:
+    """
+    Rotate an image counterclockwise by angle degrees (same geometry as scipy.ndimage.rotate).
+    Multiples of 90 degrees are exact (np.rot90), other angles use a cached warp map (bilinear for color images,
+    nearest neighbour for depth images, so no depth values are invented at object borders).
+    :param img: image to rotate, (rows, cols) or (rows, cols, channels)
+    :param angle: rotation angle in degrees
+    :return: the rotated image
+    """
+    if angle % 90 == 0:
+        num_rotations = int(angle // 90) % 4
+        if num_rotations == 0:
+            # A new writable array like ndimage.rotate (decoded images are read-only views of the response bytes)
+            return img.copy()
+        # Contiguous like the other decoded images (cv2 rejects some strided views)
+        return np.ascontiguousarray(np.rot90(img, num_rotations))
+    map1, map2, out_shape = _get_rotation_maps(img.shape[0], img.shape[1], angle)
+    interpolation = cv2.INTER_NEAREST if img.dtype == np.uint16 else cv2.INTER_LINEAR
+    rotated = cv2.remap(img, map1, map2, interpolation, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+    # cv2 drops a trailing channel axis of size 1
+    return rotated.reshape(out_shape + img.shape[2:])
+
+
+def _decode_image_response(image_response: ImageResponse, auto_rotate: bool) -> tuple[np.ndarray, str]:
+    """
+    Decode the image of an ImageResponse.
+    :param image_response: the response
+    :param auto_rotate: whether to rotate the image upright
+    :return: the image as np array and the file extension to save it with
+    """
+    num_bytes = 1  # Assume a default of 1 byte encodings.
+    if (
+        image_response.shot.image.pixel_format
+        == image_pb2.Image.PIXEL_FORMAT_DEPTH_U16
+    ):
+        dtype = np.uint16
+        extension = "png"
+    else:
+        if (
+            image_response.shot.image.pixel_format
+            == image_pb2.Image.PIXEL_FORMAT_RGB_U8
+        ):
+            num_bytes = 3
+        elif (
+            image_response.shot.image.pixel_format
+            == image_pb2.Image.PIXEL_FORMAT_RGBA_U8
+        ):
+            num_bytes = 4
+        elif (
+            image_response.shot.image.pixel_format
+            == image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8
+        ):
+            num_bytes = 1
+        elif (
+            image_response.shot.image.pixel_format
+            == image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U16
+        ):
+            num_bytes = 2
+        dtype = np.uint8
+        extension = "jpg"
+
+    img = np.frombuffer(image_response.shot.image.data, dtype=dtype)
+    if image_response.shot.image.format == image_pb2.Image.FORMAT_RAW:
+        try:
+            # Attempt to reshape array into a RGB rows X cols shape.
+            img = img.reshape(
+                (
+                    image_response.shot.image.rows,
+                    image_response.shot.image.cols,
+                    num_bytes,
+                )
+            )
+        except ValueError:
+            robot.logger.info("Custom Raw Decode failed!")
+            # Unable to reshape the image data, trying a regular decode.
+            img = cv2.imdecode(img, -1)
+    else:
+        img = cv2.imdecode(img, -1)
+
+    if auto_rotate:
+        img = rotate_image(img, ROTATION_ANGLE[image_response.source.name])
+    return img, extension
+
+
+def decode_image_responses(
+    image_responses: list[ImageResponse], auto_rotate: bool = True
+) -> list[tuple[np.ndarray, str]]:
+    """
+    Decode the images of several ImageResponses in parallel (cv2 decoding and the rotations release the GIL).
+    :param image_responses: the responses
+    :param auto_rotate: whether to rotate the images upright
+    :return: list of (image as np array, file extension) in the order of the responses
+    """
+    global _decode_executor
+    if len(image_responses) <= 1:
+        return [_decode_image_response(response, auto_rotate) for response in image_responses]
+    if _decode_executor is None:
+        _decode_executor = ThreadPoolExecutor(
+            max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="image-decode"
+        )
+    return list(
+        _decode_executor.map(lambda response: _decode_image_response(response, auto_rotate), image_responses)
+    )
+
 
 def get_pictures_from_sources(
     image_sources: Iterable[str],
@@ -104,7 +253,8 @@ def get_pictures_from_sources(
     save_path: Optional[str] = None,
     auto_rotate: bool = True,
     vis_block: bool = False,
-    gripper_open: bool = True
+    gripper_open: bool = True,
+    max_age: Optional[float] = None,
 ) -> list[(np.ndarray, image_pb2.ImageResponse)]:
     """
     Get picture from specified sources
@@ -113,74 +263,45 @@ def get_pictures_from_sources(
     :param save_path: where to save the image (None -> not saved)
     :param auto_rotate: whether to auto rotate the image
     :param vis_block: whether to show the captured images before returning
+    :param max_age: maximum age (s) of a frame prefetched by the image acquisition service (if it is running) to be
+    used instead of a new capture, None for the default of the service, 0 to always capture new frames
     :return: list of (image as np array, bosdyn ImageResponse), where the first is the image as a numpy array, and the
     second is the ImageResponse object for every capture
     """
+    image_sources = list(image_sources)
+    # prefetched frames of the gripper cameras must be taken after the gripper opened
+    not_before = None
     if gripper_open==True:
         set_gripper(gripper_open)
+        if any(source in GRIPPER_SOURCES for source in image_sources):
+            not_before = time.time()
+
+    image_responses = None
+    acquisition_service = get_image_acquisition_service()
+    if acquisition_service is not None and max_age != 0:
+        image_responses = acquisition_service.get_responses(
+            image_sources,
+            pixel_format,
+            max_age=max_age,
+            not_before=not_before,
+            timeout=acquisition_service.max_age if not_before is not None else 0.0,
+        )
+        if image_responses is not None:
+            robot.logger.info("Using prefetched images.")
 
-    image_request = [
-        build_image_request(source, pixel_format=pixel_format, quality_percent=100)
-        for source in image_sources
-    ]
-    robot.logger.info("Sending image request.")
-    image_responses = image_client.get_image(image_request)
-    robot.logger.info("Received image response.")
+    if image_responses is None:
+        image_request = [
+            build_image_request(source, pixel_format=pixel_format, quality_percent=100)
+            for source in image_sources
+        ]
+        robot.logger.info("Sending image request.")
+        image_responses = image_client.get_image(image_request)
+        robot.logger.info("Received image response.")
 
     images = []
-    for image_response in image_responses:
-        num_bytes = 1  # Assume a default of 1 byte encodings.
-        if (
-            image_response.shot.image.pixel_format
-            == image_pb2.Image.PIXEL_FORMAT_DEPTH_U16
-        ):
-            dtype = np.uint16
-            extension = "png"
-        else:
-            if (
-                image_response.shot.image.pixel_format
-                == image_pb2.Image.PIXEL_FORMAT_RGB_U8
-            ):
-                num_bytes = 3
-            elif (
-                image_response.shot.image.pixel_format
-                == image_pb2.Image.PIXEL_FORMAT_RGBA_U8
-            ):
-                num_bytes = 4
-            elif (
-                image_response.shot.image.pixel_format
-                == image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8
-            ):
-                num_bytes = 1
-            elif (
-                image_response.shot.image.pixel_format
-                == image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U16
-            ):
-                num_bytes = 2
-            dtype = np.uint8
-            extension = "jpg"
-
-        img = np.frombuffer(image_response.shot.image.data, dtype=dtype)
-        if image_response.shot.image.format == image_pb2.Image.FORMAT_RAW:
-            try:
-                # Attempt to reshape array into a RGB rows X cols shape.
-                img = img.reshape(
-                    (
-                        image_response.shot.image.rows,
-                        image_response.shot.image.cols,
-                        num_bytes,
-                    )
-                )
-            except ValueError:
-                robot.logger.info("Custom Raw Decode failed!")
-                # Unable to reshape the image data, trying a regular decode.
-                img = cv2.imdecode(img, -1)
-        else:
-            img = cv2.imdecode(img, -1)
-
-        if auto_rotate:
-            img = ndimage.rotate(img, ROTATION_ANGLE[image_response.source.name])
-
+    for image_response, (img, extension) in zip(
+        image_responses, decode_image_responses(image_responses, auto_rotate)
+    ):
         if save_path is not None:
             image_saved_path = image_response.source.name
             image_saved_path = image_saved_path.replace("/", "")
@@ -201,6 +322,7 @@ def get_rgb_pictures(
     auto_rotate: bool = True,
     vis_block: bool = False,
     gripper_open: bool = True,
+    max_age: Optional[float] = None,
 ) -> list[(np.ndarray, image_pb2.ImageResponse)]:
     """
     Get rgb pictures of specified image sources.
@@ -208,6 +330,7 @@ def get_rgb_pictures(
     :param auto_rotate: whether to auto rotate the image
     :param vis_block: whether to show the captured images before returning
     :param gripper_open: whether to open the gripper before taking pictures
+    :param max_age: maximum age (s) of a prefetched frame to use instead of a new capture (see get_pictures_from_sources)
     :return: list of (image as np array, bosdyn ImageResponse), where the first is the image as a numpy array, and the
     second is the ImageResponse object for every capture
     """
@@ -216,6 +339,7 @@ def get_rgb_pictures(
         "auto_rotate": auto_rotate,
         "vis_block": vis_block,
         "gripper_open": gripper_open,
+        "max_age": max_age,
     }
     pixel_format = image_pb2.Image.PixelFormat.PIXEL_FORMAT_RGB_U8
     images = get_pictures_from_sources(pixel_format=pixel_format, **kwargs)
@@ -227,12 +351,14 @@ def get_greyscale_pictures(
     auto_rotate: bool = True,
     vis_block: bool = False,
     gripper_open: bool = True,
+    max_age: Optional[float] = None,
 ) -> list[(np.ndarray, image_pb2.ImageResponse)]:
     """
     Get greyscale pictures of specified image sources.
     :param image_sources: iterable (list) of sensors from which readings should be taken
     :param auto_rotate: whether to auto rotate the image
     :param vis_block: whether to show the captured images before returning
+    :param max_age: maximum age (s) of a prefetched frame to use instead of a new capture (see get_pictures_from_sources)
     :return: list of (image as np array, bosdyn ImageResponse), where the first is the image as a numpy array, and the
     second is the ImageResponse object for every capture
     """
@@ -240,6 +366,7 @@ def get_greyscale_pictures(
         "image_sources": image_sources,
         "auto_rotate": auto_rotate,
         "vis_block": vis_block,
+        "max_age": max_age,
     }
     pixel_format = image_pb2.Image.PixelFormat.PIXEL_FORMAT_GREYSCALE_U8
     images = get_pictures_from_sources(pixel_format=pixel_format, gripper_open=gripper_open, **kwargs)
@@ -250,13 +377,15 @@ def get_d_pictures(
     image_sources: Iterable[str],
     auto_rotate: bool = True,
     vis_block: bool = False,
-    gripper_open: bool = True
+    gripper_open: bool = True,
+    max_age: Optional[float] = None,
 ) -> list[(np.ndarray, image_pb2.ImageResponse)]:
     """
     Get depth pictures of specified image sources.
     :param image_sources: iterable (list) of sensors from which readings should be taken
     :param auto_rotate: whether to auto rotate the image
     :param vis_block: whether to show the captured images before returning
+    :param max_age: maximum age (s) of a prefetched frame to use instead of a new capture (see get_pictures_from_sources)
     :return: list of (image as np array, bosdyn ImageResponse), where the first is the image as a numpy array, and the
     second is the ImageResponse object for every capture
     """
@@ -264,6 +393,7 @@ def get_d_pictures(
         "image_sources": image_sources,
         "auto_rotate": auto_rotate,
         "vis_block": vis_block,
+        "max_age": max_age,
     }
     pixel_format = image_pb2.Image.PixelFormat.PIXEL_FORMAT_DEPTH_U16
     images = get_pictures_from_sources(pixel_format=pixel_format, gripper_open=gripper_open, **kwargs)
@@ -275,6 +405,7 @@ def get_camera_rgbd(
     cut_to_size: bool = True,
     auto_rotate: bool = True,
     vis_block: bool = False,
+    max_age: Optional[float] = None,
 ) -> list[(np.ndarray, image_pb2.ImageResponse)]:
     """
     Capture rgbd image from the gripper.
@@ -283,6 +414,7 @@ def get_camera_rgbd(
     :param cut_to_size: depth has a smaller FoV than the image, whether to cut image so size of depth FoV
     :param auto_rotate: whether to auto rotate the image
     :param vis_block: whether to visualize the rgbd image before returning
+    :param max_age: maximum age (s) of prefetched frames to use instead of a new capture (see get_pictures_from_sources)
     :return: list of (image as np array, bosdyn ImageResponse), where the first is the image as a numpy array, and the
     second is the ImageResponse object for every capture
     """
@@ -298,6 +430,7 @@ def get_camera_rgbd(
     kwargs = {
         "auto_rotate": auto_rotate,
         "vis_block": vis_block,
+        "max_age": max_age,
     }
     # depth first
     depth_format = image_pb2.Image.PixelFormat.PIXEL_FORMAT_DEPTH_U16
@@ -679,27 +812,117 @@ def relocalize(
     set_gripper(False)
 
 
+def _get_pixel_rays(rows: int, cols: int, image_source: ImageSource) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Get the (cached) x/z and y/z ratios of the rays through the pixels of a pinhole camera.
+    :param rows: number of rows of the depth image
+    :param cols: number of columns of the depth image
+    :param image_source: Image.source with the pinhole intrinsics
+    :return: (rows, cols) arrays of x/z and y/z
+    """
+    intrinsics = image_source.pinhole.intrinsics
+    fx, fy = intrinsics.focal_length.x, intrinsics.focal_length.y
+    cx, cy = intrinsics.principal_point.x, intrinsics.principal_point.y
+    key = (rows, cols, fx, fy, cx, cy)
+    if key not in _PIXEL_RAYS:
+        pixel_rows, pixel_cols = np.mgrid[0:rows, 0:cols]
+        _PIXEL_RAYS[key] = ((pixel_cols - cx) / fx, (pixel_rows - cy) / fy)
+    return _PIXEL_RAYS[key]
+
+
+def _voxel_downsample(points: np.ndarray, voxel_size: float) -> np.ndarray:
+    """
+    Keep one point (the first) per occupied voxel of a grid.
+    :param points: (N, 3) points
+    :param voxel_size: edge length of the voxels
+    :return: (M, 3) points, M <= N
+    """
+    if len(points) == 0:
+        return points
+    voxels = np.floor(points / voxel_size).astype(np.int64)
+    voxels -= voxels.min(axis=0)
+    extent = voxels.max(axis=0) + 1
+    # one integer key per voxel is much faster to deduplicate than rows of voxel coordinates
+    keys = (voxels[:, 0] * extent[1] + voxels[:, 1]) * extent[2] + voxels[:, 2]
+    _, first_indices = np.unique(keys, return_index=True)
+    return points[np.sort(first_indices)]
+
+
+def fuse_depth_captures(
+    depth_images: list[(np.ndarray, image_pb2.ImageResponse)],
+    frame_relative_to: str = BODY_FRAME_NAME,
+    voxel_size: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Given a list of (depth_image, ImageResponse), compute the combined points relative to the specified frame.
+    All depth images are unprojected into one preallocated array (same valid depth range as depth_image_to_pointcloud)
+    and transformed with the batch of their camera poses.
+    :param depth_images: list of (depth_image, ImageResponse)
+    :param frame_relative_to: frame relative to which the points will be returned
+    :param voxel_size: if given, keep only one point per voxel of this size (removes the overlap of the views)
+    :return: (N, 3) combined points
+    """
+    image_responses = [image_response for _, image_response in depth_images]
+    if not image_responses:
+        return np.empty((0, 3))
+    for image_response in image_responses:
+        if image_response.shot.image.pixel_format != image_pb2.Image.PIXEL_FORMAT_DEPTH_U16:
+            raise ValueError("Point clouds require depth captures in PIXEL_FORMAT_DEPTH_U16.")
+    depth_arrays = [
+        np.frombuffer(image_response.shot.image.data, dtype=np.uint16).reshape(
+            image_response.shot.image.rows, image_response.shot.image.cols
+        )
+        for image_response in image_responses
+    ]
+    # 0 and the uint16 maximum mark invalid depths
+    valid_masks = [(depth_array > 0) & (depth_array < np.iinfo(np.uint16).max) for depth_array in depth_arrays]
+    counts = [int(np.count_nonzero(valid_mask)) for valid_mask in valid_masks]
+
+    camera_tform_frames = np.stack(
+        [
+            camera_pose_from_ImageCapture(image_response.shot, frame_relative_to).as_matrix()
+            for image_response in image_responses
+        ]
+    )
+    frame_tform_cameras = np.linalg.inv(camera_tform_frames)
+
+    points = np.empty((sum(counts), 3))
+    camera_points = np.empty((max(counts), 3))
+    offset = 0
+    for image_response, depth_array, valid_mask, count, frame_tform_camera in zip(
+        image_responses, depth_arrays, valid_masks, counts, frame_tform_cameras
+    ):
+        rays_x, rays_y = _get_pixel_rays(*depth_array.shape, image_response.source)
+        z = camera_points[:count, 2]
+        np.divide(depth_array[valid_mask], image_response.source.depth_scale, out=z)
+        np.multiply(z, rays_x[valid_mask], out=camera_points[:count, 0])
+        np.multiply(z, rays_y[valid_mask], out=camera_points[:count, 1])
+        frame_points = points[offset : offset + count]
+        np.matmul(camera_points[:count], frame_tform_camera[:3, :3].T, out=frame_points)
+        frame_points += frame_tform_camera[:3, 3]
+        offset += count
+
+    if voxel_size is not None:
+        points = _voxel_downsample(points, voxel_size)
+    return points
+
+
 def point_cloud_from_camera_captures(
     depth_images: list[(np.ndarray, image_pb2.ImageResponse)],
     frame_relative_to: str = BODY_FRAME_NAME,
+    voxel_size: Optional[float] = None,
 ) -> PointCloud:
     """
     Given a list of (depth_image, ImageResponse), compute the combined point cloud relative to the specified frame.
     :param depth_images: list of (depth_image, ImageResponse)
     :param frame_relative_to: frame relative to which the point cloud will be returned
+    :param voxel_size: if given, keep only one point per voxel of this size (removes the overlap of the views)
     :return: combined point cloud
     """
     fused_point_clouds = PointCloud()
-    for _, image_response in depth_images:
-        pcd_camera_np = depth_image_to_pointcloud(image_response)
-        pcd_camera = PointCloud()
-        pcd_camera.points = Vector3dVector(pcd_camera_np)
-        camera_tform_frame = camera_pose_from_ImageCapture(
-            image_response.shot, frame_relative_to
-        )
-        frame_tform_camera = camera_tform_frame.inverse()
-        pcd_frame = pcd_camera.transform(frame_tform_camera.as_matrix())
-        fused_point_clouds = fused_point_clouds + pcd_frame
+    fused_point_clouds.points = Vector3dVector(
+        fuse_depth_captures(depth_images, frame_relative_to, voxel_size)
+    )
     return fused_point_clouds
 
 
@@ -801,8 +1024,7 @@ def select_points_from_bounding_box(
     """
     # get necessary prerequisites
     depth_image, depth_response = depth_image_response
-    pcd_body = point_cloud_from_camera_captures([depth_image_response])
-    pcd_body = np.array(pcd_body.points)
+    pcd_body = fuse_depth_captures([depth_image_response])
     camera_tform_body = camera_pose_from_ImageCapture(
         depth_response.shot, BODY_FRAME_NAME
     ).as_matrix()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+"""
+Benchmark of the decoding of camera captures (robot_utils.video.decode_image_responses) against the previous
+serial decoding with scipy.ndimage.rotate, on synthetic ImageResponse protos (no robot needed).
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from bosdyn.api import image_pb2
+from scipy import ndimage
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from robot_utils.video import (
+    ROTATION_ANGLE,
+    _decode_image_response,
+    decode_image_responses,
+    rotate_image,
+)
+
+
+def make_image_response(source: str, rows: int, cols: int, pixel_format, jpeg: bool = False) -> image_pb2.ImageResponse:
+    """Create an ImageResponse with a random image of the given source, size and pixel format."""
+    rng = np.random.default_rng(0)
+    if pixel_format == image_pb2.Image.PIXEL_FORMAT_DEPTH_U16:
+        img = rng.integers(0, 6000, (rows, cols), dtype=np.uint16)
+    elif pixel_format == image_pb2.Image.PIXEL_FORMAT_RGB_U8:
+        img = rng.integers(0, 255, (rows, cols, 3), dtype=np.uint8)
+    else:
+        img = rng.integers(0, 255, (rows, cols), dtype=np.uint8)
+
+    response = image_pb2.ImageResponse()
+    response.source.name = source
+    response.shot.image.rows = rows
+    response.shot.image.cols = cols
+    response.shot.image.pixel_format = pixel_format
+    if jpeg:
+        response.shot.image.format = image_pb2.Image.FORMAT_JPEG
+        response.shot.image.data = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 100])[1].tobytes()
+    else:
+        response.shot.image.format = image_pb2.Image.FORMAT_RAW
+        response.shot.image.data = img.tobytes()
+    return response
+
+
+def decode_serial_ndimage(image_responses):
+    """The previous decoding: one response after the other, rotated with scipy.ndimage.rotate."""
+    images = []
+    for response in image_responses:
+        img, extension = _decode_image_response(response, auto_rotate=False)
+        images.append((ndimage.rotate(img, ROTATION_ANGLE[response.source.name]), extension))
+    return images
+
+
+def time_it(function, repeats: int) -> float:
+    """Median run time of function in milliseconds."""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return float(np.median(durations))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=10, help="number of timed runs per case")
+    args = parser.parse_args()
+
+    fisheye_sources = ["frontleft_fisheye_image", "frontright_fisheye_image", "left_fisheye_image", "right_fisheye_image", "back_fisheye_image"]
+    depth_sources = ["frontleft_depth", "frontright_depth", "left_depth", "right_depth", "back_depth"]
+    cases = {
+        "5 greyscale fisheye (raw 640x480)": [
+            make_image_response(source, 480, 640, image_pb2.Image.PIXEL_FORMAT_GREYSCALE_U8) for source in fisheye_sources
+        ],
+        "5 depth (raw 424x240)": [
+            make_image_response(source, 240, 424, image_pb2.Image.PIXEL_FORMAT_DEPTH_U16) for source in depth_sources
+        ],
+        "hand color (jpeg 1920x1080) + depth": [
+            make_image_response("hand_color_image", 1080, 1920, image_pb2.Image.PIXEL_FORMAT_RGB_U8, jpeg=True),
+            make_image_response("hand_depth_in_hand_color_frame", 1080, 1920, image_pb2.Image.PIXEL_FORMAT_DEPTH_U16),
+        ],
+    }
+
+    for name, responses in cases.items():
+        reference = decode_serial_ndimage(responses)
+        decoded = decode_image_responses(responses)
+        identical = all(np.array_equal(a[0], b[0]) for a, b in zip(reference, decoded))
+        before = time_it(lambda: decode_serial_ndimage(responses), args.repeats)
+        after = time_it(lambda: decode_image_responses(responses), args.repeats)
+        logger.info("%-40s serial+ndimage %8.2f ms | parallel+exact %8.2f ms | x%.1f | identical: %s",
+                    name, before, after, before / max(after, 1e-9), identical)
+
+    # Oblique rotation (e.g. the -78 degrees of the front fisheye cameras)
+    img = np.random.default_rng(0).integers(0, 255, (480, 640), dtype=np.uint8)
+    rotate_image(img, -78)  # build the cached warp map
+    reference = ndimage.rotate(img, -78)
+    rotated = rotate_image(img, -78)
+    before = time_it(lambda: ndimage.rotate(img, -78), args.repeats)
+    after = time_it(lambda: rotate_image(img, -78), args.repeats)
+    logger.info("%-40s ndimage.rotate %8.2f ms | cached warp    %8.2f ms | x%.1f | same shape: %s, mean abs diff: %.2f",
+                "rotation by -78 degrees (640x480)", before, after, before / max(after, 1e-9),
+                reference.shape == rotated.shape, np.abs(reference.astype(float) - rotated.astype(float)).mean())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for analysis/execution_log_export.py.
+Specifically tests the aggregation of runs in which goals crashed.
+"""
+
+import sys
+import os
+import unittest
+
+# Add the analysis directory to sys.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'analysis'))
+
+from execution_log_export import _rows_to_tables, aggregate_runs, flatten_execution_logs
+
+
+def make_goal_log(goal_number, completed, duration_seconds):
+    """Minimal dumped GoalExecutionLogs of a goal without agent invocations."""
+    return {
+        "goal_number": goal_number,
+        "goal": f"goal {goal_number}",
+        "goal_completed": completed,
+        "duration_seconds": duration_seconds,
+        "task_planner_agent": {"ai_service_id": "planner", "total_replanning_count": 1},
+        "task_execution_agent": {"ai_service_id": "executor", "task_logs": []},
+        "goal_completion_checker_agent": {"ai_service_id": "checker"},
+    }
+
+
+class TestAggregateRuns(unittest.TestCase):
+    def test_all_goals_errored(self):
+        raw_logs = {"1": {"error": "Timeout"}, "2": {"error": "Crash"}}
+        tables = _rows_to_tables(flatten_execution_logs(raw_logs, run_id="run_a"))
+
+        summary = aggregate_runs(tables)
+
+        self.assertEqual(len(summary), 1)
+        row = summary.iloc[0]
+        self.assertEqual(row["n_goals"], 2)
+        self.assertEqual(row["n_errors"], 2)
+        self.assertEqual(row["success_rate"], 0.0)
+        self.assertTrue(row[["mean_duration_seconds", "mean_replanning_count"]].isna().all())
+
+    def test_errored_goals_count_as_failed(self):
+        raw_logs = {
+            "1": make_goal_log(1, True, 10.0),
+            "2": make_goal_log(2, False, 20.0),
+            "3": {"error": "Crash"},
+        }
+        tables = _rows_to_tables(flatten_execution_logs(raw_logs, run_id="run_b"))
+
+        row = aggregate_runs(tables).iloc[0]
+        self.assertAlmostEqual(row["success_rate"], 1 / 3)
+        self.assertEqual(row["n_errors"], 1)
+        self.assertAlmostEqual(row["mean_duration_seconds"], 15.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
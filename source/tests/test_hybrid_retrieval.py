@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script for hybrid_retrieval.py.
+Specifically tests when the lexical (BM25) retrieval skips the vector retrieval.
+"""
+
+import sys
+import os
+import unittest
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+
+# Add source directory to sys.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from planner_core.hybrid_retrieval import BM25Index, HybridRetriever
+
+
+class MockVectorRetriever(BaseRetriever):
+    """Vector retriever returning fixed nodes and counting its calls."""
+
+    def __init__(self, nodes):
+        super().__init__()
+        self.nodes = nodes
+        self.num_calls = 0
+
+    def _retrieve(self, query_bundle):
+        self.num_calls += 1
+        return [NodeWithScore(node=node, score=1.0) for node in self.nodes]
+
+
+class TestHybridRetriever(unittest.TestCase):
+    def setUp(self):
+        self.nodes = [
+            TextNode(text="The red mug stands on the kitchen shelf next to the kettle.", id_="mug"),
+            TextNode(text="A potted plant is placed on the windowsill of the living room.", id_="plant"),
+            TextNode(text="The bottle of water is stored in the fridge.", id_="bottle"),
+            TextNode(text="Spare batteries are kept in the top drawer of the desk.", id_="batteries"),
+        ]
+        self.vector_retriever = MockVectorRetriever([self.nodes[2]])
+        self.retriever = HybridRetriever(BM25Index(self.nodes), self.vector_retriever, top_k=2)
+
+    def test_single_weak_hit_falls_back_to_vector_retrieval(self):
+        results = self.retriever.retrieve("Where could I find something cold near my kettle?")
+
+        self.assertEqual(self.vector_retriever.num_calls, 1)
+        self.assertIn("bottle", [result.node.node_id for result in results])
+
+    def test_single_strong_hit_is_decisive(self):
+        results = self.retriever.retrieve("spare batteries desk drawer")
+
+        self.assertEqual(self.vector_retriever.num_calls, 0)
+        self.assertEqual(results[0].node.node_id, "batteries")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Test script for memory_store.py.
+Specifically tests the deduplication of the core memory entries.
+"""
+
+import sys
+import os
+import unittest
+
+import numpy as np
+
+# Add source directory to sys.path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from planner_core.memory_store import CoreMemory
+
+
+class ConstantEmbedding:
+    """Embedding model mapping every text to the same vector (every pair of texts is maximally similar)."""
+
+    def get_text_embedding(self, text):
+        return np.ones(8)
+
+
+class TestCoreMemory(unittest.TestCase):
+    def test_entries_differing_only_in_ids_are_kept(self):
+        memory = CoreMemory()
+        memory.store("Object 12 is a cup located on shelf 7 in the kitchen.", source="planner")
+        _, replaced = memory.store("Object 13 is a cup located on shelf 7 in the kitchen.", source="planner")
+
+        self.assertFalse(replaced)
+        self.assertEqual(len(memory.entries), 2)
+
+    def test_entries_differing_only_in_numbers_are_kept_with_embeddings(self):
+        memory = CoreMemory(embed_model=ConstantEmbedding())
+        memory.store("The distance to the fridge is 3.2 meters.", source="planner")
+        _, replaced = memory.store("The distance to the fridge is 4.1 meters.", source="planner")
+
+        self.assertFalse(replaced)
+        self.assertEqual(len(memory.entries), 2)
+
+    def test_duplicates_are_replaced(self):
+        memory = CoreMemory()
+        memory.store("The red mug is in the kitchen cabinet", source="planner")
+        _, replaced = memory.store("the red mug is in the kitchen cabinet.", source="executor")
+
+        self.assertTrue(replaced)
+        self.assertEqual(len(memory.entries), 1)
+        self.assertEqual(memory.entries[0].source, "executor")
+
+    def test_lexically_similar_facts_are_kept_without_embeddings(self):
+        memory = CoreMemory()
+        memory.store("The fridge door is open", source="planner")
+        _, replaced = memory.store("The fridge door is closed", source="planner")
+
+        self.assertFalse(replaced)
+        self.assertEqual(len(memory.entries), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -31,6 +31,8 @@ from robot_utils.object_interaction_utils import (
 from utils.coordinates import Pose3D
 from utils.recursive_config import Config
 from planner_core.robot_state import RobotStateSingleton, RobotState
+from planner_core.scene_graph_index import refresh_spatial_index
+from planner_core.node_geometry_cache import NodeGeometryCache
 from LostFound.src.scene_graph import SceneGraph
 from LostFound.src.graph_nodes import ObjectNode
 
@@ -88,6 +90,26 @@ class MockRobotState:
     def __init__(self):
         self.scene_graph = MockSceneGraph()
         self.frame_name = "map"
+        self._spatial_index = None
+        self.node_geometry_cache = NodeGeometryCache()
+
+    def get_spatial_index(self):
+        self._spatial_index = refresh_spatial_index(self.scene_graph, self._spatial_index)
+        return self._spatial_index
+
+    def get_node_geometry(self, node_id):
+        return self.node_geometry_cache.get(node_id, self.scene_graph.nodes[node_id])
+
+    def connect_node(self, node_id, parent_id):
+        if node_id in self.scene_graph.outgoing:
+            old_connection = self.scene_graph.outgoing[node_id]
+            if old_connection in self.scene_graph.ingoing:
+                self.scene_graph.ingoing[old_connection].remove(node_id)
+        self.scene_graph.outgoing[node_id] = parent_id
+        self.scene_graph.ingoing.setdefault(parent_id, []).append(node_id)
+
+    def set_node_normal(self, node_id, normal):
+        self.scene_graph.nodes[node_id].set_normal(normal)
 
 class MockFrameTransformer:
     def get_current_body_position_in_frame(self, frame_name):
@@ -2,7 +2,7 @@
 import logging
 import json
 from datetime import datetime
-from typing import Tuple, List
+from typing import Tuple, List, Optional
 
 from configs.goal_execution_log_models import ToolCall, AgentResponse, AgentResponseLogs
 
@@ -18,6 +18,18 @@ from utils.recursive_config import Config
 config = Config()
 logger = logging.getLogger("main")
 
+def _get_token_usage(messages: List[ChatMessageContent]) -> Tuple[Optional[int], Optional[int]]:
+    """Sum the prompt and completion token usage reported in the metadata of the messages (None if not reported)."""
+    prompt_tokens, completion_tokens = None, None
+    for msg in messages:
+        usage = (msg.metadata or {}).get("usage")
+        if usage is None:
+            continue
+        prompt_tokens = (prompt_tokens or 0) + (getattr(usage, "prompt_tokens", 0) or 0)
+        completion_tokens = (completion_tokens or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+    return prompt_tokens, completion_tokens
+
+
 def _log_agent_response(request: str, messages: List[ChatMessageContent], start_time: datetime, end_time: datetime) -> AgentResponseLogs:
     """Log all content items from a list of agent messages to the console.
     
@@ -48,12 +60,15 @@ def _log_agent_response(request: str, messages: List[ChatMessageContent], start_
         # Iterate through all items in the message msg
         for item in msg.items:
             item_type_name = type(item).__name__
-            message_content = ""
+            # Keep the log message unformatted (format string + args), such that large tool
+            # results and texts are only stringified when the record is actually emitted
+            message_format, message_args = "%s", ("",)
             log_level = logging.INFO  # Default log level
 
             if isinstance(item, FunctionCallContent):
                 # Log function calls with arguments and ID for tracking
-                message_content = f"Tool Request (Function Call, id={item.id}) = {item.function_name}({item.arguments})"
+                message_format = "Tool Request (Function Call, id=%s) = %s(%s)"
+                message_args = (item.id, item.function_name, item.arguments)
                 log_level = logging.INFO  # Function calls are important INFO level
                 # logger.info("(DEBUG) Tool Request (Function Call, id=%s) = %s(%s)", item.id, item.function_name, item.arguments)
                 
@@ -81,7 +96,8 @@ def _log_agent_response(request: str, messages: List[ChatMessageContent], start_
                 
             elif isinstance(item, FunctionResultContent):
                 # Log function results with ID for tracking
-                message_content = f"Tool Result (Function Result, id={item.id}) = {item.function_name} -> {item.result}"
+                message_format = "Tool Result (Function Result, id=%s) = %s -> %s"
+                message_args = (item.id, item.function_name, item.result)
                 log_level = logging.INFO  # Results are important INFO level
                 
                 # ASSUMPTION: A function result always follows a tool call!!!! # ASSUMPTION
@@ -94,7 +110,7 @@ def _log_agent_response(request: str, messages: List[ChatMessageContent], start_
                 
             elif isinstance(item, TextContent):
                 # Log text content
-                message_content = str(item.text)
+                message_args = (item.text,)
                 log_level = logging.DEBUG  # Keep existing text logging at INFO
                 
                 agent_response = AgentResponse(
@@ -104,7 +120,7 @@ def _log_agent_response(request: str, messages: List[ChatMessageContent], start_
                 
             elif isinstance(item, ImageContent):
                 # Log image content presence without raw data
-                message_content = "[ImageContent received]"
+                message_args = ("[ImageContent received]",)
                 log_level = logging.DEBUG  # Image content might be verbose for INFO
                 
                 # TODO: Add image content to agent response
@@ -115,14 +131,17 @@ def _log_agent_response(request: str, messages: List[ChatMessageContent], start_
                 continue  # Skip logging unknown types via the main logger.log call below
 
             # Log each processed item with its specific type and role
-            logger.log(log_level, "[%s] %s : '%s'", item_type_name, msg.role, message_content)
+            logger.log(log_level, "[%s] %s : '" + message_format + "'", item_type_name, msg.role, *message_args)
 
+    prompt_tokens, completion_tokens = _get_token_usage(messages)
     agent_response_logs = AgentResponseLogs(
         request=request,
         agent_responses=agent_responses,
         agent_invocation_start_time=start_time,
         agent_invocation_end_time=end_time,
-        agent_invocation_duration_seconds=(end_time - start_time).total_seconds()
+        agent_invocation_duration_seconds=(end_time - start_time).total_seconds(),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens
     )
     
     return agent_response_logs
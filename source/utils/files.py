@@ -2,8 +2,11 @@
 Util functions for file management.
 """
 
+import hashlib
 import os
 import shutil
+from pathlib import Path
+from typing import Union
 
 from utils.recursive_config import Config
 
@@ -21,3 +24,14 @@ def prep_tmp_path(config: Config) -> str:
             shutil.rmtree(tmp_path)
     os.makedirs(tmp_path, exist_ok=False)
     return tmp_path
+
+
+def file_sha256(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-256 hex digest of a file, reading it in chunks.
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
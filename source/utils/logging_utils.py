@@ -1,8 +1,13 @@
+import atexit
+import copy
+import json
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 # OpenTelemetry imports
 try:
@@ -72,10 +77,125 @@ def setup_opentelemetry_logging(service_name="L-SARP", connection_string=None):
     logger = logging.getLogger()
     logger.addHandler(handler)
 
+class LazyJson:
+    """
+    Defers `json.dumps` of a (potentially large) object until a log record is actually emitted.
+
+    Usage: logger.info("Plan:\n%s", LazyJson(plan))
+    """
+
+    __slots__ = ("obj", "indent")
+
+    def __init__(self, obj: Any, indent: Optional[int] = 2) -> None:
+        self.obj = obj
+        self.indent = indent
+
+    def snapshot(self) -> "LazyJson":
+        """Copy of the object as it is now (it is serialized later, on the listener thread)."""
+        return LazyJson(copy.deepcopy(self.obj), self.indent)
+
+    def __str__(self) -> str:
+        return json.dumps(self.obj, indent=self.indent, default=str)
+
+
+class LazyStr:
+    """
+    Defers a string conversion (e.g. `str(scene_graph.scene_graph_to_dict())`) until a log
+    record is actually emitted. Pass a zero-argument callable producing the object to log.
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func) -> None:
+        self.func = func
+
+    def snapshot(self) -> "LazyStr":
+        """Evaluates the callable now, only the (expensive) string conversion is deferred to the listener thread."""
+        value = self.func()
+        return LazyStr(lambda: value)
+
+    def __str__(self) -> str:
+        return str(self.func())
+
+
+def _snapshot(arg: Any) -> Any:
+    return arg.snapshot() if isinstance(arg, (LazyJson, LazyStr)) else arg
+
+
+class _RoutingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that replaces the handlers of one logger. The record is tagged with the
+    original handlers of that logger so a single background listener can route it correctly.
+    """
+
+    def __init__(self, log_queue: queue.Queue, target_handlers: list[logging.Handler]) -> None:
+        super().__init__(log_queue)
+        self.target_handlers = tuple(target_handlers)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The same record is handled by the queue handlers of all loggers it propagates to,
+        # each enqueued record needs its own handler tag
+        record = copy.copy(record)
+        # Unlike the default QueueHandler we do NOT format the message here: formatting
+        # (including LazyJson/LazyStr arguments) happens on the listener thread. Lazy arguments
+        # are snapshotted so that later mutations (e.g. of the plan) do not change the record.
+        if isinstance(record.args, tuple):
+            record.args = tuple(_snapshot(arg) for arg in record.args)
+        elif isinstance(record.args, dict):
+            record.args = {key: _snapshot(arg) for key, arg in record.args.items()}
+        record._target_handlers = self.target_handlers
+        return record
+
+
+class _RoutingQueueListener(logging.handlers.QueueListener):
+    """Background writer that dispatches each record to the handlers of its originating logger."""
+
+    def handle(self, record: logging.LogRecord) -> None:
+        for handler in record.__dict__.pop("_target_handlers", ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+_queue_listener: Optional[_RoutingQueueListener] = None
+
+
+def _stop_queue_listener() -> None:
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
+def _move_handlers_to_queue() -> None:
+    """
+    Replace the handlers of all configured loggers by queue handlers, such that all file and
+    console I/O happens on a single background thread instead of the asyncio event loop.
+    """
+    global _queue_listener
+    _stop_queue_listener()
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.root.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    for logger in loggers:
+        if not logger.handlers:
+            continue
+        target_handlers = list(logger.handlers)
+        for handler in target_handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(_RoutingQueueHandler(log_queue, target_handlers))
+
+    _queue_listener = _RoutingQueueListener(log_queue)
+    _queue_listener.start()
+
+
 def setup_logging(config_file: Optional[str] = "configs/logging_conf.ini", 
                  enable_opentelemetry: bool = False,
                  service_name: str = "L-SARP",
-                 connection_string: Optional[str] = None) -> tuple[logging.Logger, logging.Logger]:
+                 connection_string: Optional[str] = None,
+                 use_queue_handler: bool = True) -> tuple[logging.Logger, logging.Logger]:
     """
     Set up logging configuration and return commonly used loggers.
     
@@ -84,6 +204,7 @@ def setup_logging(config_file: Optional[str] = "configs/logging_conf.ini",
         enable_opentelemetry: Whether to enable OpenTelemetry logging
         service_name: The name of the service for resource attribution
         connection_string: The connection string for Azure Monitor
+        use_queue_handler: Whether to write the log records on a background thread (QueueHandler/QueueListener)
     
     Returns:
         tuple: (logger_plugins, logger_main) - The two most commonly used loggers
@@ -91,6 +212,10 @@ def setup_logging(config_file: Optional[str] = "configs/logging_conf.ini",
     # Basic logging configuration from file
     logging.config.fileConfig(config_file)
     
+    # Move the (blocking) file and console handlers to a background writer thread
+    if use_queue_handler:
+        _move_handlers_to_queue()
+    
     # Set up OpenTelemetry if requested
     if enable_opentelemetry:
         setup_opentelemetry_logging(service_name, connection_string)
@@ -118,4 +243,7 @@ def get_logger(name: str) -> logging.Logger:
     # Check if logging is configured
     if not logging.getLogger().handlers:
         setup_logging()
-    return logging.getLogger(name) 
\ No newline at end of file
+    return logging.getLogger(name)
+
+
+atexit.register(_stop_queue_listener)